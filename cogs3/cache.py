@@ -0,0 +1,68 @@
+import os
+import pickle
+import threading
+
+import django_rq
+
+from django.conf import settings
+
+
+_connection_lock = threading.Lock()
+_connection = None
+
+
+def get_redis_connection():
+    """
+    Return a connection to the Redis instance configured for the default RQ queue, or None if
+    RQ has not been configured.
+
+    The connection, and its connection pool, is created once per process.
+    """
+    global _connection
+    queue = settings.RQ_QUEUES['default']
+    if not queue.get('HOST'):
+        return None
+    config = (os.getpid(), queue.get('HOST'), queue.get('PORT'), queue.get('DB'))
+    with _connection_lock:
+        if _connection is None or _connection[0] != config:
+            _connection = (config, django_rq.get_connection('default', use_strict_redis=True))
+        return _connection[1]
+
+
+class RedisCache(object):
+    """
+    A cache shared between processes, stored in Redis under a common key prefix.
+    """
+
+    def __init__(self, connection, prefix, timeout):
+        """
+        Args:
+            connection (redis.StrictRedis): Redis connection.
+            prefix (str): Prefix prepended to every key.
+            timeout (int): Time to live of each entry in seconds.
+        """
+        self.connection = connection
+        self.prefix = prefix
+        self.timeout = timeout
+
+    def _key(self, key):
+        return ''.join([self.prefix, key])
+
+    def get(self, key):
+        value = self.connection.get(self._key(key))
+        if value is None:
+            return None
+        return pickle.loads(value)
+
+    def set(self, key, value):
+        self.connection.setex(self._key(key), self.timeout, pickle.dumps(value))
+
+    def delete(self, *keys):
+        if keys:
+            self.connection.delete(*[self._key(key) for key in keys])
+
+    def clear(self):
+        keys = list(self.connection.scan_iter(match=self._key('*')))
+        if keys:
+            self.connection.delete(*keys)
+
@@ -0,0 +1,44 @@
+from django.db import models
+
+
+class PartialUniqueIndex(models.Index):
+    """
+    A unique index over the rows matching a condition.
+
+    Django 2.0 indexes can not be conditional. Declaring the index in Meta.indexes, rather than
+    creating it with RunSQL, keeps it in the migration state, so it is recreated whenever a
+    backend has to rebuild the table.
+    """
+    suffix = 'uniq'
+
+    def __init__(self, *, condition, **kwargs):
+        """
+        Args:
+            condition (str): SQL expression selecting the rows that must be unique, e.g.
+                "code <> ''".
+        """
+        super().__init__(**kwargs)
+        self.condition = condition
+
+    def create_sql(self, model, schema_editor, using=''):
+        fields = [model._meta.get_field(field_name) for field_name, _ in self.fields_orders]
+        col_suffixes = [order[1] for order in self.fields_orders]
+        sql = ' '.join([
+            schema_editor.sql_create_index.replace('CREATE INDEX', 'CREATE UNIQUE INDEX'),
+            'WHERE',
+            self.condition.replace('%', '%%'),
+        ])
+        return schema_editor._create_index_sql(
+            model,
+            fields,
+            name=self.name,
+            using=using,
+            db_tablespace=self.db_tablespace,
+            col_suffixes=col_suffixes,
+            sql=sql,
+        )
+
+    def deconstruct(self):
+        path, args, kwargs = super().deconstruct()
+        kwargs['condition'] = self.condition
+        return path, args, kwargs
@@ -0,0 +1,43 @@
+class FieldTrackerMixin(object):
+    """
+    Model mixin remembering the stored values of tracked_fields, as of when the instance was
+    loaded or last saved, so changes can be detected without querying the database.
+
+    Tracked fields are given by attribute name, e.g. 'project_id' for a foreign key.
+    """
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_values = {field: getattr(instance, field) for field in cls.tracked_fields if field in field_names}
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        saved_fields = self.tracked_fields
+        if kwargs.get('update_fields') is not None:
+            attnames = {self._meta.get_field(name).attname for name in kwargs['update_fields']}
+            saved_fields = [field for field in saved_fields if field in attnames]
+        if not hasattr(self, '_saved_values'):
+            self._saved_values = {}
+        self._saved_values.update({field: getattr(self, field) for field in saved_fields})
+
+    def has_saved_value(self, field):
+        """
+        Return True if the stored value of a tracked field is known.
+        """
+        return field in getattr(self, '_saved_values', {})
+
+    def get_saved_value(self, field, default=None):
+        """
+        Return the stored value of a tracked field, or default if it is not known.
+        """
+        return getattr(self, '_saved_values', {}).get(field, default)
+
+    def has_changed(self, field):
+        """
+        Return True if a tracked field differs from its stored value, or the stored value is not
+        known.
+        """
+        return not self.has_saved_value(field) or getattr(self, field) != self.get_saved_value(field)
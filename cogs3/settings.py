@@ -75,8 +75,8 @@ MIDDLEWARE = [
 ]
 
 AUTHENTICATION_BACKENDS = (
-    'shibboleth.backends.ShibbolethRemoteUserBackend',
-    'django.contrib.auth.backends.ModelBackend',
+    'users.backends.SnapshotShibbolethRemoteUserBackend',
+    'users.backends.SnapshotModelBackend',
 )
 
 ROOT_URLCONF = 'cogs3.urls'
@@ -152,6 +152,9 @@ LOGIN_REDIRECT_URL = 'home'
 
 # Custom user model
 AUTH_USER_MODEL = 'users.CustomUser'
+# Time to live in seconds of cached user authorisation snapshots, 0 disables the cache. Snapshots
+# are only cached when Redis is configured for RQ.
+AUTH_SNAPSHOT_TIMEOUT = int(os.environ.get('AUTH_SNAPSHOT_TIMEOUT', 300))
 
 # Messages
 MESSAGE_STORAGE = 'django.contrib.messages.storage.session.SessionStorage'
@@ -177,6 +180,9 @@ SHIBBOLETH_ATTRIBUTE_MAP = {
     'REMOTE_USER': (True, 'username'),
 }
 SHIBBOLETH_FORCE_REAUTH_SESSION_KEY = 'shib_force_reauth'
+# Session key of the identity provider and REMOTE_USER header the session's user was
+# authenticated with.
+SHIBBOLETH_REMOTE_USER_SESSION_KEY = 'shib_remote_user'
 # Shibboleth users must apply for an account
 CREATE_UNKNOWN_USER = False
 
@@ -198,6 +204,37 @@ OPENLDAP_JWT_KEY = os.environ.get('OPENLDAP_JWT_KEY')
 OPENLDAP_JWT_ISSUER = os.environ.get('OPENLDAP_JWT_ISSUER')
 OPENLDAP_JWT_AUDIENCE = os.environ.get('OPENLDAP_JWT_AUDIENCE')
 OPENLDAP_JWT_ALGORITHM = os.environ.get('OPENLDAP_JWT_ALGORITHM')
+# Maximum number of keep-alive connections held open to OPENLDAP_HOST per process.
+OPENLDAP_POOL_SIZE = int(os.environ.get('OPENLDAP_POOL_SIZE', 10))
+# Request timeouts in seconds, keyed by openldap.user_api endpoint.
+OPENLDAP_TIMEOUTS = {
+    'default': float(os.environ.get('OPENLDAP_TIMEOUT', 5)),
+    'list_users': float(os.environ.get('OPENLDAP_LIST_USERS_TIMEOUT', 30)),
+}
+# Time to live in seconds of cached directory user lookups, 0 disables the cache. Lookups are
+# only cached in the Redis instance configured for RQ.
+OPENLDAP_CACHE_TIMEOUT = int(os.environ.get('OPENLDAP_CACHE_TIMEOUT', 300))
+# Response schema validation: 'full', 'sampled' (one in OPENLDAP_VALIDATION_SAMPLE_RATE, none if 0) or 'off'.
+OPENLDAP_VALIDATION_MODE = os.environ.get('OPENLDAP_VALIDATION_MODE', 'full')
+OPENLDAP_VALIDATION_SAMPLE_RATE = int(os.environ.get('OPENLDAP_VALIDATION_SAMPLE_RATE', 100))
+# Consecutive failures before the circuit breaker opens, and seconds before it lets a probe through.
+OPENLDAP_CIRCUIT_BREAKER_THRESHOLD = int(os.environ.get('OPENLDAP_CIRCUIT_BREAKER_THRESHOLD', 5))
+OPENLDAP_CIRCUIT_BREAKER_RESET_TIMEOUT = float(os.environ.get('OPENLDAP_CIRCUIT_BREAKER_RESET_TIMEOUT', 30))
+# Retries of idempotent requests after a transport failure, with jittered exponential backoff.
+OPENLDAP_RETRY_ATTEMPTS = int(os.environ.get('OPENLDAP_RETRY_ATTEMPTS', 2))
+OPENLDAP_RETRY_BACKOFF = float(os.environ.get('OPENLDAP_RETRY_BACKOFF', 0.2))
+# Limits shared by every worker through the RQ Redis instance, 0 disables a limit.
+OPENLDAP_MAX_IN_FLIGHT = int(os.environ.get('OPENLDAP_MAX_IN_FLIGHT', 0))
+OPENLDAP_RATE_LIMIT = float(os.environ.get('OPENLDAP_RATE_LIMIT', 0))
+OPENLDAP_RATE_LIMIT_BURST = int(os.environ.get('OPENLDAP_RATE_LIMIT_BURST', 1))
+# Longest a request waits on the limits before failing with openldap.exceptions.ThrottleTimeout.
+OPENLDAP_THROTTLE_TIMEOUT = float(os.environ.get('OPENLDAP_THROTTLE_TIMEOUT', 10))
+
+# Projects
+# Prefix of the project codes allocated on approval, see project.codes.
+PROJECT_CODE_PREFIX = os.environ.get('PROJECT_CODE_PREFIX', 'scw')
+# Page project and membership listings by cursor rather than by page number, see project.pagination.
+PROJECT_CURSOR_PAGINATION = os.environ.get('PROJECT_CURSOR_PAGINATION', 'False') == 'True'
 
 # Logging
 LOGS_DIR = os.path.join(BASE_DIR, 'logs')
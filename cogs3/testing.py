@@ -0,0 +1,51 @@
+import fakeredis
+import mock
+
+
+class SnapshotCacheMixin(object):
+    """
+    TestCase mixin caching user snapshots, see users.snapshot, in an in-memory Redis, as they are
+    cached when Redis is configured for RQ.
+    """
+
+    def setUp(self):
+        self.snapshot_connection = fakeredis.FakeStrictRedis()
+        self.snapshot_connection.flushall()
+        patcher = mock.patch('users.snapshot.get_redis_connection', return_value=self.snapshot_connection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        super().setUp()
+
+
+class QueryBudgetMixin(SnapshotCacheMixin):
+    """
+    TestCase mixin asserting that a page is rendered in a fixed number of queries, however many
+    rows it lists, with user snapshots cached.
+    """
+    # Rows in place for each measurement, cumulative. The last should fill more than one page.
+    query_budget_row_counts = (1, 5, 25)
+
+    def assertQueryBudget(self, budget, request, create_rows=None, status_code=200):
+        """
+        Ensure a request runs exactly budget queries, with each of query_budget_row_counts rows
+        in place.
+
+        The request is made once before measuring, so one off work such as logging the user in
+        is not counted.
+
+        Args:
+            budget (int): Number of queries allowed.
+            request (callable): Makes the request, returning the response.
+            create_rows (callable): Called with a number of rows to add to the listing.
+            status_code (int): Expected response status code.
+        """
+        request()
+        created = 0
+        for row_count in self.query_budget_row_counts:
+            if create_rows is not None:
+                create_rows(row_count - created)
+                created = row_count
+            with self.assertNumQueries(budget):
+                response = request()
+            self.assertEqual(response.status_code, status_code)
+        return response
@@ -1,13 +1,24 @@
+import datetime
+import uuid
+
+from django.contrib.auth.models import Group
 from django.test import TestCase
 from django.urls import reverse
 
+from cogs3.testing import QueryBudgetMixin
 from institution.tests.test_models import InstitutionTests
+from project.models import Project
+from project.models import ProjectUserMembership
+from project.tests.test_models import ProjectCategoryTests
+from project.tests.test_models import ProjectFundingSourceTests
+from project.tests.test_models import ProjectTests
 from users.tests.test_models import CustomUserTests
 
 
-class DashboardViewTests(TestCase):
+class DashboardViewTests(QueryBudgetMixin, TestCase):
 
     def setUp(self):
+        super(DashboardViewTests, self).setUp()
         # Create an institution.
         self.institution = InstitutionTests.create_institution(
             name='Bangor University',
@@ -65,3 +76,50 @@ class DashboardViewTests(TestCase):
         response = self.client.get(reverse('logout'))
         self.assertEqual(response.status_code, 302)
         self.assertEqual(response.url, reverse('logged_out'))
+
+    def test_view_query_budget(self):
+        """
+        Ensure the dashboard runs a fixed number of queries, however many membership requests
+        await authorisation.
+        """
+        email = '@'.join(['project_owner', self.institution.base_domain])
+        project_owner = CustomUserTests.create_custom_user(
+            email=email,
+            group=Group.objects.get(name='project_owner'),
+        )
+        project = ProjectTests.create_project(
+            title='Project Title',
+            code='scw-12345',
+            institution=self.institution,
+            tech_lead=project_owner,
+            category=ProjectCategoryTests.create_project_category(
+                name='A project category name',
+                description='A project category description',
+            ),
+            funding_source=ProjectFundingSourceTests.create_project_funding_source(
+                name='A project function source name',
+                description='A project funding source description',
+            ),
+        )
+        project.status = Project.APPROVED
+        project.save()
+
+        def create_membership_requests(count):
+            for _ in range(count):
+                user = CustomUserTests.create_custom_user(
+                    email='@'.join([uuid.uuid4().hex, self.institution.base_domain]))
+                ProjectUserMembership.objects.create(
+                    project=project,
+                    user=user,
+                    date_joined=datetime.date.today(),
+                )
+
+        headers = {
+            'Shib-Identity-Provider': self.institution.identity_provider,
+            'REMOTE_USER': email,
+        }
+        self.assertQueryBudget(
+            2,
+            lambda: self.client.get(reverse('home'), **headers),
+            create_membership_requests,
+        )
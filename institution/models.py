@@ -14,22 +14,31 @@ class Institution(models.Model):
 
     @classmethod
     def is_valid_email_address(cls, email):
-        try:
-            _, domain = email.split('@')
-            Institution.objects.get(base_domain=domain)
-        except Exception:
+        """
+        Ensure an email address belongs to an institution's domain, or one of its subdomains.
+
+        Args:
+            email (str): Email address.
+        """
+        from institution.registry import get_registry
+
+        if get_registry().get_by_email_address(email) is None:
             raise InvalidInstitution('Email address domain is not supported.')
-        else:
-            return True
+        return True
 
     @classmethod
     def is_valid_identity_provider(cls, identity_provider):
-        try:
-            Institution.objects.get(identity_provider=identity_provider)
-        except Exception:
+        """
+        Ensure an identity provider belongs to an institution.
+
+        Args:
+            identity_provider (str): Identity provider entity ID.
+        """
+        from institution.registry import get_registry
+
+        if get_registry().get_by_identity_provider(identity_provider) is None:
             raise InvalidIndentityProvider('Identity provider is not supported.')
-        else:
-            return True
+        return True
 
     def __str__(self):
         return self.name
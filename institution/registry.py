@@ -0,0 +1,159 @@
+"""
+In-process registry of institutions, keyed by base domain and identity provider.
+
+The institution table is tiny and read on every login and registration, so each process loads it
+once and answers lookups from memory. Saving or deleting an institution clears the registry of
+the current process, and once committed increments a version key in the Redis instance
+configured for RQ, which the other gunicorn and RQ worker processes check at most once every
+VERSION_CHECK_INTERVAL seconds before reloading. Without Redis, or while it is unavailable,
+registries are reloaded once they are LOCAL_TIMEOUT seconds old instead.
+
+A registry loaded inside a transaction may hold its uncommitted changes, so it is only used
+inside transactions, and reloaded by the first lookup made outside one.
+"""
+import logging
+import threading
+import time
+
+import redis
+
+from django.db import transaction
+
+from cogs3.cache import get_redis_connection
+from institution.models import Institution
+
+logger = logging.getLogger('apps')
+
+VERSION_KEY = 'institution:registry:version'
+# Seconds between checks of the shared registry version.
+VERSION_CHECK_INTERVAL = 1
+# Seconds a registry is used for when the shared registry version cannot be checked.
+LOCAL_TIMEOUT = 60
+
+_lock = threading.Lock()
+_registry = None
+
+
+class InstitutionRegistry(object):
+    """
+    Institutions keyed by lower case base domain and by identity provider entity ID.
+    """
+
+    def __init__(self, institutions, version=None, in_transaction=False):
+        """
+        Args:
+            institutions (iterable): Institutions to register.
+            version (int): Shared registry version the institutions were loaded at.
+            in_transaction (bool): Whether the institutions were loaded inside a transaction.
+        """
+        self.version = version
+        self.in_transaction = in_transaction
+        self.loaded = self.checked = time.monotonic()
+        self.by_domain = {}
+        self.by_identity_provider = {}
+        for institution in institutions:
+            if institution.base_domain:
+                self.by_domain[institution.base_domain.lower()] = institution
+            if institution.identity_provider:
+                self.by_identity_provider[institution.identity_provider] = institution
+
+    def get_by_domain(self, domain):
+        """
+        Return the institution whose base domain is domain, or the closest parent domain of it,
+        e.g. bangor.ac.uk for cs.bangor.ac.uk, or None.
+
+        Args:
+            domain (str): Domain name.
+        """
+        labels = domain.lower().split('.')
+        # Each suffix of the domain is a single dict lookup, longest first.
+        for i in range(len(labels)):
+            institution = self.by_domain.get('.'.join(labels[i:]))
+            if institution is not None:
+                return institution
+        return None
+
+    def get_by_email_address(self, email):
+        """
+        Return the institution of an email address's domain, or None.
+
+        Args:
+            email (str): Email address.
+        """
+        _, separator, domain = (email or '').rpartition('@')
+        if not separator or not domain:
+            return None
+        return self.get_by_domain(domain)
+
+    def get_by_identity_provider(self, identity_provider):
+        """
+        Return the institution of an identity provider entity ID, or None.
+
+        Args:
+            identity_provider (str): Identity provider entity ID.
+        """
+        return self.by_identity_provider.get(identity_provider)
+
+
+def _shared_version():
+    """
+    Return the shared registry version, or None if Redis is not configured or unavailable.
+    """
+    connection = get_redis_connection()
+    if connection is None:
+        return None
+    try:
+        return int(connection.get(VERSION_KEY) or 0)
+    except redis.exceptions.ConnectionError:
+        logger.warning('Unable to check the institution registry version.')
+        return None
+
+
+def get_registry():
+    """
+    Return the institution registry of the current process, reloading it if it has been
+    invalidated.
+    """
+    global _registry
+    in_transaction = transaction.get_connection().in_atomic_block
+    with _lock:
+        registry = _registry
+        if registry is not None and registry.in_transaction and not in_transaction:
+            # The transaction may have been rolled back.
+            registry = None
+        now = time.monotonic()
+        if registry is not None and now - registry.checked < VERSION_CHECK_INTERVAL:
+            return registry
+        version = _shared_version()
+        if registry is not None:
+            if version is None:
+                current = now - registry.loaded < LOCAL_TIMEOUT
+            else:
+                current = version == registry.version
+            if current:
+                registry.checked = now
+                return registry
+        _registry = InstitutionRegistry(Institution.objects.all(), version, in_transaction)
+        return _registry
+
+
+def clear():
+    """
+    Clear the registry of the current process.
+    """
+    global _registry
+    with _lock:
+        _registry = None
+
+
+def invalidate():
+    """
+    Clear the registry of every process.
+    """
+    clear()
+    connection = get_redis_connection()
+    if connection is not None:
+        try:
+            connection.incr(VERSION_KEY)
+        except redis.exceptions.ConnectionError:
+            logger.exception('Unable to invalidate the institution registry of other processes.')
@@ -0,0 +1,18 @@
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from institution import registry
+from institution.models import Institution
+
+
+@receiver(post_save, sender=Institution)
+@receiver(post_delete, sender=Institution)
+def invalidate_registry(sender, **kwargs):
+    # The registry of this process is cleared straight away, so the change is visible within
+    # the transaction, and the other processes are invalidated once it has been committed. A
+    # registry loaded with the uncommitted change is not used outside the transaction, see
+    # institution.registry.
+    registry.clear()
+    transaction.on_commit(registry.invalidate)
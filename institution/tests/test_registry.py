@@ -0,0 +1,135 @@
+import fakeredis
+import mock
+
+from django.test import TestCase
+
+from institution import registry
+from institution.exceptions import InvalidIndentityProvider
+from institution.exceptions import InvalidInstitution
+from institution.models import Institution
+from institution.tests.test_models import InstitutionTests
+
+
+class InstitutionRegistryTests(TestCase):
+
+    def setUp(self):
+        registry.clear()
+        self.institution = InstitutionTests.create_institution(
+            name='Bangor University',
+            base_domain='bangor.ac.uk',
+            identity_provider='https://idp.bangor.ac.uk/shibboleth',
+        )
+
+    def test_lookup_by_domain(self):
+        """
+        Ensure a domain, or one of its subdomains, is matched to its institution.
+        """
+        institutions = registry.get_registry()
+        self.assertEqual(institutions.get_by_domain('bangor.ac.uk'), self.institution)
+        self.assertEqual(institutions.get_by_domain('cs.Bangor.ac.uk'), self.institution)
+        self.assertIsNone(institutions.get_by_domain('ac.uk'))
+        self.assertIsNone(institutions.get_by_domain('notbangor.ac.uk'))
+
+    def test_lookup_by_email_address(self):
+        """
+        Ensure an email address is matched to the institution of its domain.
+        """
+        institutions = registry.get_registry()
+        self.assertEqual(institutions.get_by_email_address('user@cs.bangor.ac.uk'), self.institution)
+        self.assertIsNone(institutions.get_by_email_address('user@example.com'))
+        self.assertIsNone(institutions.get_by_email_address('bangor.ac.uk'))
+
+    def test_validation(self):
+        """
+        Ensure the Institution validators use the registry.
+        """
+        registry.get_registry()
+        with self.assertNumQueries(0):
+            self.assertTrue(Institution.is_valid_email_address('user@cs.bangor.ac.uk'))
+            self.assertTrue(Institution.is_valid_identity_provider(self.institution.identity_provider))
+            with self.assertRaises(InvalidInstitution):
+                Institution.is_valid_email_address('user@example.com')
+            with self.assertRaises(InvalidIndentityProvider):
+                Institution.is_valid_identity_provider('https://idp.example.com/shibboleth')
+
+    def test_registry_is_cleared_on_save(self):
+        """
+        Ensure saving or deleting an institution clears the registry of the current process.
+        """
+        registry.get_registry()
+        self.institution.base_domain = 'bangor.co.uk'
+        self.institution.save()
+        institutions = registry.get_registry()
+        self.assertIsNone(institutions.get_by_domain('bangor.ac.uk'))
+        self.assertEqual(institutions.get_by_domain('bangor.co.uk'), self.institution)
+
+        self.institution.delete()
+        self.assertIsNone(registry.get_registry().get_by_domain('bangor.co.uk'))
+
+    def test_registry_loaded_in_a_transaction_is_not_used_outside_it(self):
+        """
+        Ensure a registry that may hold uncommitted changes is reloaded outside its transaction.
+        """
+        institutions = registry.get_registry()
+        self.assertIs(registry.get_registry(), institutions)
+        with mock.patch('institution.registry.transaction.get_connection') as get_connection:
+            get_connection.return_value.in_atomic_block = False
+            self.assertIsNot(registry.get_registry(), institutions)
+
+    def test_registry_expires_without_redis(self):
+        """
+        Ensure registries are reloaded after LOCAL_TIMEOUT when the shared version is unknown.
+        """
+        institutions = registry.get_registry()
+        Institution.objects.bulk_create([Institution(name='Swansea University', base_domain='swansea.ac.uk')])
+        with mock.patch('time.monotonic', return_value=institutions.loaded + registry.LOCAL_TIMEOUT - 1):
+            self.assertIs(registry.get_registry(), institutions)
+        with mock.patch('time.monotonic', return_value=institutions.loaded + registry.LOCAL_TIMEOUT):
+            reloaded = registry.get_registry()
+        self.assertEqual(reloaded.get_by_domain('swansea.ac.uk').name, 'Swansea University')
+
+
+class InstitutionRegistryVersionTests(TestCase):
+
+    def setUp(self):
+        registry.clear()
+        self.connection = fakeredis.FakeStrictRedis()
+        self.connection.flushall()
+        patcher = mock.patch('institution.registry.get_redis_connection', return_value=self.connection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Run the callbacks of the test's transaction as if it had been committed.
+        patcher = mock.patch('django.db.transaction.on_commit', side_effect=lambda func: func())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(registry.clear)
+
+    def test_version_is_incremented_on_commit(self):
+        """
+        Ensure saving an institution invalidates the registry of other processes.
+        """
+        InstitutionTests.create_institution(
+            name='Bangor University',
+            base_domain='bangor.ac.uk',
+            identity_provider='https://idp.bangor.ac.uk/shibboleth',
+        )
+        self.assertEqual(int(self.connection.get(registry.VERSION_KEY)), 1)
+
+    def test_registry_is_reloaded_when_the_version_changes(self):
+        """
+        Ensure a registry is reloaded once another process has changed the version.
+        """
+        institutions = registry.get_registry()
+        with mock.patch('time.monotonic', return_value=institutions.checked):
+            self.assertIs(registry.get_registry(), institutions)
+
+        # A change made by another process.
+        Institution.objects.bulk_create([Institution(name='Swansea University', base_domain='swansea.ac.uk')])
+        self.connection.incr(registry.VERSION_KEY)
+
+        with mock.patch('time.monotonic', return_value=institutions.checked):
+            self.assertIs(registry.get_registry(), institutions)
+        with mock.patch('time.monotonic', return_value=institutions.checked + registry.VERSION_CHECK_INTERVAL):
+            reloaded = registry.get_registry()
+        self.assertIsNot(reloaded, institutions)
+        self.assertEqual(reloaded.get_by_domain('swansea.ac.uk').name, 'Swansea University')
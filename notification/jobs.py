@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.mail import send_mail
+from django_rq import job
+
+from cogs3.cache import get_redis_connection
+
+
+@job('default')
+def send_notification(email_address, subject, message):
+    """
+    Email a notification to a user.
+
+    Args:
+        email_address (str): Email address - required
+        subject (str): Subject - required
+        message (str): Message - required
+    """
+    send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [email_address])
+
+
+def enqueue_notification(email_address, subject, message):
+    """
+    Send a notification from an RQ worker, or immediately without a configured RQ queue.
+    """
+    if get_redis_connection() is None:
+        send_notification(email_address, subject, message)
+    else:
+        send_notification.delay(email_address, subject, message)
@@ -0,0 +1,157 @@
+import functools
+import logging
+
+import redis
+
+from django.conf import settings
+
+from cogs3.cache import RedisCache
+from cogs3.cache import get_redis_connection
+
+logger = logging.getLogger('openldap')
+
+
+def get_cache():
+    """
+    Return the directory user cache, or None if Redis has not been configured for RQ.
+
+    Directory changes are applied by RQ workers, see openldap.jobs, so only a cache shared by
+    every process can be invalidated by them. Lookups are not cached without one.
+    """
+    if settings.OPENLDAP_CACHE_TIMEOUT <= 0:
+        return None
+    connection = get_redis_connection()
+    if connection is None:
+        return None
+    return RedisCache(connection, prefix='openldap:', timeout=settings.OPENLDAP_CACHE_TIMEOUT)
+
+
+def _email_key(email_address):
+    return ''.join(['user:', email_address.lower()])
+
+
+def _uid_key(user_id):
+    return ''.join(['uid:', user_id])
+
+
+def _keys_key(email_address):
+    # The keys written by set_user for an account, so they can all be invalidated together.
+    return ''.join(['keys:', email_address.lower()])
+
+
+def fails_open(func):
+    """
+    Log Redis connection errors raised by func and return None, so directory lookups and writes
+    carry on without the cache while Redis is unavailable.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except redis.exceptions.ConnectionError:
+            logger.exception('Directory user cache unavailable, %s skipped', func.__name__)
+            return None
+
+    return wrapper
+
+
+@fails_open
+def get_user_by_id(user_id):
+    """
+    Return the cached get user response for a user id, or None.
+
+    Args:
+        user_id (str): User id - required
+    """
+    cache = get_cache()
+    if cache is None:
+        return None
+    email_address = cache.get(_uid_key(user_id))
+    if email_address is None:
+        return None
+    return cache.get(_email_key(email_address))
+
+
+@fails_open
+def get_user_by_email_address(email_address):
+    """
+    Return the cached get user response for an email address, or None.
+
+    Args:
+        email_address (str): Email address - required
+    """
+    cache = get_cache()
+    if cache is None:
+        return None
+    return cache.get(_email_key(email_address))
+
+
+@fails_open
+def set_user(response, email_address=None):
+    """
+    Cache a get user response.
+
+    Entries are keyed by the account's email address, and by the email address it was looked up
+    by if that differs. User ids resolve to the account's email address. The keys written are
+    recorded against each email address, so invalidating either removes all of them.
+
+    A response without an email address or user id is not cached.
+
+    Args:
+        response (dict): Decoded get user response - required
+        email_address (str): Email address the user was looked up by - optional
+    """
+    cache = get_cache()
+    if cache is None:
+        return
+    try:
+        entry = response['data']['0']
+        mail = entry['mail']['0']
+        user_id = entry['uid']['0']
+    except (KeyError, TypeError):
+        logger.warning('Not caching malformed get user response for %s', email_address or 'user id lookup')
+        return
+    addresses = [mail]
+    if email_address and email_address.lower() != mail.lower():
+        addresses.append(email_address)
+    keys = [_uid_key(user_id)]
+    for address in addresses:
+        keys.extend([_email_key(address), _keys_key(address)])
+    # Keep the keys of aliases the account was looked up by before.
+    keys.extend(key for key in cache.get(_keys_key(mail)) or [] if key not in keys)
+    for address in addresses:
+        cache.set(_email_key(address), response)
+        cache.set(_keys_key(address), keys)
+    cache.set(_uid_key(user_id), mail)
+
+
+@fails_open
+def invalidate_user(email_address):
+    """
+    Remove a user's cached response, and every other key cached with it.
+
+    Args:
+        email_address (str): Email address - required
+    """
+    cache = get_cache()
+    if cache is None:
+        return
+    keys = cache.get(_keys_key(email_address)) or []
+    cache.delete(_email_key(email_address), _keys_key(email_address), *keys)
+
+
+def invalidates_user(func):
+    """
+    Invalidate the cached response of the account whose email address is passed as the first
+    argument to func, once func has returned or raised.
+    """
+
+    @functools.wraps(func)
+    def wrapper(email_address, *args, **kwargs):
+        try:
+            return func(email_address, *args, **kwargs)
+        finally:
+            invalidate_user(email_address)
+
+    return wrapper
@@ -0,0 +1,107 @@
+import os
+import threading
+
+import requests
+
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from openldap.throttle import throttle
+
+_lock = threading.Lock()
+_client = None
+
+
+class OpenLDAPClient(object):
+    """
+    A pooled, keep-alive HTTP client for the OpenLDAP REST API.
+
+    Connections to the OpenLDAP host are held in a urllib3 connection pool and reused between
+    calls, so back-to-back directory requests do not pay for a new TCP and TLS handshake.
+    """
+
+    def __init__(self, host, pool_size=10, timeouts=None):
+        """
+        Args:
+            host (str): OpenLDAP REST API base url, including a trailing slash.
+            pool_size (int): Maximum number of connections kept alive to the host.
+            timeouts (dict): Request timeout in seconds, keyed by endpoint name. The 'default'
+                key is used for endpoints without an explicit timeout.
+        """
+        self.host = host
+        self.pool_size = pool_size
+        self.timeouts = timeouts or {}
+        self.session = requests.Session()
+        self.session.headers.update({'Cache-Control': 'no-cache'})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get_timeout(self, endpoint):
+        """
+        Return the request timeout for an endpoint.
+
+        Args:
+            endpoint (str): Endpoint name e.g. 'list_users'.
+        """
+        return self.timeouts.get(endpoint, self.timeouts.get('default', 5))
+
+    def request(self, method, endpoint, path):
+        """
+        Issue a request to the OpenLDAP REST API, once allowed by the global throttle.
+
+        Args:
+            method (str): HTTP method e.g. 'get'.
+            endpoint (str): Endpoint name, used to select the request timeout.
+            path (str): Path relative to the OpenLDAP host.
+        """
+        url = ''.join([self.host, path])
+        timeout = self.get_timeout(endpoint)
+        # requests applies the timeout to connecting and to each read, allow for both.
+        with throttle(endpoint, lease=2 * timeout):
+            return getattr(self.session, method)(
+                url,
+                timeout=timeout,
+            )
+
+    def get(self, endpoint, path):
+        return self.request('get', endpoint, path)
+
+    def post(self, endpoint, path):
+        return self.request('post', endpoint, path)
+
+    def put(self, endpoint, path):
+        return self.request('put', endpoint, path)
+
+    def delete(self, endpoint, path):
+        return self.request('delete', endpoint, path)
+
+    def close(self):
+        self.session.close()
+
+
+def get_client():
+    """
+    Return the OpenLDAPClient shared by the current process.
+
+    A new client is created after a fork (e.g. gunicorn or RQ workers), so pooled sockets are
+    never shared between processes, and whenever the OpenLDAP settings change.
+    """
+    global _client
+    config = (
+        os.getpid(),
+        settings.OPENLDAP_HOST,
+        settings.OPENLDAP_POOL_SIZE,
+        tuple(sorted(settings.OPENLDAP_TIMEOUTS.items())),
+    )
+    with _lock:
+        if _client is None or _client[0] != config:
+            if _client is not None and _client[0][0] == config[0]:
+                _client[1].close()
+            client = OpenLDAPClient(
+                host=settings.OPENLDAP_HOST,
+                pool_size=settings.OPENLDAP_POOL_SIZE,
+                timeouts=settings.OPENLDAP_TIMEOUTS,
+            )
+            _client = (config, client)
+        return _client[1]
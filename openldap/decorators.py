@@ -1,27 +1,157 @@
 import functools
+import random
+import threading
+import time
+
 import jsonschema
 import requests
 
+from django.conf import settings
+
+from openldap.exceptions import CircuitBreakerOpen
+from openldap.exceptions import ThrottleTimeout
+from openldap.metrics import record_latency
+
+
+class CircuitBreaker(object):
+    """
+    Stop calling the OpenLDAP REST API once it is unhealthy.
+
+    The breaker opens after OPENLDAP_CIRCUIT_BREAKER_THRESHOLD consecutive failures, and calls
+    fail fast while it is open. After OPENLDAP_CIRCUIT_BREAKER_RESET_TIMEOUT seconds it goes
+    half-open and lets a single probe call through: the breaker closes if the probe succeeds
+    and opens again if it fails.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.state = CircuitBreaker.CLOSED
+            self.failures = 0
+            self.opened_at = None
+
+    def allow_request(self):
+        with self._lock:
+            if self.state == CircuitBreaker.CLOSED:
+                return True
+            if self.state == CircuitBreaker.OPEN:
+                if time.monotonic() - self.opened_at >= settings.OPENLDAP_CIRCUIT_BREAKER_RESET_TIMEOUT:
+                    # Let this call through as the probe, fail any others until it completes.
+                    self.state = CircuitBreaker.HALF_OPEN
+                    return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = CircuitBreaker.CLOSED
+            self.failures = 0
+
+    def release_probe(self):
+        """
+        Free the probe slot of a half-open breaker whose probe was never sent, so the next call
+        is let through as the probe.
+        """
+        with self._lock:
+            if self.state == CircuitBreaker.HALF_OPEN:
+                self.state = CircuitBreaker.OPEN
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == CircuitBreaker.HALF_OPEN or \
+                    self.failures >= settings.OPENLDAP_CIRCUIT_BREAKER_THRESHOLD:
+                self.state = CircuitBreaker.OPEN
+                self.opened_at = time.monotonic()
+
+
+circuit_breaker = CircuitBreaker()
+
+
+def is_transport_failure(exception):
+    """
+    Return True if an exception shows the OpenLDAP REST API is unavailable, rather than that
+    it answered the request with an error.
+    """
+    if isinstance(exception, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    if isinstance(exception, requests.exceptions.HTTPError):
+        response = exception.response
+        return response is None or response.status_code >= 500
+    return False
+
+
+def backoff(attempt):
+    """
+    Return a jittered, exponentially increasing delay in seconds before retrying an attempt.
+    """
+    return random.uniform(0, settings.OPENLDAP_RETRY_BACKOFF * 2**attempt)
+
+
+def log_exception(logger, exception):
+    if isinstance(exception, jsonschema.exceptions.ValidationError):
+        logger.exception('Invalid json schema Exception')
+    elif isinstance(exception, requests.exceptions.ConnectionError):
+        logger.exception('ConnectionError Exception')
+    elif isinstance(exception, requests.exceptions.Timeout):
+        logger.exception('Timeout Exception')
+    elif isinstance(exception, requests.exceptions.HTTPError):
+        logger.exception('HTTPError Exception')
+    elif isinstance(exception, ThrottleTimeout):
+        logger.exception('ThrottleTimeout Exception')
+
+
+def OpenLDAPException(logger, endpoint=None, idempotent=False):
+    """
+    Log OpenLDAP REST API errors, guard calls with the circuit breaker and record per endpoint
+    latencies.
 
-def OpenLDAPException(logger):
+    Args:
+        logger (logging.Logger): Logger errors are reported to.
+        endpoint (str): Endpoint name latencies are recorded under, defaults to the name of the
+            decorated function.
+        idempotent (bool): Retry transport failures up to OPENLDAP_RETRY_ATTEMPTS times, with
+            jittered exponential backoff. Only safe for calls without side effects.
+    """
 
     def decorator(func):
+        name = endpoint or func.__name__
 
+        @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            try:
-                return func(*args, **kwargs)
-            except jsonschema.exceptions.ValidationError:
-                logger.exception('Invalid json schema Exception')
-                raise
-            except requests.exceptions.ConnectionError:
-                logger.exception('ConnectionError Exception')
-                raise
-            except requests.exceptions.Timeout:
-                logger.exception('Timeout Exception')
-                raise
-            except requests.exceptions.HTTPError:
-                logger.exception('HTTPError Exception')
-                raise
+            attempts = 1 + (settings.OPENLDAP_RETRY_ATTEMPTS if idempotent else 0)
+            for attempt in range(attempts):
+                if not circuit_breaker.allow_request():
+                    logger.warning('Circuit breaker open, %s not attempted', name)
+                    raise CircuitBreakerOpen('The OpenLDAP circuit breaker is open.')
+                start = time.monotonic()
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as e:
+                    record_latency(name, time.monotonic() - start)
+                    if isinstance(e, ThrottleTimeout):
+                        # The request was never sent, so says nothing of the API's health.
+                        circuit_breaker.release_probe()
+                        log_exception(logger, e)
+                        raise
+                    if not is_transport_failure(e):
+                        circuit_breaker.record_success()
+                        log_exception(logger, e)
+                        raise
+                    circuit_breaker.record_failure()
+                    if attempt + 1 < attempts:
+                        time.sleep(backoff(attempt))
+                        continue
+                    log_exception(logger, e)
+                    raise
+                record_latency(name, time.monotonic() - start)
+                circuit_breaker.record_success()
+                return result
 
         return wrapper
 
@@ -0,0 +1,16 @@
+import requests
+
+
+class CircuitBreakerOpen(requests.exceptions.ConnectionError):
+    """
+    Raised instead of calling the OpenLDAP REST API while its circuit breaker is open.
+    """
+    pass
+
+
+class ThrottleTimeout(requests.exceptions.RequestException):
+    """
+    Raised when a request to the OpenLDAP REST API is not allowed by the global throttle within
+    OPENLDAP_THROTTLE_TIMEOUT seconds.
+    """
+    pass
@@ -0,0 +1,238 @@
+"""
+A local stand-in for the OpenLDAP REST API, for development, testing and benchmarking.
+
+Responses are signed with security.json_web_token.JSONWebToken, using the OPENLDAP_JWT_*
+settings, so they are accepted by openldap.util.decode_response.
+"""
+import random
+import re
+import socketserver
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler
+from http.server import HTTPServer
+
+from django.conf import settings
+
+from security.json_web_token import JSONWebToken
+
+
+class FakeDirectory(object):
+    """
+    An in-memory directory of user accounts.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.users = {}
+        self.uids_by_mail = {}
+        self.disabled = set()
+
+    @classmethod
+    def populate(cls, count, domain='example.ac.uk'):
+        """
+        Return a directory holding count users, x.user.0 to x.user.<count - 1>.
+        """
+        directory = cls()
+        for i in range(count):
+            directory.add_user(
+                uid='x.user.{}'.format(i),
+                mail='user.{}@{}'.format(i, domain),
+                displayname='User {}'.format(i),
+                uidnumber=str(5000000 + i),
+            )
+        return directory
+
+    def add_user(self, uid, mail, displayname, uidnumber, telephone='00000-000000'):
+        with self._lock:
+            self.users[uid] = {
+                'uid': uid,
+                'mail': mail,
+                'displayname': displayname,
+                'uidnumber': uidnumber,
+                'telephone': telephone,
+            }
+            self.uids_by_mail[mail.lower()] = uid
+
+    def get_user(self, user_id):
+        """
+        Return a user by user id or email address, or None.
+        """
+        uid = self.uids_by_mail.get(user_id.lower(), user_id)
+        return self.users.get(uid)
+
+    def list_uids(self):
+        with self._lock:
+            return sorted(uid for uid in self.users if uid not in self.disabled)
+
+    def disable(self, user):
+        with self._lock:
+            self.disabled.add(user['uid'])
+
+    def enable(self, user):
+        with self._lock:
+            self.disabled.discard(user['uid'])
+
+
+def _attribute(value):
+    return {'0': value, 'count': 1}
+
+
+def user_entry(user):
+    """
+    Return a user in the nested LDAP style format returned by the OpenLDAP REST API.
+    """
+    return {
+        'uid': _attribute(user['uid']),
+        'mail': _attribute(user['mail']),
+        'displayname': _attribute(user['displayname']),
+        'gidNumber': _attribute(user['uidnumber']),
+        'uidnumber': _attribute(user['uidnumber']),
+        'telephone': user['telephone'],
+    }
+
+
+class FakeOpenLDAPRequestHandler(BaseHTTPRequestHandler):
+    # Keep connections alive, as the real API does, so pooled clients can reuse them.
+    protocol_version = 'HTTP/1.1'
+    # Send responses immediately, rather than waiting on the client's delayed ACK.
+    disable_nagle_algorithm = True
+
+    routes = (
+        ('GET', re.compile(r'^/user/$'), 'list_users'),
+        ('POST', re.compile(r'^/user/resetPassword/(?P<user_id>[^/]+)/$'), 'reset_user_password'),
+        ('PUT', re.compile(r'^/user/enable/(?P<user_id>[^/]+)/$'), 'enable_user_account'),
+        ('GET', re.compile(r'^/user/(?P<user_id>[^/]+)/$'), 'get_user'),
+        ('DELETE', re.compile(r'^/user/(?P<user_id>[^/]+)/$'), 'delete_user'),
+    )
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def do_PUT(self):
+        self.dispatch('PUT')
+
+    def do_DELETE(self):
+        self.dispatch('DELETE')
+
+    def dispatch(self, method):
+        server = self.server
+        if server.latency:
+            time.sleep(random.uniform(0, 2 * server.latency))
+        if server.error_rate and random.random() < server.error_rate:
+            return self.send(503, b'Service Unavailable')
+        for route_method, pattern, name in self.routes:
+            match = pattern.match(self.path)
+            if route_method == method and match:
+                return getattr(self, name)(**match.groupdict())
+        self.send(404, b'Not Found')
+
+    def list_users(self):
+        data = {str(i): uid for i, uid in enumerate(self.server.directory.list_uids())}
+        data.update({'error': '', 'count': len(data)})
+        self.send_data(data)
+
+    def get_user(self, user_id):
+        user = self.server.directory.get_user(user_id)
+        if user is None:
+            return self.send(404, b'Not Found')
+        self.send_data({'0': user_entry(user), 'error': '', 'count': 1})
+
+    def delete_user(self, user_id):
+        self.update_user(user_id, self.server.directory.disable)
+
+    def enable_user_account(self, user_id):
+        self.update_user(user_id, self.server.directory.enable)
+
+    def reset_user_password(self, user_id):
+        self.update_user(user_id, lambda user: None)
+
+    def update_user(self, user_id, update):
+        user = self.server.directory.get_user(user_id)
+        if user is None:
+            return self.send(404, b'Not Found')
+        update(user)
+        self.send_data({'0': user_entry(user), 'error': '', 'count': 1})
+
+    def send_data(self, data):
+        now = int(time.time())
+        payload = {
+            'iss': settings.OPENLDAP_JWT_ISSUER,
+            'aud': settings.OPENLDAP_JWT_AUDIENCE,
+            'iat': now,
+            'nbf': now - 600,
+            'data': data,
+        }
+        self.send(200, JSONWebToken.encode(data=payload, key=settings.OPENLDAP_JWT_KEY))
+
+    def send(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/jwt')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeOpenLDAPServer(socketserver.ThreadingMixIn, HTTPServer):
+    """
+    A threaded HTTP server serving a FakeDirectory.
+
+    Usable as a context manager, which serves requests from a background thread:
+
+        with FakeOpenLDAPServer(FakeDirectory.populate(1000)) as server:
+            settings.OPENLDAP_HOST = server.url
+    """
+    daemon_threads = True
+
+    def __init__(self, directory, host='127.0.0.1', port=0, latency=0, error_rate=0, verbose=False):
+        """
+        Args:
+            directory (FakeDirectory): Directory served.
+            host (str): Address to listen on.
+            port (int): Port to listen on, 0 picks a free port.
+            latency (float): Mean latency added to each response in seconds.
+            error_rate (float): Fraction of requests answered with a 503 response.
+            verbose (bool): Log each request to stderr.
+        """
+        super().__init__((host, port), FakeOpenLDAPRequestHandler)
+        self.directory = directory
+        self.latency = latency
+        self.error_rate = error_rate
+        self.verbose = verbose
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address
+        return 'http://{}:{}/'.format(host, port)
+
+    def start(self):
+        """
+        Serve requests from a background thread.
+        """
+        self._thread = threading.Thread(
+            target=self.serve_forever,
+            kwargs={'poll_interval': 0.05},
+            daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
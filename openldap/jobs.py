@@ -0,0 +1,180 @@
+import logging
+import time
+
+import django_rq
+
+from django_rq import job
+
+from cogs3.cache import get_redis_connection
+from openldap import sync
+from openldap import user_api
+from openldap.decorators import backoff
+
+logger = logging.getLogger('openldap')
+
+ENABLE = sync.ENABLE
+DELETE = sync.DELETE
+RESET_PASSWORD = 'reset_password'
+
+ACCOUNT_OPERATIONS = (
+    ENABLE,
+    DELETE,
+    RESET_PASSWORD,
+)
+
+# Seconds a pending account operation is kept for, should its job never run.
+PENDING_TIMEOUT = 24 * 60 * 60
+
+# Number of times a job is run before the operations of an account are left pending until its
+# next request.
+ACCOUNT_OPERATION_ATTEMPTS = 5
+
+
+@job('default')
+def sync_directory(full=False, dry_run=False, batch_size=50, concurrency=None):
+    """
+    Reconcile user profiles with the OpenLDAP directory.
+    """
+    result = sync.run(
+        full=full,
+        dry_run=dry_run,
+        batch_size=batch_size,
+        concurrency=concurrency,
+    )
+    return {
+        'skipped': result.skipped,
+        'profiles_checked': result.profiles_checked,
+        'operations': len(result.operations),
+        'errors': len(result.errors),
+        'unsupported': len(result.unsupported),
+    }
+
+
+def _pending_key(email_address):
+    return 'openldap:pending:{}'.format(email_address.lower())
+
+
+def _queued_key(email_address):
+    return 'openldap:queued:{}'.format(email_address.lower())
+
+
+def _job_id(email_address):
+    return 'openldap-account-{}'.format(email_address.lower())
+
+
+def _slot(operation):
+    # Enabling and deleting set the state of the account, so the latest request replaces any
+    # earlier one. Password resets are independent of the account state.
+    return 'state' if operation in (ENABLE, DELETE) else operation
+
+
+def enqueue_account_operation(email_address, operation):
+    """
+    Request a directory operation on an account without waiting for the directory.
+
+    While a job for the account is queued, further requests only update the operations it
+    will apply: repeated requests are deduplicated and a burst of enable and delete requests
+    collapses into the most recent one. Returns True if a new job was enqueued.
+
+    Without a configured RQ queue the operation is applied immediately.
+
+    Args:
+        email_address (str): Email address - required
+        operation (str): One of ACCOUNT_OPERATIONS - required
+    """
+    if operation not in ACCOUNT_OPERATIONS:
+        raise ValueError('Unknown account operation: {}'.format(operation))
+
+    connection = get_redis_connection()
+    if connection is None:
+        apply_operations(email_address, {_slot(operation): operation})
+        return False
+
+    pipeline = connection.pipeline()
+    pipeline.hset(_pending_key(email_address), _slot(operation), operation)
+    pipeline.expire(_pending_key(email_address), PENDING_TIMEOUT)
+    pipeline.set(_queued_key(email_address), 1, nx=True, ex=PENDING_TIMEOUT)
+    queued = pipeline.execute()[-1]
+    if not queued:
+        return False
+
+    queue = django_rq.get_queue('default')
+    try:
+        queue.enqueue_call(
+            func=apply_account_operations,
+            args=(email_address, ),
+            job_id=_job_id(email_address),
+        )
+    except Exception:
+        connection.delete(_queued_key(email_address))
+        raise
+    return True
+
+
+def apply_account_operations(email_address, attempt=0):
+    """
+    Apply the operations pending for an account.
+
+    If the directory call fails the claimed operations are returned to the account's pending
+    operations and, unless a job for the account has been enqueued since, a retry is enqueued
+    which waits for a jittered backoff before it runs. After ACCOUNT_OPERATION_ATTEMPTS attempts
+    the operations are left pending, so they are applied by the account's next job, or when the
+    failed job is requeued.
+
+    Args:
+        email_address (str): Email address - required
+        attempt (int): Number of earlier attempts.
+    """
+    if attempt:
+        time.sleep(backoff(attempt))
+    connection = get_redis_connection()
+    # Claim the pending operations and clear the queued flag atomically, so a request made
+    # from here on enqueues a new job rather than being lost.
+    pipeline = connection.pipeline()
+    pipeline.hgetall(_pending_key(email_address))
+    pipeline.delete(_pending_key(email_address))
+    pipeline.delete(_queued_key(email_address))
+    pending = pipeline.execute()[0]
+    operations = {key.decode(): value.decode() for key, value in pending.items()}
+    try:
+        apply_operations(email_address, operations)
+    except Exception:
+        # Operations requested since they were claimed are newer, so they are kept.
+        retry = attempt + 1 < ACCOUNT_OPERATION_ATTEMPTS
+        pipeline = connection.pipeline()
+        for slot, operation in operations.items():
+            pipeline.hsetnx(_pending_key(email_address), slot, operation)
+        pipeline.expire(_pending_key(email_address), PENDING_TIMEOUT)
+        if retry:
+            pipeline.set(_queued_key(email_address), 1, nx=True, ex=PENDING_TIMEOUT)
+        queued = pipeline.execute()[-1]
+        if retry and queued:
+            try:
+                # The retry is not given the account's job id, which is still held by this job.
+                django_rq.get_queue('default').enqueue_call(
+                    func=apply_account_operations,
+                    args=(email_address, attempt + 1),
+                )
+            except Exception:
+                connection.delete(_queued_key(email_address))
+                logger.exception('Failed to queue a retry of the operations of account %s.', email_address)
+        raise
+
+
+def apply_operations(email_address, operations):
+    """
+    Apply a set of coalesced operations to an account.
+
+    Args:
+        email_address (str): Email address - required
+        operations (dict): Operations keyed by slot.
+    """
+    state = operations.get('state')
+    if state == DELETE:
+        # Resetting the password of a deactivated account is moot.
+        user_api.delete_user(email_address)
+        return
+    if state == ENABLE:
+        user_api.enable_user_account(email_address)
+    if RESET_PASSWORD in operations:
+        user_api.reset_user_password(email_address)
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+
+from openldap.fake_server import FakeDirectory
+from openldap.fake_server import FakeOpenLDAPServer
+
+
+class Command(BaseCommand):
+    help = 'Run a local stand-in for the OpenLDAP REST API.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8001)
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=1000,
+            help='Number of users in the directory.',
+        )
+        parser.add_argument(
+            '--latency',
+            type=float,
+            default=0,
+            help='Mean latency added to each response in seconds.',
+        )
+        parser.add_argument(
+            '--error-rate',
+            type=float,
+            default=0,
+            help='Fraction of requests answered with a 503 response.',
+        )
+
+    def handle(self, *args, **options):
+        server = FakeOpenLDAPServer(
+            FakeDirectory.populate(options['users']),
+            host=options['host'],
+            port=options['port'],
+            latency=options['latency'],
+            error_rate=options['error_rate'],
+            verbose=options['verbosity'] > 1,
+        )
+        self.stdout.write(
+            self.style.SUCCESS('Serving {} users at {}, set OPENLDAP_HOST to this url.'.format(
+                options['users'], server.url)))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand
+
+from openldap import jobs
+from openldap import sync
+
+
+class Command(BaseCommand):
+    help = 'Reconcile user profiles with the OpenLDAP directory.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Ignore the last checkpoint and reconcile every profile.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List the required directory operations without applying them.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Number of directory operations applied per batch.',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=None,
+            help='Maximum number of directory calls in flight.',
+        )
+        parser.add_argument(
+            '--enqueue',
+            action='store_true',
+            help='Run the reconciliation as an RQ job on the default queue.',
+        )
+
+    def handle(self, *args, **options):
+        kwargs = {
+            'full': options['full'],
+            'dry_run': options['dry_run'],
+            'batch_size': options['batch_size'],
+            'concurrency': options['concurrency'],
+        }
+        if options['enqueue']:
+            job = jobs.sync_directory.delay(**kwargs)
+            self.stdout.write(self.style.SUCCESS('Enqueued directory reconciliation job: ' + job.id))
+            return
+
+        result = sync.run(**kwargs)
+        if result.skipped:
+            self.stdout.write(self.style.SUCCESS('No changes since the last reconciliation.'))
+            return
+
+        for operation in result.operations:
+            if operation in result.errors:
+                self.stdout.write(self.style.ERROR('Failed to {} {}'.format(operation.action, operation.email)))
+            elif operation in result.unsupported:
+                self.stdout.write(self.style.WARNING('Cannot {} {}: not supported'.format(
+                    operation.action,
+                    operation.email,
+                )))
+            else:
+                self.stdout.write('{} {}'.format(operation.action, operation.email))
+        self.stdout.write(
+            self.style.SUCCESS('Checked {} profiles, {} operations{}, {} failed, {} not supported.'.format(
+                result.profiles_checked,
+                len(result.operations),
+                ' (dry run)' if options['dry_run'] else '',
+                len(result.errors),
+                len(result.unsupported),
+            )))
@@ -0,0 +1,102 @@
+import threading
+
+# Upper bounds, in milliseconds, of the latency histogram buckets.
+LATENCY_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float('inf'))
+
+
+class LatencyHistogram(object):
+    """
+    A thread-safe histogram of request latencies.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        milliseconds = seconds * 1000
+        with self._lock:
+            for i, bound in enumerate(self.buckets):
+                if milliseconds <= bound:
+                    self.counts[i] += 1
+                    break
+            self.count += 1
+            self.total += milliseconds
+
+    def snapshot(self):
+        """
+        Return the histogram as a dict of bucket upper bound (ms) to count, alongside the total
+        number of observations and their mean in milliseconds.
+        """
+        with self._lock:
+            return {
+                'buckets': dict(zip(self.buckets, self.counts)),
+                'count': self.count,
+                'mean': self.total / self.count if self.count else 0.0,
+            }
+
+
+_lock = threading.Lock()
+_histograms = {}
+_throttle_wait_histograms = {}
+
+
+def _record(histograms, endpoint, seconds):
+    with _lock:
+        histogram = histograms.setdefault(endpoint, LatencyHistogram())
+    histogram.record(seconds)
+
+
+def _snapshot(histograms):
+    with _lock:
+        histograms = dict(histograms)
+    return {endpoint: histogram.snapshot() for endpoint, histogram in histograms.items()}
+
+
+def record_latency(endpoint, seconds):
+    """
+    Record the latency of a request to an endpoint.
+
+    Args:
+        endpoint (str): Endpoint name e.g. 'list_users'.
+        seconds (float): Request latency in seconds.
+    """
+    _record(_histograms, endpoint, seconds)
+
+
+def get_latency_histograms():
+    """
+    Return a snapshot of the current process's latency histograms, keyed by endpoint.
+    """
+    return _snapshot(_histograms)
+
+
+def reset_latency_histograms():
+    with _lock:
+        _histograms.clear()
+
+
+def record_throttle_wait(endpoint, seconds):
+    """
+    Record the time a request to an endpoint waited on openldap.throttle.
+
+    Args:
+        endpoint (str): Endpoint name e.g. 'list_users'.
+        seconds (float): Wait in seconds.
+    """
+    _record(_throttle_wait_histograms, endpoint, seconds)
+
+
+def get_throttle_wait_histograms():
+    """
+    Return a snapshot of the current process's throttle wait histograms, keyed by endpoint.
+    """
+    return _snapshot(_throttle_wait_histograms)
+
+
+def reset_throttle_wait_histograms():
+    with _lock:
+        _throttle_wait_histograms.clear()
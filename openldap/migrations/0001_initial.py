@@ -0,0 +1,26 @@
+# Generated by Django 2.0.2 on 2026-10-18 17:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DirectorySyncCheckpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True)),
+                ('directory_digest', models.CharField(help_text='SHA-1 digest of the directory user ids', max_length=40)),
+                ('directory_uids', models.TextField(blank=True, help_text='Newline separated directory user ids')),
+                ('profiles_synced_time', models.DateTimeField(help_text='Profiles modified after this time have not been reconciled')),
+                ('created_time', models.DateTimeField(auto_now_add=True)),
+                ('modified_time', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -1,3 +1,29 @@
 from django.db import models
 
-# Create your models here.
+
+class DirectorySyncCheckpoint(models.Model):
+    """
+    The state of the directory and of the portal's profiles at the end of the last successful
+    directory reconciliation run.
+    """
+    name = models.CharField(
+        max_length=64,
+        unique=True,
+    )
+    directory_digest = models.CharField(
+        max_length=40,
+        help_text='SHA-1 digest of the directory user ids',
+    )
+    directory_uids = models.TextField(
+        blank=True,
+        help_text='Newline separated directory user ids',
+    )
+    profiles_synced_time = models.DateTimeField(help_text='Profiles modified after this time have not been reconciled')
+    created_time = models.DateTimeField(auto_now_add=True)
+    modified_time = models.DateTimeField(auto_now=True)
+
+    def get_directory_uids(self):
+        return set(filter(None, self.directory_uids.split('\n')))
+
+    def __str__(self):
+        return self.name
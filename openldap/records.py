@@ -0,0 +1,91 @@
+"""
+Compact records for the nested LDAP style entries returned by the OpenLDAP REST API.
+
+An entry such as
+
+    {'uid': {'0': 'x.user', 'count': 1}, 'mail': {'0': 'user@example.ac.uk', 'count': 1}, ...}
+
+is parsed into a DirectoryUser holding just the attribute values, which takes a fraction of the
+memory of the decoded dicts.
+"""
+
+USER_ATTRIBUTES = (
+    'uid',
+    'mail',
+    'displayname',
+    'uidnumber',
+    'gidNumber',
+    'telephone',
+)
+
+
+class DirectoryUser(object):
+    """
+    A user account in the OpenLDAP directory.
+    """
+    __slots__ = USER_ATTRIBUTES
+
+    def __init__(self, uid, mail=None, displayname=None, uidnumber=None, gidNumber=None, telephone=None):
+        self.uid = uid
+        self.mail = mail
+        self.displayname = displayname
+        self.uidnumber = uidnumber
+        self.gidNumber = gidNumber
+        self.telephone = telephone
+
+    @classmethod
+    def from_entry(cls, entry):
+        """
+        Return a DirectoryUser for a directory entry.
+
+        Args:
+            entry (dict or str): Nested LDAP style entry, or a bare user id as listed by
+                list_users.
+        """
+        if isinstance(entry, str):
+            return cls(uid=entry)
+        return cls(**{attribute: _value(entry.get(attribute)) for attribute in USER_ATTRIBUTES})
+
+    def __eq__(self, other):
+        if not isinstance(other, DirectoryUser):
+            return NotImplemented
+        return all(getattr(self, attribute) == getattr(other, attribute) for attribute in USER_ATTRIBUTES)
+
+    def __hash__(self):
+        return hash(self.uid)
+
+    def __repr__(self):
+        return '<DirectoryUser: {}>'.format(self.uid)
+
+
+def _value(attribute):
+    # Multi valued attributes are nested as {'0': value, 'count': n}, only the first is used.
+    if isinstance(attribute, dict):
+        return attribute.get('0')
+    return attribute
+
+
+def parse_user(response):
+    """
+    Return the DirectoryUser in a decoded get_user_by_id or get_user_by_email_address response.
+
+    Args:
+        response (dict): Decoded response.
+    """
+    return DirectoryUser.from_entry(response['data']['0'])
+
+
+def iter_users(response, consume=False):
+    """
+    Lazily yield a DirectoryUser per entry in a decoded list_users response, in listing order.
+
+    Args:
+        response (dict): Decoded response.
+        consume (bool): Remove each entry from the response as it is yielded, so a large
+            listing is released entry by entry rather than held until the loop completes.
+    """
+    data = response['data']
+    keys = sorted((key for key in data if key.isdigit()), key=int)
+    for key in keys:
+        entry = data.pop(key) if consume else data[key]
+        yield DirectoryUser.from_entry(entry)
@@ -1,3 +1,5 @@
+from jsonschema.validators import validator_for
+
 list_users_schema = {
     "$schema": "http://json-schema.org/draft-06/schema#",
     "$ref": "#/definitions/ListUsers",
@@ -128,3 +130,18 @@ get_user_schema = {
         }
     }
 }
+
+
+def _compile(schema):
+    """
+    Check a schema against its meta-schema and return a validator for it, so the check and
+    the validator's $ref resolver are set up once rather than on every response.
+    """
+    cls = validator_for(schema)
+    cls.check_schema(schema)
+    return cls(schema)
+
+
+list_users_validator = _compile(list_users_schema)
+
+get_user_validator = _compile(get_user_schema)
@@ -0,0 +1,200 @@
+import collections
+import hashlib
+import logging
+
+from django.db.models import Q
+from django.utils import timezone
+
+from openldap import user_api
+from openldap.models import DirectorySyncCheckpoint
+from openldap.records import iter_users
+from users.models import Profile
+
+logger = logging.getLogger('openldap')
+
+CHECKPOINT_NAME = 'default'
+
+CREATE = 'create'
+ENABLE = 'enable'
+DELETE = 'delete'
+
+# Actions the sync applies. user_api.create_user is not implemented by the directory's REST API,
+# so create operations are reported, but not applied.
+SUPPORTED_ACTIONS = (ENABLE, DELETE)
+
+# Profile account statuses whose directory account should be deactivated.
+DEACTIVATED_STATUSES = (
+    Profile.REVOKED,
+    Profile.SUSPENDED,
+    Profile.CLOSED,
+)
+
+PROFILE_FIELDS = (
+    'user__email',
+    'user__first_name',
+    'user__last_name',
+    'phone',
+    'scw_username',
+    'account_status',
+)
+
+ProfileState = collections.namedtuple('ProfileState', [
+    'email',
+    'first_name',
+    'last_name',
+    'phone',
+    'scw_username',
+    'account_status',
+])
+
+Operation = collections.namedtuple('Operation', ['action', 'email'])
+
+SyncResult = collections.namedtuple('SyncResult', [
+    'operations',
+    'errors',
+    'unsupported',
+    'profiles_checked',
+    'skipped',
+])
+
+
+def directory_uids(response):
+    """
+    Return the set of user ids in a list_users response.
+
+    The response's entries are consumed as they are read, so only the user ids are kept.
+
+    Args:
+        response (dict): Decoded list_users response.
+    """
+    return {user.uid for user in iter_users(response, consume=True)}
+
+
+def directory_listing(uids):
+    """
+    Return the user ids as stored on DirectorySyncCheckpoint.directory_uids.
+    """
+    return '\n'.join(sorted(uids))
+
+
+def directory_digest(listing):
+    return hashlib.sha1(listing.encode()).hexdigest()
+
+
+def diff_profile(profile, uids):
+    """
+    Return the Operation required to bring the directory in line with a profile, or None.
+
+    Args:
+        profile (ProfileState): Profile state.
+        uids (set): User ids present in the directory.
+    """
+    if profile.account_status == Profile.APPROVED:
+        if not profile.scw_username:
+            return Operation(CREATE, profile.email)
+        if profile.scw_username not in uids:
+            return Operation(ENABLE, profile.email)
+    elif profile.account_status in DEACTIVATED_STATUSES:
+        if profile.scw_username and profile.scw_username in uids:
+            return Operation(DELETE, profile.email)
+    return None
+
+
+def changed_profiles(checkpoint, uids, since):
+    """
+    Stream the profiles that need to be reconciled against the directory.
+
+    Without a checkpoint every profile is returned. Otherwise only profiles modified since the
+    last run, whose user id appeared in or disappeared from the directory, or whose account has
+    yet to be created, are returned.
+    """
+    queryset = Profile.objects.all()
+    if checkpoint is not None:
+        changed_uids = uids.symmetric_difference(checkpoint.get_directory_uids())
+        queryset = queryset.filter(
+            Q(modified_time__gte=since) | Q(scw_username__in=changed_uids) |
+            # Create operations are not applied, see SUPPORTED_ACTIONS, so these profiles are
+            # never covered by the checkpoint.
+            Q(account_status=Profile.APPROVED, scw_username='')
+        )
+    for row in queryset.values_list(*PROFILE_FIELDS).iterator():
+        yield ProfileState(*row)
+
+
+def execute(operation):
+    """
+    Apply a single Operation, of one of the SUPPORTED_ACTIONS, to the directory.
+    """
+    if operation.action == DELETE:
+        return user_api.delete_user(operation.email)
+    return user_api.enable_user_account(operation.email)
+
+
+def run(full=False, dry_run=False, batch_size=50, concurrency=None):
+    """
+    Reconcile the portal's profiles with the OpenLDAP directory.
+
+    A run lists the directory once, diffs it against the profiles that may have changed since
+    the last checkpoint and applies only the required enable and delete operations, in
+    concurrent batches. The checkpoint is only advanced when every operation succeeds, so
+    failed operations are retried by the next run.
+
+    Create operations are returned in the result's unsupported operations and are not applied.
+    The profiles they belong to are reconciled again by every run.
+
+    Args:
+        full (bool): Ignore the checkpoint and reconcile every profile.
+        dry_run (bool): Compute the required operations without applying them.
+        batch_size (int): Number of operations applied per batch.
+        concurrency (int): Maximum number of directory calls in flight within a batch.
+    """
+    started = timezone.now()
+    uids = directory_uids(user_api.list_users())
+    listing = directory_listing(uids)
+    digest = directory_digest(listing)
+    checkpoint = None if full else DirectorySyncCheckpoint.objects.filter(name=CHECKPOINT_NAME).first()
+
+    if checkpoint is not None and checkpoint.directory_digest == digest:
+        if not Profile.objects.filter(modified_time__gte=checkpoint.profiles_synced_time).exists():
+            return SyncResult(operations=[], errors={}, unsupported=[], profiles_checked=0, skipped=True)
+
+    since = checkpoint.profiles_synced_time if checkpoint else None
+    profiles = {}
+    operations = []
+    for profile in changed_profiles(checkpoint, uids, since):
+        profiles[profile.email] = profile
+        operation = diff_profile(profile, uids)
+        if operation is not None:
+            operations.append(operation)
+
+    supported = [operation for operation in operations if operation.action in SUPPORTED_ACTIONS]
+    unsupported = [operation for operation in operations if operation.action not in SUPPORTED_ACTIONS]
+    for operation in unsupported:
+        logger.warning('Cannot %s directory account %s: not supported', operation.action, operation.email)
+
+    errors = {}
+    if not dry_run:
+        for i in range(0, len(supported), batch_size):
+            batch = supported[i:i + batch_size]
+            _, batch_errors = user_api._map_concurrently(execute, batch, concurrency)
+            errors.update(batch_errors)
+        for operation, error in errors.items():
+            logger.error('Failed to %s directory account %s: %s', operation.action, operation.email, error)
+
+        if not errors:
+            DirectorySyncCheckpoint.objects.update_or_create(
+                name=CHECKPOINT_NAME,
+                defaults={
+                    'directory_digest': digest,
+                    'directory_uids': listing,
+                    'profiles_synced_time': started,
+                },
+            )
+
+    return SyncResult(
+        operations=operations,
+        errors=errors,
+        unsupported=unsupported,
+        profiles_checked=len(profiles),
+        skipped=False,
+    )
@@ -0,0 +1,114 @@
+"""
+Load benchmark of openldap.user_api and directory provisioning against the fake OpenLDAP
+REST API in openldap.fake_server.
+
+Not collected by the default test run, run with:
+
+    python manage.py test openldap.tests.bench_user_api
+
+Directory sizes default to 1000 users and are set with OPENLDAP_BENCH_SIZES. Each response can
+be delayed by OPENLDAP_BENCH_LATENCY seconds on average, e.g.
+
+    OPENLDAP_BENCH_SIZES=1000,10000,100000 OPENLDAP_BENCH_LATENCY=0.005 \\
+        python manage.py test openldap.tests.bench_user_api
+"""
+import os
+import time
+
+from django.conf import settings
+from django.test import TestCase
+
+from openldap import sync
+from openldap import user_api
+from openldap.fake_server import FakeDirectory
+from openldap.fake_server import FakeOpenLDAPServer
+from openldap.tests.test_user_api import OpenLDAPTests
+from users.models import CustomUser
+from users.models import Profile
+
+SIZES = [int(size) for size in os.environ.get('OPENLDAP_BENCH_SIZES', '1000').split(',')]
+LATENCY = float(os.environ.get('OPENLDAP_BENCH_LATENCY', 0))
+# Number of individual lookups timed per directory size.
+LOOKUPS = int(os.environ.get('OPENLDAP_BENCH_LOOKUPS', 500))
+# Fraction of approved accounts that are disabled in the directory and must be enabled by a sync.
+DISABLED_FRACTION = 0.01
+
+
+class UserAPIBenchmark(OpenLDAPTests, TestCase):
+
+    def setUp(self):
+        super(UserAPIBenchmark, self).setUp()
+        settings.OPENLDAP_CACHE_TIMEOUT = 0
+
+    def _report(self, name, seconds, requests):
+        print('{:<40} {:>9.3f} s {:>10.0f} req/s'.format(name, seconds, requests / seconds))
+
+    def _timed(self, func):
+        start = time.perf_counter()
+        result = func()
+        return time.perf_counter() - start, result
+
+    def create_profiles(self, directory):
+        """
+        Create an approved profile for every user in the directory.
+        """
+        users = [
+            CustomUser(
+                username=user['mail'],
+                email=user['mail'],
+                is_shibboleth_login_required=False,
+            ) for user in directory.users.values()
+        ]
+        CustomUser.objects.bulk_create(users)
+        user_ids = dict(CustomUser.objects.values_list('email', 'id'))
+        profiles = [
+            Profile(
+                user_id=user_ids[user['mail']],
+                scw_username=uid,
+                account_status=Profile.APPROVED,
+            ) for uid, user in directory.users.items()
+        ]
+        Profile.objects.bulk_create(profiles)
+
+    def test_user_api_throughput(self):
+        for size in SIZES:
+            directory = FakeDirectory.populate(size)
+            uids = sorted(directory.users)[:LOOKUPS]
+            with FakeOpenLDAPServer(directory, latency=LATENCY) as server:
+                settings.OPENLDAP_HOST = server.url
+                print('\n{} users, {} lookups, {:.3f} s mean latency'.format(size, len(uids), LATENCY))
+
+                seconds, _ = self._timed(user_api.list_users)
+                self._report('list_users', seconds, 1)
+
+                seconds, _ = self._timed(lambda: [user_api.get_user_by_id(uid) for uid in uids])
+                self._report('get_user_by_id (serial)', seconds, len(uids))
+
+                seconds, (_, errors) = self._timed(lambda: user_api.get_users_by_ids(uids))
+                self.assertEqual(errors, {})
+                self._report('get_users_by_ids', seconds, len(uids))
+
+    def test_directory_sync_throughput(self):
+        for size in SIZES:
+            directory = FakeDirectory.populate(size)
+            self.create_profiles(directory)
+            for uid in sorted(directory.users)[:int(size * DISABLED_FRACTION)]:
+                directory.disable(directory.users[uid])
+            with FakeOpenLDAPServer(directory, latency=LATENCY) as server:
+                settings.OPENLDAP_HOST = server.url
+                print('\n{} users, {:.0%} disabled, {:.3f} s mean latency'.format(size, DISABLED_FRACTION, LATENCY))
+
+                seconds, result = self._timed(lambda: sync.run(full=True))
+                self.assertEqual(result.errors, {})
+                self._report('sync (full)', seconds, 1 + len(result.operations))
+
+                # Picks up the accounts enabled by the full run.
+                seconds, result = self._timed(sync.run)
+                self.assertEqual(result.operations, [])
+                self._report('sync (incremental)', seconds, 1)
+
+                seconds, result = self._timed(sync.run)
+                self.assertTrue(result.skipped)
+                self._report('sync (incremental, no changes)', seconds, 1)
+            Profile.objects.all().delete()
+            CustomUser.objects.all().delete()
@@ -0,0 +1,78 @@
+"""
+Micro-benchmark of the per-response cost of decoding and validating OpenLDAP responses.
+
+Not collected by the default test run, run with:
+
+    python manage.py test openldap.tests.bench_validation
+"""
+import timeit
+
+import jsonschema
+
+from django.conf import settings
+from django.test import TestCase
+from django.test import override_settings
+
+from openldap import schemas
+from openldap.util import decode_response
+from openldap.util import validate_response
+from openldap.tests.test_user_api import OpenLDAPTests
+from security.json_web_token import JSONWebToken
+
+
+class ValidationBenchmark(OpenLDAPTests, TestCase):
+    number = 2000
+
+    def setUp(self):
+        super(ValidationBenchmark, self).setUp()
+        self.response = self._mock_response(content=self._encode_user_response('x.joe.bloggs'))
+        users = {str(i): 'x.user.{}'.format(i) for i in range(1000)}
+        users.update({'error': '', 'count': len(users)})
+        data = {
+            'iss': settings.OPENLDAP_JWT_ISSUER,
+            'aud': settings.OPENLDAP_JWT_AUDIENCE,
+            'iat': 1525950885,
+            'nbf': 1525950285,
+            'data': users,
+        }
+        self.list_response = self._mock_response(
+            content=JSONWebToken.encode(data=data, key=settings.OPENLDAP_JWT_KEY))
+
+    def _report(self, name, func, number):
+        seconds = min(timeit.repeat(func, number=number, repeat=3))
+        print('{:<45} {:>10.1f} us/response'.format(name, seconds / number * 1e6))
+
+    def test_get_user_decode_and_validate(self):
+        print('\nget_user ({} responses)'.format(self.number))
+        self._report(
+            'decode only',
+            lambda: decode_response(self.response),
+            self.number,
+        )
+        self._report(
+            'decode + jsonschema.validate',
+            lambda: jsonschema.validate(decode_response(self.response), schemas.get_user_schema),
+            self.number,
+        )
+        for mode in ['full', 'sampled', 'off']:
+            with override_settings(OPENLDAP_VALIDATION_MODE=mode):
+                self._report(
+                    'decode + validate_response ({})'.format(mode),
+                    lambda: validate_response(decode_response(self.response), schemas.get_user_validator),
+                    self.number,
+                )
+
+    def test_list_users_decode_and_validate(self):
+        number = self.number // 10
+        print('\nlist_users, 1000 entries ({} responses)'.format(number))
+        self._report(
+            'decode + jsonschema.validate',
+            lambda: jsonschema.validate(decode_response(self.list_response), schemas.list_users_schema),
+            number,
+        )
+        with override_settings(OPENLDAP_VALIDATION_MODE='full'):
+            self._report(
+                'decode + validate_response (full)',
+                lambda: validate_response(decode_response(self.list_response), schemas.list_users_validator),
+                number,
+            )
@@ -0,0 +1,128 @@
+import mock
+import redis
+
+from django.conf import settings
+from django.test import TestCase
+
+from openldap import cache
+from openldap import user_api
+from openldap.tests.test_user_api import OpenLDAPTests
+
+
+class OpenLDAPUserCacheTests(OpenLDAPTests, TestCase):
+
+    @mock.patch('requests.Session.get')
+    def test_lookups_are_cached(self, mock_get):
+        """
+        Ensure repeated lookups of the same account, by user id or email address, are served
+        from the cache.
+        """
+        mock_get.return_value = self._mock_response(
+            status=200,
+            content=self._encode_user_response('x.joe.bloggs'),
+        )
+        response = user_api.get_user_by_id('x.joe.bloggs')
+        self.assertEqual(user_api.get_user_by_id('x.joe.bloggs'), response)
+        self.assertEqual(user_api.test_get_user_by_email_address('joe.bloggs@bangor.ac.uk'), response)
+        self.assertEqual(mock_get.call_count, 1)
+
+    @mock.patch('requests.Session.put')
+    @mock.patch('requests.Session.get')
+    def test_writes_invalidate_cached_lookups(self, mock_get, mock_put):
+        """
+        Ensure updating an account invalidates its cached lookups.
+        """
+        mock_get.return_value = self._mock_response(
+            status=200,
+            content=self._encode_user_response('x.joe.bloggs'),
+        )
+        mock_put.return_value = self._mock_response(
+            status=200,
+            content=self._encode_user_response('x.joe.bloggs'),
+        )
+        user_api.get_user_by_id('x.joe.bloggs')
+        user_api.enable_user_account('joe.bloggs@bangor.ac.uk')
+        self.assertIsNone(cache.get_user_by_id('x.joe.bloggs'))
+        user_api.get_user_by_id('x.joe.bloggs')
+        self.assertEqual(mock_get.call_count, 2)
+
+    @mock.patch('requests.Session.get')
+    def test_cache_can_be_disabled(self, mock_get):
+        """
+        Ensure every lookup reaches the directory when the cache timeout is 0.
+        """
+        settings.OPENLDAP_CACHE_TIMEOUT = 0
+        mock_get.return_value = self._mock_response(
+            status=200,
+            content=self._encode_user_response('x.joe.bloggs'),
+        )
+        user_api.get_user_by_id('x.joe.bloggs')
+        user_api.get_user_by_id('x.joe.bloggs')
+        self.assertEqual(mock_get.call_count, 2)
+
+    @mock.patch('requests.Session.get')
+    def test_cache_requires_redis(self, mock_get):
+        """
+        Ensure lookups are not cached in the process when Redis has not been configured, as
+        writes made by RQ workers could not invalidate them.
+        """
+        mock_get.return_value = self._mock_response(
+            status=200,
+            content=self._encode_user_response('x.joe.bloggs'),
+        )
+        with mock.patch('openldap.cache.get_redis_connection', return_value=None):
+            user_api.get_user_by_id('x.joe.bloggs')
+            user_api.get_user_by_id('x.joe.bloggs')
+        self.assertEqual(mock_get.call_count, 2)
+
+    @mock.patch('requests.Session.put')
+    @mock.patch('requests.Session.get')
+    def test_lookups_reach_the_directory_while_redis_is_unavailable(self, mock_get, mock_put):
+        """
+        Ensure Redis connection errors are logged and the directory is called instead.
+        """
+        mock_get.return_value = self._mock_response(
+            status=200,
+            content=self._encode_user_response('x.joe.bloggs'),
+        )
+        mock_put.return_value = self._mock_response(
+            status=200,
+            content=self._encode_user_response('x.joe.bloggs'),
+        )
+        connection = mock.Mock()
+        for method in ['get', 'setex', 'delete']:
+            getattr(connection, method).side_effect = redis.exceptions.ConnectionError
+        with mock.patch('openldap.cache.get_redis_connection', return_value=connection):
+            response = user_api.get_user_by_id('x.joe.bloggs')
+            self.assertEqual(user_api.test_get_user_by_email_address('joe.bloggs@bangor.ac.uk'), response)
+            self.assertEqual(user_api.enable_user_account('joe.bloggs@bangor.ac.uk'), response)
+        self.assertEqual(mock_get.call_count, 2)
+
+    @mock.patch('requests.Session.get')
+    def test_invalidation_removes_every_key(self, mock_get):
+        """
+        Ensure invalidating an account removes the entries of its user id and of the other email
+        addresses it was looked up by.
+        """
+        mock_get.return_value = self._mock_response(
+            status=200,
+            content=self._encode_user_response('x.joe.bloggs'),
+        )
+        response = user_api.test_get_user_by_email_address('Joe.Bloggs@bangor.ac.uk')
+        cache.set_user(response, email_address='joe.alias@bangor.ac.uk')
+        cache.set_user(response, email_address='j.bloggs@bangor.ac.uk')
+        self.assertEqual(cache.get_user_by_email_address('joe.alias@bangor.ac.uk'), response)
+
+        cache.invalidate_user('joe.bloggs@bangor.ac.uk')
+        self.assertIsNone(cache.get_user_by_id('x.joe.bloggs'))
+        self.assertIsNone(cache.get_user_by_email_address('joe.alias@bangor.ac.uk'))
+        self.assertIsNone(cache.get_user_by_email_address('j.bloggs@bangor.ac.uk'))
+        self.assertEqual(self.connection.keys('openldap:*'), [])
+
+    def test_malformed_response_is_not_cached(self):
+        """
+        Ensure a response without the account's email address or user id is not cached.
+        """
+        for response in [{}, {'data': {'0': {'uid': {'0': 'x.joe.bloggs'}}}}, {'data': None}]:
+            cache.set_user(response, email_address='joe.bloggs@bangor.ac.uk')
+        self.assertEqual(self.connection.keys('openldap:*'), [])
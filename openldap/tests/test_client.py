@@ -0,0 +1,64 @@
+import mock
+
+from django.conf import settings
+from django.test import TestCase
+
+from openldap.client import OpenLDAPClient
+from openldap.client import get_client
+
+
+class OpenLDAPClientTests(TestCase):
+
+    def setUp(self):
+        settings.OPENLDAP_HOST = 'https://example.com/'
+        settings.OPENLDAP_POOL_SIZE = 10
+        settings.OPENLDAP_TIMEOUTS = {
+            'default': 5,
+            'list_users': 30,
+        }
+
+    def test_client_is_shared(self):
+        """
+        Ensure the same client, and therefore connection pool, is returned for each call.
+        """
+        self.assertIs(get_client(), get_client())
+
+    def test_client_is_recreated_when_settings_change(self):
+        """
+        Ensure a new client is created when the OpenLDAP host or pool size changes.
+        """
+        client = get_client()
+        settings.OPENLDAP_POOL_SIZE = 20
+        updated_client = get_client()
+        self.assertIsNot(client, updated_client)
+        self.assertEqual(updated_client.pool_size, 20)
+
+    def test_client_pool_size(self):
+        """
+        Ensure the configured pool size is applied to the https connection pool.
+        """
+        client = OpenLDAPClient(host='https://example.com/', pool_size=25)
+        adapter = client.session.get_adapter('https://example.com/')
+        self.assertEqual(adapter._pool_maxsize, 25)
+
+    def test_client_endpoint_timeouts(self):
+        """
+        Ensure each endpoint uses its own timeout, falling back to the default timeout.
+        """
+        client = OpenLDAPClient(
+            host='https://example.com/',
+            timeouts={
+                'default': 5,
+                'list_users': 30,
+            },
+        )
+        self.assertEqual(client.get_timeout('list_users'), 30)
+        self.assertEqual(client.get_timeout('get_user_by_id'), 5)
+
+    @mock.patch('requests.Session.get')
+    def test_client_request(self, mock_get):
+        """
+        Ensure requests are issued against the OpenLDAP host with the endpoint's timeout.
+        """
+        get_client().get('list_users', 'user/')
+        mock_get.assert_called_once_with('https://example.com/user/', timeout=30)
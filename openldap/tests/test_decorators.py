@@ -0,0 +1,171 @@
+import logging
+
+import mock
+import requests
+
+from django.conf import settings
+from django.test import TestCase
+
+from openldap.decorators import CircuitBreaker
+from openldap.decorators import OpenLDAPException
+from openldap.decorators import circuit_breaker
+from openldap.exceptions import CircuitBreakerOpen
+from openldap.exceptions import ThrottleTimeout
+from openldap.metrics import get_latency_histograms
+from openldap.metrics import reset_latency_histograms
+
+logger = logging.getLogger('openldap')
+
+
+class OpenLDAPExceptionTests(TestCase):
+
+    def setUp(self):
+        settings.OPENLDAP_CIRCUIT_BREAKER_THRESHOLD = 3
+        settings.OPENLDAP_CIRCUIT_BREAKER_RESET_TIMEOUT = 30
+        settings.OPENLDAP_RETRY_ATTEMPTS = 2
+        settings.OPENLDAP_RETRY_BACKOFF = 0.2
+        circuit_breaker.reset()
+        reset_latency_histograms()
+
+    def tearDown(self):
+        settings.OPENLDAP_CIRCUIT_BREAKER_THRESHOLD = 100
+        settings.OPENLDAP_RETRY_ATTEMPTS = 0
+        circuit_breaker.reset()
+
+    def decorate(self, func, idempotent=False):
+        return OpenLDAPException(logger, endpoint='test_endpoint', idempotent=idempotent)(func)
+
+    def test_circuit_breaker_opens_after_consecutive_failures(self):
+        """
+        Ensure calls fail fast, without reaching the directory, once the breaker has opened.
+        """
+        func = mock.Mock(side_effect=requests.exceptions.ConnectionError('ConnectionError.'))
+        query = self.decorate(func)
+        for _ in range(3):
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                query()
+        self.assertEqual(circuit_breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitBreakerOpen):
+            query()
+        self.assertEqual(func.call_count, 3)
+
+    def test_throttle_timeout_is_not_a_failure(self):
+        """
+        Ensure requests that timed out waiting on the throttle are neither retried nor counted
+        against the circuit breaker.
+        """
+        func = mock.Mock(side_effect=ThrottleTimeout('ThrottleTimeout'))
+        query = self.decorate(func, idempotent=True)
+        for _ in range(3):
+            with self.assertRaises(ThrottleTimeout):
+                query()
+        self.assertEqual(circuit_breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(circuit_breaker.failures, 0)
+        self.assertEqual(func.call_count, 3)
+
+    def test_circuit_breaker_half_open_probe(self):
+        """
+        Ensure a single probe is let through once the reset timeout has passed, closing the
+        breaker if it succeeds and reopening it if it fails.
+        """
+        func = mock.Mock(side_effect=requests.exceptions.Timeout('Timeout'))
+        query = self.decorate(func)
+        with mock.patch('time.monotonic', return_value=100):
+            for _ in range(3):
+                with self.assertRaises(requests.exceptions.Timeout):
+                    query()
+        with mock.patch('time.monotonic', return_value=131):
+            with self.assertRaises(requests.exceptions.Timeout):
+                query()
+            self.assertEqual(circuit_breaker.state, CircuitBreaker.OPEN)
+        func.side_effect = None
+        func.return_value = 'response'
+        with mock.patch('time.monotonic', return_value=162):
+            self.assertEqual(query(), 'response')
+        self.assertEqual(circuit_breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(func.call_count, 5)
+
+    def test_circuit_breaker_allows_a_single_probe(self):
+        """
+        Ensure other calls keep failing fast while the half-open probe is in flight.
+        """
+        with mock.patch('time.monotonic', return_value=100):
+            for _ in range(3):
+                circuit_breaker.record_failure()
+        with mock.patch('time.monotonic', return_value=131):
+            self.assertTrue(circuit_breaker.allow_request())
+            self.assertEqual(circuit_breaker.state, CircuitBreaker.HALF_OPEN)
+            self.assertFalse(circuit_breaker.allow_request())
+
+    def test_throttled_probe_frees_its_slot(self):
+        """
+        Ensure a half-open probe that timed out on the throttle, and so never reached the
+        directory, lets a later call through as the probe.
+        """
+        func = mock.Mock(side_effect=ThrottleTimeout('ThrottleTimeout'))
+        query = self.decorate(func)
+        with mock.patch('time.monotonic', return_value=100):
+            for _ in range(3):
+                circuit_breaker.record_failure()
+        with mock.patch('time.monotonic', return_value=131):
+            with self.assertRaises(ThrottleTimeout):
+                query()
+            func.side_effect = None
+            func.return_value = 'response'
+            self.assertEqual(query(), 'response')
+        self.assertEqual(circuit_breaker.state, CircuitBreaker.CLOSED)
+
+    def test_client_errors_do_not_open_the_circuit_breaker(self):
+        """
+        Ensure errors returned by a healthy directory, e.g. 404 responses, are not counted as
+        failures.
+        """
+        response = mock.Mock(status_code=404)
+        func = mock.Mock(side_effect=requests.exceptions.HTTPError('Not Found.', response=response))
+        query = self.decorate(func, idempotent=True)
+        for _ in range(5):
+            with self.assertRaises(requests.exceptions.HTTPError):
+                query()
+        self.assertEqual(circuit_breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(func.call_count, 5)
+
+    @mock.patch('time.sleep')
+    def test_idempotent_calls_are_retried(self, mock_sleep):
+        """
+        Ensure idempotent calls are retried after transport failures with jittered backoff.
+        """
+        func = mock.Mock(side_effect=[
+            requests.exceptions.ConnectionError('ConnectionError.'),
+            requests.exceptions.Timeout('Timeout'),
+            'response',
+        ])
+        query = self.decorate(func, idempotent=True)
+        self.assertEqual(query(), 'response')
+        self.assertEqual(func.call_count, 3)
+        self.assertEqual(mock_sleep.call_count, 2)
+        first_delay, second_delay = [call[0][0] for call in mock_sleep.call_args_list]
+        self.assertTrue(0 <= first_delay <= 0.2)
+        self.assertTrue(0 <= second_delay <= 0.4)
+
+    @mock.patch('time.sleep')
+    def test_non_idempotent_calls_are_not_retried(self, mock_sleep):
+        """
+        Ensure calls with side effects are attempted only once.
+        """
+        func = mock.Mock(side_effect=requests.exceptions.ConnectionError('ConnectionError.'))
+        query = self.decorate(func)
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            query()
+        self.assertEqual(func.call_count, 1)
+        mock_sleep.assert_not_called()
+
+    def test_latency_histograms(self):
+        """
+        Ensure the latency of every attempt is recorded against its endpoint.
+        """
+        query = self.decorate(mock.Mock(return_value='response'))
+        for _ in range(4):
+            query()
+        histogram = get_latency_histograms()['test_endpoint']
+        self.assertEqual(histogram['count'], 4)
+        self.assertEqual(sum(histogram['buckets'].values()), 4)
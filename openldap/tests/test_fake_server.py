@@ -0,0 +1,56 @@
+import requests
+
+from django.conf import settings
+from django.test import TestCase
+
+from openldap import user_api
+from openldap.fake_server import FakeDirectory
+from openldap.fake_server import FakeOpenLDAPServer
+from openldap.tests.test_user_api import OpenLDAPTests
+
+
+class FakeOpenLDAPServerTests(OpenLDAPTests, TestCase):
+
+    def setUp(self):
+        super(FakeOpenLDAPServerTests, self).setUp()
+        self.server = FakeOpenLDAPServer(FakeDirectory.populate(3)).start()
+        settings.OPENLDAP_HOST = self.server.url
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_list_users(self):
+        """
+        Ensure the signed directory listing is accepted by user_api.
+        """
+        response = user_api.list_users()
+        self.assertEqual(response['data']['count'], 3)
+        self.assertEqual(response['data']['0'], 'x.user.0')
+
+    def test_get_user(self):
+        """
+        Ensure users can be retrieved by user id and email address.
+        """
+        response = user_api.get_user_by_id('x.user.1')
+        self.assertEqual(response['data']['0']['mail']['0'], 'user.1@example.ac.uk')
+        response = user_api.test_get_user_by_email_address('user.2@example.ac.uk')
+        self.assertEqual(response['data']['0']['uid']['0'], 'x.user.2')
+        with self.assertRaises(requests.exceptions.HTTPError):
+            user_api.get_user_by_id('x.missing')
+
+    def test_delete_and_enable_user(self):
+        """
+        Ensure deleted (deactivated) users are omitted from the listing until enabled.
+        """
+        user_api.delete_user('user.0@example.ac.uk')
+        self.assertEqual(user_api.list_users()['data']['count'], 2)
+        user_api.enable_user_account('user.0@example.ac.uk')
+        self.assertEqual(user_api.list_users()['data']['count'], 3)
+
+    def test_error_rate(self):
+        """
+        Ensure the configured fraction of requests fail.
+        """
+        self.server.error_rate = 1
+        with self.assertRaises(requests.exceptions.HTTPError):
+            user_api.list_users()
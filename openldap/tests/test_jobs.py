@@ -0,0 +1,135 @@
+import fakeredis
+import mock
+
+from rq import Queue
+
+from django.test import TestCase
+
+from openldap import jobs
+
+
+class AccountOperationJobTests(TestCase):
+
+    def setUp(self):
+        self.connection = fakeredis.FakeStrictRedis()
+        self.connection.flushall()
+        self.queue = Queue('default', connection=self.connection)
+        for patcher in [
+                mock.patch('openldap.jobs.get_redis_connection', return_value=self.connection),
+                mock.patch('openldap.jobs.django_rq.get_queue', return_value=self.queue),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    @mock.patch('openldap.jobs.user_api')
+    def test_enqueue_returns_without_calling_directory(self, user_api):
+        self.assertTrue(jobs.enqueue_account_operation('shibboleth.user@example.ac.uk', jobs.ENABLE))
+        self.assertEqual(self.queue.count, 1)
+        self.assertFalse(user_api.enable_user_account.called)
+
+    @mock.patch('openldap.jobs.user_api')
+    def test_repeat_requests_are_deduplicated(self, user_api):
+        email = 'shibboleth.user@example.ac.uk'
+        self.assertTrue(jobs.enqueue_account_operation(email, jobs.ENABLE))
+        self.assertFalse(jobs.enqueue_account_operation(email, jobs.ENABLE))
+        self.assertFalse(jobs.enqueue_account_operation(email.upper(), jobs.RESET_PASSWORD))
+        self.assertEqual(self.queue.count, 1)
+
+        jobs.apply_account_operations(email)
+        user_api.enable_user_account.assert_called_once_with(email)
+        user_api.reset_user_password.assert_called_once_with(email)
+
+    @mock.patch('openldap.jobs.user_api')
+    def test_burst_coalesces_to_latest_state(self, user_api):
+        email = 'shibboleth.user@example.ac.uk'
+        for operation in (jobs.ENABLE, jobs.DELETE, jobs.ENABLE, jobs.DELETE):
+            jobs.enqueue_account_operation(email, operation)
+        jobs.apply_account_operations(email)
+        user_api.delete_user.assert_called_once_with(email)
+        self.assertFalse(user_api.enable_user_account.called)
+
+    @mock.patch('openldap.jobs.user_api')
+    def test_request_after_job_started_is_enqueued(self, user_api):
+        email = 'shibboleth.user@example.ac.uk'
+        jobs.enqueue_account_operation(email, jobs.ENABLE)
+        jobs.apply_account_operations(email)
+        self.assertTrue(jobs.enqueue_account_operation(email, jobs.RESET_PASSWORD))
+
+        jobs.apply_account_operations(email)
+        user_api.enable_user_account.assert_called_once_with(email)
+        user_api.reset_user_password.assert_called_once_with(email)
+
+    @mock.patch('openldap.jobs.user_api')
+    def test_failed_operations_are_restored(self, user_api):
+        email = 'shibboleth.user@example.ac.uk'
+        jobs.enqueue_account_operation(email, jobs.ENABLE)
+        jobs.enqueue_account_operation(email, jobs.RESET_PASSWORD)
+
+        def request_delete(email_address):
+            # A request made while the job is running is newer than the claimed operations.
+            jobs.enqueue_account_operation(email_address, jobs.DELETE)
+            raise ConnectionError
+
+        user_api.enable_user_account.side_effect = request_delete
+        with self.assertRaises(ConnectionError):
+            jobs.apply_account_operations(email)
+        self.assertEqual(self.queue.count, 2)
+
+        user_api.reset_mock()
+        user_api.enable_user_account.side_effect = None
+        jobs.apply_account_operations(email)
+        user_api.delete_user.assert_called_once_with(email)
+        self.assertFalse(user_api.enable_user_account.called)
+        self.assertFalse(user_api.reset_user_password.called)
+
+        self.assertTrue(jobs.enqueue_account_operation(email, jobs.RESET_PASSWORD))
+        user_api.reset_mock()
+        user_api.reset_user_password.side_effect = ConnectionError
+        with self.assertRaises(ConnectionError):
+            jobs.apply_account_operations(email)
+        user_api.reset_user_password.side_effect = None
+        jobs.apply_account_operations(email)
+        self.assertEqual(user_api.reset_user_password.call_count, 2)
+
+    @mock.patch('openldap.jobs.time.sleep')
+    @mock.patch('openldap.jobs.user_api')
+    def test_failed_operations_are_retried(self, user_api, mock_sleep):
+        email = 'shibboleth.user@example.ac.uk'
+        jobs.enqueue_account_operation(email, jobs.ENABLE)
+        self.queue.dequeue()  # The job run below.
+        user_api.enable_user_account.side_effect = ConnectionError
+        for attempt in range(jobs.ACCOUNT_OPERATION_ATTEMPTS):
+            with self.assertRaises(ConnectionError):
+                jobs.apply_account_operations(email, attempt)
+            if attempt + 1 < jobs.ACCOUNT_OPERATION_ATTEMPTS:
+                self.assertEqual(self.queue.count, 1)
+                retry = self.queue.dequeue()
+                self.assertEqual(retry.args, (email, attempt + 1))
+                self.assertFalse(jobs.enqueue_account_operation(email, jobs.ENABLE))
+        self.assertEqual(self.queue.count, 0)
+        self.assertEqual(mock_sleep.call_count, jobs.ACCOUNT_OPERATION_ATTEMPTS - 1)
+        self.assertEqual(user_api.enable_user_account.call_count, jobs.ACCOUNT_OPERATION_ATTEMPTS)
+
+        # The operations are left pending for the account's next request.
+        user_api.enable_user_account.side_effect = None
+        self.assertTrue(jobs.enqueue_account_operation(email, jobs.RESET_PASSWORD))
+        jobs.apply_account_operations(email)
+        user_api.enable_user_account.assert_called_with(email)
+        user_api.reset_user_password.assert_called_once_with(email)
+
+    def test_failed_enqueue_does_not_block_later_requests(self):
+        email = 'shibboleth.user@example.ac.uk'
+        with mock.patch('rq.Queue.enqueue_call', side_effect=ConnectionError):
+            with self.assertRaises(ConnectionError):
+                jobs.enqueue_account_operation(email, jobs.ENABLE)
+        self.assertTrue(jobs.enqueue_account_operation(email, jobs.ENABLE))
+
+    @mock.patch('openldap.jobs.user_api')
+    def test_applied_immediately_without_queue(self, user_api):
+        with mock.patch('openldap.jobs.get_redis_connection', return_value=None):
+            self.assertFalse(jobs.enqueue_account_operation('shibboleth.user@example.ac.uk', jobs.DELETE))
+        user_api.delete_user.assert_called_once_with('shibboleth.user@example.ac.uk')
+
+    def test_unknown_operation(self):
+        with self.assertRaises(ValueError):
+            jobs.enqueue_account_operation('shibboleth.user@example.ac.uk', 'create')
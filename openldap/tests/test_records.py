@@ -0,0 +1,74 @@
+from django.test import TestCase
+
+from openldap.records import DirectoryUser
+from openldap.records import iter_users
+from openldap.records import parse_user
+
+
+class DirectoryUserTests(TestCase):
+
+    def setUp(self):
+        self.entry = {
+            'uid': {
+                '0': 'x.joe.bloggs',
+                'count': 1
+            },
+            'mail': {
+                '0': 'joe.bloggs@bangor.ac.uk',
+                'count': 1
+            },
+            'displayname': {
+                '0': 'Joe Bloggs',
+                'count': 1
+            },
+            'gidNumber': {
+                '0': '5000001',
+                'count': 1
+            },
+            'uidnumber': {
+                '0': '5000001',
+                'count': 1
+            },
+            'telephone': '00000-000000',
+        }
+
+    def test_parse_user(self):
+        """
+        Ensure a get_user_by_id response is parsed into a DirectoryUser.
+        """
+        user = parse_user({'data': {'0': self.entry, 'error': '', 'count': 1}})
+        self.assertEqual(
+            user,
+            DirectoryUser(
+                uid='x.joe.bloggs',
+                mail='joe.bloggs@bangor.ac.uk',
+                displayname='Joe Bloggs',
+                uidnumber='5000001',
+                gidNumber='5000001',
+                telephone='00000-000000',
+            ))
+        with self.assertRaises(AttributeError):
+            user.extra = True
+
+    def test_iter_users(self):
+        """
+        Ensure list_users entries are yielded in listing order, whether bare user ids or entries.
+        """
+        response = {'data': {'10': 'x.last', '2': self.entry, '0': 'x.first', 'error': '', 'count': 3}}
+        users = list(iter_users(response))
+        self.assertEqual([user.uid for user in users], ['x.first', 'x.joe.bloggs', 'x.last'])
+        self.assertIsNone(users[0].mail)
+        self.assertEqual(users[1].mail, 'joe.bloggs@bangor.ac.uk')
+        self.assertEqual(response['data']['count'], 3)
+        self.assertIn('0', response['data'])
+
+    def test_iter_users_consume(self):
+        """
+        Ensure entries are released from the response as they are yielded.
+        """
+        response = {'data': {'0': 'x.first', '1': 'x.second', 'error': '', 'count': 2}}
+        users = iter_users(response, consume=True)
+        next(users)
+        self.assertEqual(set(response['data']), {'1', 'error', 'count'})
+        next(users)
+        self.assertEqual(set(response['data']), {'error', 'count'})
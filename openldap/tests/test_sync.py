@@ -0,0 +1,173 @@
+import copy
+
+import mock
+
+from django.test import TestCase
+
+from institution.tests.test_models import InstitutionTests
+from openldap import sync
+from openldap.models import DirectorySyncCheckpoint
+from users.models import Profile
+from users.tests.test_models import CustomUserTests
+
+
+class DirectorySyncTests(TestCase):
+
+    def setUp(self):
+        self.institution = InstitutionTests.create_institution(
+            name='Bangor University',
+            base_domain='bangor.ac.uk',
+            identity_provider='https://idp.bangor.ac.uk/shibboleth',
+        )
+        self.directory = {
+            'iss': 'https://openldap.example.com/',
+            'aud': 'https://openldap.example.com/',
+            'iat': 1525950885,
+            'nbf': 1525950285,
+            'data': {
+                '0': 'x.enabled',
+                '1': 'x.revoked',
+                'error': '',
+                'count': 2,
+            },
+        }
+        # Approved, but not yet provisioned.
+        self.create_profile('new', '', Profile.APPROVED)
+        # Approved, but missing from the directory.
+        self.create_profile('disabled', 'x.disabled', Profile.APPROVED)
+        # Approved and present in the directory.
+        self.create_profile('enabled', 'x.enabled', Profile.APPROVED)
+        # Revoked, but still present in the directory.
+        self.create_profile('revoked', 'x.revoked', Profile.REVOKED)
+
+    def create_profile(self, username, scw_username, account_status):
+        """
+        Create a user whose profile has the given SCW username and account status.
+        """
+        user = CustomUserTests.create_custom_user(email='@'.join([username, self.institution.base_domain]))
+        profile = user.profile
+        profile.scw_username = scw_username
+        profile.account_status = account_status
+        profile.save()
+        return profile
+
+    def list_users(self):
+        # Each call decodes a fresh response, which the sync consumes.
+        return copy.deepcopy(self.directory)
+
+    def run_sync(self, **kwargs):
+        with mock.patch('openldap.user_api.list_users', side_effect=self.list_users), \
+                mock.patch('openldap.user_api.create_user') as create_user, \
+                mock.patch('openldap.user_api.enable_user_account') as enable_user_account, \
+                mock.patch('openldap.user_api.delete_user') as delete_user:
+            result = sync.run(**kwargs)
+        return result, {
+            sync.CREATE: create_user,
+            sync.ENABLE: enable_user_account,
+            sync.DELETE: delete_user,
+        }
+
+    def test_full_run(self):
+        """
+        Ensure only the required directory operations are applied.
+        """
+        result, calls = self.run_sync()
+        self.assertFalse(result.skipped)
+        self.assertEqual(result.profiles_checked, 4)
+        self.assertEqual(
+            set(result.operations), {
+                sync.Operation(sync.CREATE, 'new@bangor.ac.uk'),
+                sync.Operation(sync.ENABLE, 'disabled@bangor.ac.uk'),
+                sync.Operation(sync.DELETE, 'revoked@bangor.ac.uk'),
+            })
+        self.assertEqual(result.unsupported, [sync.Operation(sync.CREATE, 'new@bangor.ac.uk')])
+        calls[sync.ENABLE].assert_called_once_with('disabled@bangor.ac.uk')
+        calls[sync.DELETE].assert_called_once_with('revoked@bangor.ac.uk')
+        calls[sync.CREATE].assert_not_called()
+        self.assertTrue(DirectorySyncCheckpoint.objects.filter(name=sync.CHECKPOINT_NAME).exists())
+
+    def test_run_without_changes_is_skipped(self):
+        """
+        Ensure a run is skipped when neither the directory nor any profile has changed since the
+        last checkpoint.
+        """
+        self.run_sync()
+        result, calls = self.run_sync()
+        self.assertTrue(result.skipped)
+        for call in calls.values():
+            call.assert_not_called()
+
+    def test_incremental_run(self):
+        """
+        Ensure only profiles that changed since the last checkpoint are reconciled.
+        """
+        self.run_sync()
+        profile = Profile.objects.get(user__email='enabled@bangor.ac.uk')
+        profile.account_status = Profile.SUSPENDED
+        profile.save()
+        result, calls = self.run_sync()
+        self.assertEqual(result.profiles_checked, 2)
+        self.assertEqual(
+            set(result.operations), {
+                sync.Operation(sync.CREATE, 'new@bangor.ac.uk'),
+                sync.Operation(sync.DELETE, 'enabled@bangor.ac.uk'),
+            })
+
+    def test_directory_changes_are_reconciled(self):
+        """
+        Ensure profiles whose user id disappeared from the directory are reconciled.
+        """
+        self.run_sync()
+        del self.directory['data']['0']
+        result, calls = self.run_sync()
+        self.assertEqual(result.profiles_checked, 2)
+        self.assertEqual(
+            set(result.operations), {
+                sync.Operation(sync.CREATE, 'new@bangor.ac.uk'),
+                sync.Operation(sync.ENABLE, 'enabled@bangor.ac.uk'),
+            })
+
+    def test_unsupported_operations_are_not_checkpointed(self):
+        """
+        Ensure profiles whose account cannot be created are not covered by the checkpoint, so
+        every run reports them until they are provisioned.
+        """
+        self.run_sync()
+        checkpoint = DirectorySyncCheckpoint.objects.get(name=sync.CHECKPOINT_NAME)
+        profile = Profile.objects.get(user__email='new@bangor.ac.uk')
+        self.assertLess(profile.modified_time, checkpoint.profiles_synced_time)
+
+        self.create_profile('other', '', Profile.AWAITING_APPROVAL)
+        result, calls = self.run_sync()
+        self.assertIn(sync.Operation(sync.CREATE, 'new@bangor.ac.uk'), result.unsupported)
+        calls[sync.CREATE].assert_not_called()
+
+        profile.scw_username = 'x.new'
+        profile.save()
+        self.directory['data']['2'] = 'x.new'
+        self.run_sync()
+        self.create_profile('another', '', Profile.AWAITING_APPROVAL)
+        result, calls = self.run_sync()
+        self.assertEqual(result.unsupported, [])
+
+    def test_failed_run_does_not_checkpoint(self):
+        """
+        Ensure the checkpoint is not advanced when an operation fails.
+        """
+        with mock.patch('openldap.user_api.list_users', side_effect=self.list_users), \
+                mock.patch('openldap.user_api.create_user'), \
+                mock.patch('openldap.user_api.enable_user_account', side_effect=Exception('Failed.')), \
+                mock.patch('openldap.user_api.delete_user'):
+            result = sync.run()
+        self.assertEqual(list(result.errors), [sync.Operation(sync.ENABLE, 'disabled@bangor.ac.uk')])
+        self.assertFalse(DirectorySyncCheckpoint.objects.exists())
+
+    def test_dry_run(self):
+        """
+        Ensure a dry run applies no operations and does not checkpoint.
+        """
+        result, calls = self.run_sync(dry_run=True)
+        self.assertEqual(len(result.operations), 3)
+        for call in calls.values():
+            call.assert_not_called()
+        self.assertFalse(DirectorySyncCheckpoint.objects.exists())
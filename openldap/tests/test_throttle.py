@@ -0,0 +1,117 @@
+import fakeredis
+import mock
+import redis
+
+from django.conf import settings
+from django.test import TestCase
+
+from openldap import throttle
+from openldap.exceptions import ThrottleTimeout
+from openldap.metrics import get_throttle_wait_histograms
+from openldap.metrics import reset_throttle_wait_histograms
+
+
+class ThrottleTests(TestCase):
+
+    def setUp(self):
+        settings.OPENLDAP_MAX_IN_FLIGHT = 2
+        settings.OPENLDAP_RATE_LIMIT = 0
+        settings.OPENLDAP_RATE_LIMIT_BURST = 1
+        settings.OPENLDAP_THROTTLE_TIMEOUT = 0.05
+        self.connection = fakeredis.FakeStrictRedis()
+        self.connection.flushall()
+        patcher = mock.patch('openldap.throttle.get_redis_connection', return_value=self.connection)
+        self.get_redis_connection = patcher.start()
+        self.addCleanup(patcher.stop)
+        reset_throttle_wait_histograms()
+
+    def tearDown(self):
+        settings.OPENLDAP_MAX_IN_FLIGHT = 0
+        settings.OPENLDAP_RATE_LIMIT = 0
+
+    def test_disabled(self):
+        """
+        Ensure Redis is not touched when neither limit is set.
+        """
+        settings.OPENLDAP_MAX_IN_FLIGHT = 0
+        with throttle.throttle('list_users', lease=10):
+            pass
+        self.assertFalse(self.get_redis_connection.called)
+        self.assertEqual(get_throttle_wait_histograms(), {})
+
+    def test_rate_limit_schedule(self):
+        """
+        Ensure successive reservations are spaced 1 / rate seconds apart once the burst is spent.
+        """
+        with mock.patch('time.time', return_value=1000.0):
+            waits = [throttle.reserve(self.connection, rate=10, burst=2, max_wait=1) for _ in range(4)]
+        for wait, expected in zip(waits, [0, 0, 0.1, 0.2]):
+            self.assertAlmostEqual(wait, expected)
+
+    def test_rate_limit_wait_exceeds_timeout(self):
+        """
+        Ensure a reservation that would wait too long fails without using up capacity.
+        """
+        with mock.patch('time.time', return_value=1000.0):
+            throttle.reserve(self.connection, rate=1, burst=1, max_wait=0.5)
+            with self.assertRaises(ThrottleTimeout):
+                throttle.reserve(self.connection, rate=1, burst=1, max_wait=0.5)
+            self.assertAlmostEqual(throttle.reserve(self.connection, rate=1, burst=1, max_wait=1), 1)
+
+    def test_in_flight_slots(self):
+        """
+        Ensure no more than limit slots are held at once and released slots are reused.
+        """
+        self.assertTrue(throttle.try_acquire_slot(self.connection, 'a', limit=2, lease=10))
+        self.assertTrue(throttle.try_acquire_slot(self.connection, 'b', limit=2, lease=10))
+        self.assertFalse(throttle.try_acquire_slot(self.connection, 'c', limit=2, lease=10))
+        throttle.release_slot(self.connection, 'a')
+        self.assertTrue(throttle.try_acquire_slot(self.connection, 'c', limit=2, lease=10))
+
+    def test_expired_slots_are_reclaimed(self):
+        """
+        Ensure slots held past their lease, e.g. by a worker that died, are reclaimed.
+        """
+        with mock.patch('time.time', return_value=1000.0):
+            throttle.try_acquire_slot(self.connection, 'a', limit=1, lease=10)
+        with mock.patch('time.time', return_value=1011.0):
+            self.assertTrue(throttle.try_acquire_slot(self.connection, 'b', limit=1, lease=10))
+
+    def test_throttle_holds_slot(self):
+        """
+        Ensure a slot is held for the duration of the block, and released afterwards.
+        """
+        settings.OPENLDAP_MAX_IN_FLIGHT = 1
+        with throttle.throttle('list_users', lease=10):
+            self.assertEqual(self.connection.zcard(throttle.IN_FLIGHT_KEY), 1)
+            with self.assertRaises(ThrottleTimeout):
+                with throttle.throttle('get_user_by_id', lease=10):
+                    pass
+        self.assertEqual(self.connection.zcard(throttle.IN_FLIGHT_KEY), 0)
+
+        histograms = get_throttle_wait_histograms()
+        self.assertEqual(histograms['list_users']['count'], 1)
+        self.assertGreaterEqual(histograms['get_user_by_id']['mean'], 50)
+
+    def test_throttle_fails_open_without_redis(self):
+        """
+        Ensure requests are still made while Redis is unreachable.
+        """
+        self.connection.transaction = mock.Mock(side_effect=redis.exceptions.ConnectionError)
+        entered = False
+        with throttle.throttle('list_users', lease=10):
+            entered = True
+        self.assertTrue(entered)
+
+    def test_failed_release_keeps_the_result(self):
+        """
+        Ensure a Redis failure while releasing a slot does not replace the outcome of the block.
+        """
+        with throttle.throttle('list_users', lease=10):
+            self.connection.zrem = mock.Mock(side_effect=redis.exceptions.ConnectionError)
+            result = 'response'
+        self.assertEqual(result, 'response')
+        with self.assertRaises(ValueError):
+            with throttle.throttle('list_users', lease=10):
+                raise ValueError
+        self.assertEqual(self.connection.zrem.call_count, 2)
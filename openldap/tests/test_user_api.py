@@ -1,3 +1,4 @@
+import fakeredis
 import jsonschema
 import mock
 import requests
@@ -8,9 +9,11 @@ from django.conf import settings
 from django.test import TestCase
 
 from openldap import user_api
+from openldap.decorators import circuit_breaker
+from security.json_web_token import JSONWebToken
 
 
-class OpenLDAPUserAPITests(TestCase):
+class OpenLDAPTests(TestCase):
 
     def setUp(self):
         settings.OPENLDAP_HOST = 'https://example.com/'
@@ -18,6 +21,16 @@ class OpenLDAPUserAPITests(TestCase):
         settings.OPENLDAP_JWT_ISSUER = 'https://openldap.example.com/'
         settings.OPENLDAP_JWT_AUDIENCE = 'https://openldap.example.com/'
         settings.OPENLDAP_JWT_ALGORITHM = 'HS256'
+        settings.OPENLDAP_CACHE_TIMEOUT = 300
+        settings.OPENLDAP_VALIDATION_MODE = 'full'
+        settings.OPENLDAP_CIRCUIT_BREAKER_THRESHOLD = 100
+        settings.OPENLDAP_RETRY_ATTEMPTS = 0
+        circuit_breaker.reset()
+        self.connection = fakeredis.FakeStrictRedis()
+        self.connection.flushall()
+        patcher = mock.patch('openldap.cache.get_redis_connection', return_value=self.connection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
 
     def _mock_response(self, content=None, status=200, json_data=None, raise_for_status=None):
         mock_resp = mock.Mock()
@@ -30,7 +43,49 @@ class OpenLDAPUserAPITests(TestCase):
             mock_resp.json = mock.Mock(return_value=json_data)
         return mock_resp
 
-    @mock.patch('requests.get')
+    def _encode_user_response(self, user_id):
+        """
+        Encode a get user response for the given user id, as returned by the OpenLDAP REST API.
+        """
+        data = {
+            "iss": settings.OPENLDAP_JWT_ISSUER,
+            "aud": settings.OPENLDAP_JWT_AUDIENCE,
+            "iat": 1525966359,
+            "nbf": 1525965759,
+            "data": {
+                "0": {
+                    "uid": {
+                        "0": user_id,
+                        "count": 1
+                    },
+                    "mail": {
+                        "0": user_id[2:] + "@bangor.ac.uk",
+                        "count": 1
+                    },
+                    "displayname": {
+                        "0": "Mr Joe Bloggs",
+                        "count": 1
+                    },
+                    "gidNumber": {
+                        "0": "5000001",
+                        "count": 1
+                    },
+                    "uidnumber": {
+                        "0": "5000001",
+                        "count": 1
+                    },
+                    "telephone": "00000-000000"
+                },
+                "error": "",
+                "count": 1
+            }
+        }
+        return JSONWebToken.encode(data=data, key=settings.OPENLDAP_JWT_KEY)
+
+
+class OpenLDAPUserAPITests(OpenLDAPTests, TestCase):
+
+    @mock.patch('requests.Session.get')
     def test_list_users_query(self, mock_get):
         """
         Retrieve a list of all users.
@@ -58,7 +113,7 @@ class OpenLDAPUserAPITests(TestCase):
         result = user_api.list_users()
         self.assertEqual(result, expected_response)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_get_user_by_id(self, mock_get):
         """
         Retrieve a user via their user id.
@@ -112,7 +167,7 @@ class OpenLDAPUserAPITests(TestCase):
         result = user_api.get_user_by_id('x.joe.bloggs')
         self.assertEqual(result, expected_response)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_get_user_by_email_address(self, mock_get):
         """
         Retrieve a user via their email address.
@@ -166,8 +221,33 @@ class OpenLDAPUserAPITests(TestCase):
         result = user_api.test_get_user_by_email_address('joe.bloggs@bangor.ac.uk')
         self.assertEqual(result, expected_response)
 
+    @mock.patch('requests.Session.get')
+    def test_get_users_by_ids(self, mock_get):
+        """
+        Retrieve multiple users via their user ids, keeping failed lookups separate.
+        """
+
+        def get(url, **kwargs):
+            user_id = url.split('/')[-2]
+            if user_id == 'x.missing':
+                return self._mock_response(
+                    status=404,
+                    raise_for_status=requests.exceptions.HTTPError('Not Found.'),
+                )
+            return self._mock_response(status=200, content=self._encode_user_response(user_id))
+
+        mock_get.side_effect = get
+        user_ids = ['x.joe.bloggs', 'x.jane.bloggs', 'x.missing', 'x.joe.bloggs']
+        users, errors = user_api.get_users_by_ids(user_ids, concurrency=2)
+        self.assertEqual(mock_get.call_count, 3)
+        self.assertEqual(set(users), {'x.joe.bloggs', 'x.jane.bloggs'})
+        for user_id, response in users.items():
+            self.assertEqual(response['data']['0']['uid']['0'], user_id)
+        self.assertEqual(set(errors), {'x.missing'})
+        self.assertTrue(isinstance(errors['x.missing'], requests.exceptions.HTTPError))
+
     @skip("Pending implementation")
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_delete_user(self, mock_get):
         """
         Delete (deactivated) a user via the user's email address.
@@ -175,7 +255,7 @@ class OpenLDAPUserAPITests(TestCase):
         pass
 
     @skip("Pending implementation")
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_reset_user_password(self, mock_get):
         """
         Reset a user's password.
@@ -183,7 +263,7 @@ class OpenLDAPUserAPITests(TestCase):
         pass
 
     @skip("Pending implementation")
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_enable_user_account(self, mock_get):
         """
         Enable a user's account.
@@ -208,7 +288,7 @@ class OpenLDAPUserAPITests(TestCase):
             self._test_query_with_http_error(query=query, query_args=args)
             self._test_query_with_timeout_error(query=query, query_args=args)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def _test_query_with_invalid_json_schema(self, mock_get, query, query_args):
         """
         Ensure a ValidationError is raised if the decoded JWT does not conform to the required
@@ -225,7 +305,7 @@ class OpenLDAPUserAPITests(TestCase):
         with self.assertRaises(jsonschema.exceptions.ValidationError):
             query(query_args) if query_args else query()
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def _test_query_with_connection_error(self, mock_get, query, query_args):
         """
         Ensure a ConnectionError is raised if the request fails to connect.
@@ -238,7 +318,7 @@ class OpenLDAPUserAPITests(TestCase):
         with self.assertRaises(requests.exceptions.ConnectionError):
             query(query_args) if query_args else query()
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def _test_query_with_http_error(self, mock_get, query, query_args):
         """
         Ensure a HTTPError is raised if the the request returns a HTTP error status.
@@ -251,7 +331,7 @@ class OpenLDAPUserAPITests(TestCase):
         with self.assertRaises(requests.exceptions.HTTPError):
             query(query_args) if query_args else query()
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def _test_query_with_timeout_error(self, mock_get, query, query_args):
         """
         Ensure a Timeout error is raised if the request times out.
@@ -0,0 +1,60 @@
+import jsonschema
+
+from django.test import TestCase
+from django.test import override_settings
+
+from openldap import schemas
+from openldap.util import validate_response
+
+
+class ValidateResponseTests(TestCase):
+
+    def setUp(self):
+        self.invalid_response = {'iss': 'https://openldap.example.com/'}
+
+    def count_failures(self, count):
+        failures = 0
+        for _ in range(count):
+            try:
+                validate_response(self.invalid_response, schemas.get_user_validator)
+            except jsonschema.exceptions.ValidationError:
+                failures += 1
+        return failures
+
+    @override_settings(OPENLDAP_VALIDATION_MODE='full')
+    def test_full_validation(self):
+        """
+        Ensure every response is validated in 'full' mode.
+        """
+        for _ in range(3):
+            with self.assertRaises(jsonschema.exceptions.ValidationError):
+                validate_response(self.invalid_response, schemas.get_user_validator)
+
+    @override_settings(OPENLDAP_VALIDATION_MODE='sampled', OPENLDAP_VALIDATION_SAMPLE_RATE=4)
+    def test_sampled_validation(self):
+        """
+        Ensure one in every OPENLDAP_VALIDATION_SAMPLE_RATE responses is validated in 'sampled'
+        mode.
+        """
+        self.assertEqual(self.count_failures(8), 2)
+
+    @override_settings(OPENLDAP_VALIDATION_MODE='sampled', OPENLDAP_VALIDATION_SAMPLE_RATE=0)
+    def test_sampled_validation_with_a_zero_rate(self):
+        """
+        Ensure no response is validated in 'sampled' mode when the sample rate is 0.
+        """
+        self.assertEqual(self.count_failures(3), 0)
+
+    @override_settings(OPENLDAP_VALIDATION_MODE='off')
+    def test_validation_off(self):
+        """
+        Ensure no response is validated when validation is 'off'.
+        """
+        validate_response(self.invalid_response, schemas.get_user_validator)
+
+    def test_precompiled_validators_match_schemas(self):
+        """
+        Ensure the precompiled validators are built from the published schemas.
+        """
+        self.assertIs(schemas.list_users_validator.schema, schemas.list_users_schema)
+        self.assertIs(schemas.get_user_validator.schema, schemas.get_user_schema)
@@ -0,0 +1,145 @@
+"""
+Limits on the load placed on the OpenLDAP REST API by every process sharing the Redis instance
+configured for RQ, i.e. all gunicorn and RQ workers.
+
+Two limits are applied before each request:
+
+* OPENLDAP_RATE_LIMIT caps the requests started per second. Callers reserve a start time in a
+  shared schedule (a generic cell rate algorithm) and sleep until it, so bursts are spread out
+  rather than retried.
+* OPENLDAP_MAX_IN_FLIGHT caps the requests in progress at once. Slots are held in a sorted set
+  scored by lease expiry, so slots held by a worker that died mid request are reclaimed.
+
+Either limit is disabled when set to 0, and both are disabled without Redis.
+"""
+import contextlib
+import logging
+import time
+import uuid
+
+import redis
+
+from django.conf import settings
+
+from cogs3.cache import get_redis_connection
+from openldap.exceptions import ThrottleTimeout
+from openldap.metrics import record_throttle_wait
+
+logger = logging.getLogger('openldap')
+
+RATE_KEY = 'openldap:throttle:rate'
+IN_FLIGHT_KEY = 'openldap:throttle:in_flight'
+
+# Bounds, in seconds, of the delay between attempts to acquire an in flight slot.
+MIN_POLL_INTERVAL = 0.005
+MAX_POLL_INTERVAL = 0.1
+
+
+def reserve(connection, rate, burst, max_wait):
+    """
+    Reserve a request start time, returning the number of seconds to wait before starting.
+
+    Raises ThrottleTimeout, without reserving, if the wait would exceed max_wait.
+
+    Args:
+        connection (redis.StrictRedis): Redis connection.
+        rate (float): Requests allowed per second.
+        burst (int): Requests allowed to start at once after an idle period.
+        max_wait (float): Maximum seconds to wait.
+    """
+    interval = 1.0 / rate
+
+    def schedule(pipe):
+        now = time.time()
+        # The theoretical arrival time of the next request.
+        tat = max(float(pipe.get(RATE_KEY) or 0), now)
+        wait = max(tat - now - (burst - 1) * interval, 0)
+        if wait > max_wait:
+            raise ThrottleTimeout('OpenLDAP rate limit wait of {:.3f}s exceeds {}s.'.format(wait, max_wait))
+        pipe.multi()
+        pipe.set(RATE_KEY, tat + interval, ex=int(tat + interval - now) + 1)
+        return wait
+
+    return connection.transaction(schedule, RATE_KEY, value_from_callable=True)
+
+
+def try_acquire_slot(connection, token, limit, lease):
+    """
+    Try to take one of limit in flight slots for lease seconds, returning True on success.
+
+    Args:
+        connection (redis.StrictRedis): Redis connection.
+        token (str): Unique slot holder.
+        limit (int): Number of slots.
+        lease (float): Seconds after which the slot is reclaimed if not released.
+    """
+
+    def acquire(pipe):
+        now = time.time()
+        pipe.zremrangebyscore(IN_FLIGHT_KEY, '-inf', now)
+        acquired = pipe.zcard(IN_FLIGHT_KEY) < limit
+        pipe.multi()
+        if acquired:
+            pipe.zadd(IN_FLIGHT_KEY, **{token: now + lease})
+            pipe.expire(IN_FLIGHT_KEY, int(lease) + 1)
+        return acquired
+
+    return connection.transaction(acquire, IN_FLIGHT_KEY, value_from_callable=True)
+
+
+def release_slot(connection, token):
+    connection.zrem(IN_FLIGHT_KEY, token)
+
+
+@contextlib.contextmanager
+def throttle(endpoint, lease):
+    """
+    Wait until a request to an endpoint is allowed by the global limits, holding an in flight
+    slot for the duration of the block.
+
+    The time spent waiting is recorded with openldap.metrics.record_throttle_wait. Raises
+    ThrottleTimeout after OPENLDAP_THROTTLE_TIMEOUT seconds.
+
+    Args:
+        endpoint (str): Endpoint name e.g. 'list_users'.
+        lease (float): Longest the request can take in seconds, after which its slot is
+            reclaimed.
+    """
+    rate = settings.OPENLDAP_RATE_LIMIT
+    limit = settings.OPENLDAP_MAX_IN_FLIGHT
+    connection = get_redis_connection() if rate or limit else None
+    if connection is None:
+        yield
+        return
+
+    start = time.monotonic()
+    deadline = start + settings.OPENLDAP_THROTTLE_TIMEOUT
+    token = None
+    try:
+        if rate:
+            time.sleep(reserve(connection, rate, settings.OPENLDAP_RATE_LIMIT_BURST, deadline - start))
+        if limit:
+            token = uuid.uuid4().hex
+            interval = MIN_POLL_INTERVAL
+            while not try_acquire_slot(connection, token, limit, lease):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise ThrottleTimeout('No OpenLDAP request slot became free within {}s.'.format(
+                        settings.OPENLDAP_THROTTLE_TIMEOUT))
+                time.sleep(min(interval, remaining))
+                interval = min(interval * 2, MAX_POLL_INTERVAL)
+    except redis.exceptions.ConnectionError:
+        # Failing open keeps the directory reachable while Redis is down.
+        token = None
+    finally:
+        record_throttle_wait(endpoint, time.monotonic() - start)
+
+    try:
+        yield
+    finally:
+        if token is not None:
+            try:
+                release_slot(connection, token)
+            except redis.exceptions.ConnectionError:
+                # The slot is reclaimed once its lease expires.
+                logger.exception('Failed to release an OpenLDAP request slot.')
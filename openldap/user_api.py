@@ -1,34 +1,40 @@
-import jsonschema
 import logging
-import requests
+
+from concurrent.futures import ThreadPoolExecutor
 
 from django.conf import settings
 
+from openldap import cache
 from openldap import schemas
+from openldap.cache import invalidates_user
+from openldap.client import get_client
 from openldap.decorators import OpenLDAPException
+from openldap.records import iter_users
 from openldap.util import decode_response
+from openldap.util import validate_response
 
 logger = logging.getLogger('openldap')
 
 
-@OpenLDAPException(logger)
+@OpenLDAPException(logger, idempotent=True)
 def list_users():
     """
     List all users.
     """
-    url = ''.join([settings.OPENLDAP_HOST, 'user/'])
-    headers = {'Cache-Control': 'no-cache'}
-    response = requests.get(
-        url,
-        headers=headers,
-        timeout=5,
-    )
+    response = get_client().get('list_users', 'user/')
     response.raise_for_status()
     response = decode_response(response)
-    jsonschema.validate(response, schemas.list_users_schema)
+    validate_response(response, schemas.list_users_validator)
     return response
 
 
+def iter_directory_users():
+    """
+    List all users, lazily yielding an openldap.records.DirectoryUser per user.
+    """
+    return iter_users(list_users(), consume=True)
+
+
 @OpenLDAPException(logger)
 def create_user(email, title, first_name, surname, department, telephone, uid_number):
     """
@@ -46,7 +52,6 @@ def create_user(email, title, first_name, surname, department, telephone, uid_nu
     pass
 
 
-@OpenLDAPException(logger)
 def get_user_by_id(user_id):
     """
     Get an existing user by id.
@@ -54,20 +59,62 @@ def get_user_by_id(user_id):
     Args:
         user_id (str): User id - required
     """
-    url = ''.join([settings.OPENLDAP_HOST, 'user/', user_id, '/'])
-    headers = {'Cache-Control': 'no-cache'}
-    response = requests.get(
-        url,
-        headers=headers,
-        timeout=5,
-    )
+    response = cache.get_user_by_id(user_id)
+    if response is None:
+        response = _get_user_by_id(user_id)
+        cache.set_user(response)
+    return response
+
+
+@OpenLDAPException(logger, endpoint='get_user_by_id', idempotent=True)
+def _get_user_by_id(user_id):
+    path = ''.join(['user/', user_id, '/'])
+    response = get_client().get('get_user_by_id', path)
     response.raise_for_status()
     response = decode_response(response)
-    jsonschema.validate(response, schemas.get_user_schema)
+    validate_response(response, schemas.get_user_validator)
     return response
 
 
-@OpenLDAPException(logger)
+def get_users_by_ids(user_ids, concurrency=None):
+    """
+    Get existing users by id, fanning the lookups out over a bounded thread pool.
+
+    Each lookup goes through get_user_by_id, so every response is decoded, validated and has
+    its failures logged exactly as a single lookup would.
+
+    Args:
+        user_ids (iterable): User ids - required
+        concurrency (int): Maximum number of lookups in flight - optional, defaults to
+            settings.OPENLDAP_POOL_SIZE
+
+    Returns:
+        tuple: (users, errors) where users maps each user id to its response and errors maps
+            each user id whose lookup failed to the exception raised.
+    """
+    return _map_concurrently(get_user_by_id, user_ids, concurrency)
+
+
+def _map_concurrently(func, keys, concurrency=None):
+    """
+    Call func once per unique key over a bounded thread pool, keeping per key errors apart.
+    """
+    keys = list(dict.fromkeys(keys))
+    results = {}
+    errors = {}
+    if not keys:
+        return results, errors
+    concurrency = concurrency or settings.OPENLDAP_POOL_SIZE
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(keys))) as executor:
+        futures = [(key, executor.submit(func, key)) for key in keys]
+        for key, future in futures:
+            try:
+                results[key] = future.result()
+            except Exception as e:
+                errors[key] = e
+    return results, errors
+
+
 def test_get_user_by_email_address(email_address):
     """
     Get an existing user by email address.
@@ -75,20 +122,25 @@ def test_get_user_by_email_address(email_address):
     Args:
         email_address (str): Email address - required
     """
-    url = ''.join([settings.OPENLDAP_HOST, 'user/', email_address, '/'])
-    headers = {'Cache-Control': 'no-cache'}
-    response = requests.get(
-        url,
-        headers=headers,
-        timeout=5,
-    )
+    response = cache.get_user_by_email_address(email_address)
+    if response is None:
+        response = _get_user_by_email_address(email_address)
+        cache.set_user(response, email_address=email_address)
+    return response
+
+
+@OpenLDAPException(logger, endpoint='get_user_by_email_address', idempotent=True)
+def _get_user_by_email_address(email_address):
+    path = ''.join(['user/', email_address, '/'])
+    response = get_client().get('get_user_by_email_address', path)
     response.raise_for_status()
     response = decode_response(response)
-    jsonschema.validate(response, schemas.get_user_schema)
+    validate_response(response, schemas.get_user_validator)
     return response
 
 
 @OpenLDAPException(logger)
+@invalidates_user
 def delete_user(email_address):
     """
     Delete (deactivate) an existing user.
@@ -96,21 +148,17 @@ def delete_user(email_address):
     Args:
         email_address (str): Email address - required
     """
-    url = ''.join([settings.OPENLDAP_HOST, 'user/', email_address, '/'])
-    headers = {'Cache-Control': 'no-cache'}
-    response = requests.delete(
-        url,
-        headers=headers,
-        timeout=5,
-    )
+    path = ''.join(['user/', email_address, '/'])
+    response = get_client().delete('delete_user', path)
     response.raise_for_status()
     response = decode_response(response)
     # Pending implementation
-    #jsonschema.validate(response, schemas.get_user_schema)
+    #validate_response(response, schemas.get_user_validator)
     return response
 
 
 @OpenLDAPException(logger)
+@invalidates_user
 def reset_user_password(email_address):
     """
     Reset a user's password.
@@ -118,18 +166,14 @@ def reset_user_password(email_address):
     Args:
         email_address (str): Email address - required
     """
-    url = ''.join([settings.OPENLDAP_HOST, 'user/resetPassword/', email_address, '/'])
-    headers = {'Cache-Control': 'no-cache'}
-    response = requests.post(
-        url,
-        headers=headers,
-        timeout=5,
-    )
+    path = ''.join(['user/resetPassword/', email_address, '/'])
+    response = get_client().post('reset_user_password', path)
     response.raise_for_status()
     response = decode_response(response)
 
 
 @OpenLDAPException(logger)
+@invalidates_user
 def enable_user_account(email_address):
     """
     Enable a user's account.
@@ -137,15 +181,10 @@ def enable_user_account(email_address):
     Args:
         email_address (str): Email address - required
     """
-    url = ''.join([settings.OPENLDAP_HOST, 'user/enable/', email_address, '/'])
-    headers = {'Cache-Control': 'no-cache'}
-    response = requests.put(
-        url,
-        headers=headers,
-        timeout=5,
-    )
+    path = ''.join(['user/enable/', email_address, '/'])
+    response = get_client().put('enable_user_account', path)
     response.raise_for_status()
     response = decode_response(response)
     # Pending implementation
-    #jsonschema.validate(response, schemas.get_user_schema)
+    #validate_response(response, schemas.get_user_validator)
     return response
@@ -1,7 +1,11 @@
+import itertools
+
 from django.conf import settings
 
 from security.json_web_token import JSONWebToken
 
+_validation_count = itertools.count()
+
 
 def decode_response(response):
     return JSONWebToken.decode(
@@ -10,3 +14,25 @@ def decode_response(response):
         audience=settings.OPENLDAP_JWT_AUDIENCE,
         algorithms=[settings.OPENLDAP_JWT_ALGORITHM],
     )
+
+
+def validate_response(response, validator):
+    """
+    Validate a decoded response according to OPENLDAP_VALIDATION_MODE.
+
+    'full' validates every response, 'sampled' validates one in every
+    OPENLDAP_VALIDATION_SAMPLE_RATE responses, or none if it is 0, and 'off' skips
+    validation.
+
+    Args:
+        response (dict): Decoded response.
+        validator: Precompiled validator from openldap.schemas.
+    """
+    mode = settings.OPENLDAP_VALIDATION_MODE
+    if mode == 'off':
+        return
+    if mode == 'sampled':
+        rate = settings.OPENLDAP_VALIDATION_SAMPLE_RATE
+        if rate <= 0 or next(_validation_count) % rate:
+            return
+    validator.validate(response)
@@ -1,14 +1,89 @@
 from django import forms
 from django.contrib import admin
+from django.contrib.admin.views.main import ERROR_FLAG
+from django.contrib.admin.views.main import IGNORED_PARAMS
+from django.contrib.admin.views.main import PAGE_VAR
+from django.contrib.admin.views.main import SEARCH_VAR
+from django.core.exceptions import PermissionDenied
+from django.core.exceptions import ValidationError
+from django.http import HttpResponseBadRequest
+from django.urls import path
 
+from project import exports
 from project.forms import ProjectAdminForm
 from project.models import Project
 from project.models import ProjectCategory
+from project.models import ProjectCodeSequence
 from project.models import ProjectFundingSource
 from project.models import ProjectSystemAllocation
 from project.models import ProjectUserMembership
 
 
+class ExportAdminMixin(object):
+    """
+    ModelAdmin mixin adding CSV and XLSX export actions, and an export view at
+    <changelist>/export/.
+
+    The export view takes the changelist's list_filter and search query parameters, a 'format'
+    of 'csv' or 'xlsx', and optionally a comma separated list of 'columns', see project.exports.
+    The changelist's ordering and pagination parameters are ignored, rows are exported in
+    primary key order.
+    """
+    export = None
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            path('export/', self.admin_site.admin_view(self.export_view), name='%s_%s_export' % info),
+        ] + super().get_urls()
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        for name in ['export_csv', 'export_xlsx']:
+            actions[name] = self.get_action(name)
+        return actions
+
+    def export_view(self, request):
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+        params = request.GET.copy()
+        export_format = params.pop('format', [exports.CSV])[-1]
+        names = [name for value in params.pop('columns', []) for name in value.split(',') if name]
+        search_term = params.pop(SEARCH_VAR, [''])[-1]
+        for name in IGNORED_PARAMS + (PAGE_VAR, ERROR_FLAG):
+            params.pop(name, None)
+        try:
+            queryset, use_distinct = self.get_search_results(request, self.get_queryset(request), search_term)
+            queryset = self.filter_export_queryset(queryset, params)
+            if use_distinct:
+                queryset = queryset.distinct()
+            return exports.export_response(self.export, queryset, export_format, names)
+        except (ValueError, ValidationError) as e:
+            return HttpResponseBadRequest(str(e))
+
+    def filter_export_queryset(self, queryset, params):
+        """
+        Filter queryset by the query parameters the changelist's list_filter sets.
+        """
+        filters = {}
+        for lookup, value in params.items():
+            filtered = any(lookup == name or lookup.startswith(name + '__') for name in self.list_filter)
+            if not filtered or not self.lookup_allowed(lookup, value):
+                raise ValueError('Unsupported filter: ' + lookup)
+            filters[lookup] = value
+        return queryset.filter(**filters)
+
+    def export_csv(self, request, queryset):
+        return exports.export_response(self.export, queryset, exports.CSV)
+
+    export_csv.short_description = 'Export selected rows as CSV'
+
+    def export_xlsx(self, request, queryset):
+        return exports.export_response(self.export, queryset, exports.XLSX)
+
+    export_xlsx.short_description = 'Export selected rows as XLSX'
+
+
 @admin.register(ProjectCategory)
 class ProjectCategoryAdmin(admin.ModelAdmin):
     list_display = ('name', )
@@ -23,33 +98,58 @@ class ProjectFundingSourceAdmin(admin.ModelAdmin):
 
 
 @admin.register(ProjectSystemAllocation)
-class ProjectSystemAllocationAdmin(admin.ModelAdmin):
+class ProjectSystemAllocationAdmin(ExportAdminMixin, admin.ModelAdmin):
+    export = exports.ALLOCATIONS
     list_display = (
         'project',
         'system',
     )
+    list_filter = ('system', )
 
 
 @admin.register(ProjectUserMembership)
-class ProjectUserMembershipAdmin(admin.ModelAdmin):
+class ProjectUserMembershipAdmin(ExportAdminMixin, admin.ModelAdmin):
+    export = exports.MEMBERSHIPS
     list_display = (
         'project',
         'user',
         'status',
     )
+    list_filter = (
+        'project__institution',
+        'status',
+    )
 
 
 @admin.register(Project)
-class ProjectAdmin(admin.ModelAdmin):
+class ProjectAdmin(ExportAdminMixin, admin.ModelAdmin):
     form = ProjectAdminForm
+    export = exports.PROJECTS
     list_display = (
         'title',
         'code',
         'institution',
         'tech_lead',
         'status',
+        'authorised_member_count',
+        'awaiting_member_count',
     )
     list_filter = (
         'institution',
         'status',
     )
+    actions = ['approve_projects']
+
+    def approve_projects(self, request, queryset):
+        count = queryset.set_status(Project.APPROVED)
+        self.message_user(request, 'Approved {} projects.'.format(count))
+
+    approve_projects.short_description = 'Approve selected projects'
+
+
+@admin.register(ProjectCodeSequence)
+class ProjectCodeSequenceAdmin(admin.ModelAdmin):
+    list_display = (
+        'prefix',
+        'next_value',
+    )
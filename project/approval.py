@@ -0,0 +1,62 @@
+"""
+Side effects of a project being approved.
+
+When a project moves into Project.APPROVED its technical lead is made an authorised member of
+the project and added to the 'project_owner' group. projects_approved applies them to any number
+of projects with a fixed number of queries.
+"""
+import collections
+import datetime
+
+from django.db import transaction
+
+from project.counters import update_member_counts
+from project.models import ProjectUserMembership
+from users.groups import add_to_group
+from users.groups import get_group_id
+
+PROJECT_OWNER_GROUP = 'project_owner'
+
+
+def projects_approved(projects):
+    """
+    Authorise the technical lead of each newly approved project as a member of it, and add them
+    to the 'project_owner' group.
+
+    Args:
+        projects (iterable): (project id, technical lead id) of each approved project.
+    """
+    tech_leads = dict(projects)
+    if not tech_leads:
+        return
+    today = datetime.date.today()
+    with transaction.atomic():
+        # Memberships the technical leads already hold, e.g. from before a project was declined.
+        memberships = ProjectUserMembership.objects.filter(
+            project_id__in=tech_leads,
+            user_id__in=tech_leads.values(),
+        )
+        existing = {
+            project_id: pk
+            for pk, project_id, user_id in memberships.values_list('pk', 'project_id', 'user_id')
+            if tech_leads[project_id] == user_id
+        }
+        if existing:
+            memberships = ProjectUserMembership.objects.filter(pk__in=existing.values())
+            memberships.set_status(ProjectUserMembership.AUTHORISED)
+            memberships.update(date_joined=today)
+
+        created = [
+            ProjectUserMembership(
+                project_id=project_id,
+                user_id=user_id,
+                status=ProjectUserMembership.AUTHORISED,
+                date_joined=today,
+            ) for project_id, user_id in tech_leads.items() if project_id not in existing
+        ]
+        # bulk_create skips post_save, so the created memberships are counted here.
+        ProjectUserMembership.objects.bulk_create(created)
+        update_member_counts(
+            collections.Counter((membership.project_id, membership.status) for membership in created))
+
+        add_to_group(set(tech_leads.values()), get_group_id(PROJECT_OWNER_GROUP))
@@ -0,0 +1,96 @@
+"""
+Allocation of project codes, e.g. 'scw0042', from a counter per prefix.
+
+Each reservation increments the prefix's ProjectCodeSequence row by the number of codes needed,
+so concurrent reservations are serialised by the row lock the UPDATE takes, and a range of codes
+is reserved as cheaply as a single one. On PostgreSQL the increment and read are a single
+UPDATE ... RETURNING round trip.
+
+Codes must be reserved in the transaction that saves them, as Project.save(),
+ProjectQuerySet.set_status and project.legacy do. A failed save then rolls the increment back
+with it, so codes are allocated without gaps. The lock is held until that transaction ends.
+Uniqueness is enforced by the project_code_uniq index.
+"""
+from django.conf import settings
+from django.db import connection
+from django.db import transaction
+from django.db.models import F
+
+from project.models import ProjectCodeSequence
+
+CODE_FORMAT = '{prefix}{number:04d}'
+
+
+def format_code(prefix, number):
+    return CODE_FORMAT.format(prefix=prefix, number=number)
+
+
+def reserve_codes(count, prefix=None):
+    """
+    Reserve count consecutive project codes, returning them in order. Call it in the transaction
+    saving the codes, see above.
+
+    Args:
+        count (int): Number of codes to reserve.
+        prefix (str): Code prefix, defaults to settings.PROJECT_CODE_PREFIX.
+    """
+    prefix = prefix or settings.PROJECT_CODE_PREFIX
+    if count < 1:
+        return []
+    first = _reserve_numbers(prefix, count)
+    return [format_code(prefix, number) for number in range(first, first + count)]
+
+
+def _reserve_numbers(prefix, count):
+    """
+    Reserve count consecutive numbers, returning the first.
+    """
+    while True:
+        with transaction.atomic():
+            next_value = _increment(prefix, count)
+            if next_value is not None:
+                return next_value - count
+        # The prefix has no sequence yet, get_or_create tolerates a concurrent creation.
+        ProjectCodeSequence.objects.get_or_create(prefix=prefix)
+
+
+def _increment(prefix, count):
+    """
+    Increment the prefix's sequence by count, returning its new next value, or None if the
+    sequence does not exist.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'UPDATE {table} SET next_value = next_value + %s WHERE prefix = %s RETURNING next_value'.format(
+                    table=connection.ops.quote_name(ProjectCodeSequence._meta.db_table)),
+                [count, prefix],
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
+    sequences = ProjectCodeSequence.objects.filter(prefix=prefix)
+    if not sequences.update(next_value=F('next_value') + count):
+        return None
+    return sequences.values_list('next_value', flat=True).get()
+
+
+def advance_sequence(codes, prefix=None):
+    """
+    Ensure the prefix's sequence will not allocate any of codes, e.g. after codes have been
+    imported. Codes with a different prefix, or not ending in a number, are ignored.
+
+    Args:
+        codes (iterable): Existing project codes.
+        prefix (str): Code prefix, defaults to settings.PROJECT_CODE_PREFIX.
+    """
+    prefix = prefix or settings.PROJECT_CODE_PREFIX
+    numbers = [
+        int(code[len(prefix):]) for code in codes
+        if code.startswith(prefix) and code[len(prefix):].isdigit()
+    ]
+    if numbers:
+        ProjectCodeSequence.objects.get_or_create(prefix=prefix)
+        ProjectCodeSequence.objects.filter(
+            prefix=prefix,
+            next_value__lte=max(numbers),
+        ).update(next_value=max(numbers) + 1)
@@ -0,0 +1,133 @@
+"""
+Per project membership counts, stored on Project.<status>_member_count.
+
+The counts are kept exact by project.signals, which adjust them with F() expressions in the
+same transaction as each membership change, and by ProjectUserMembershipQuerySet.set_status for
+bulk status changes. recount_member_counts rebuilds them from the memberships.
+
+A membership is uncounted as its stored (project, status), read with the row locked by
+ProjectUserMembership.save() and delete(), rather than as the values it was loaded with, which a
+concurrent save may since have changed.
+"""
+import collections
+
+from django.db.models import Count
+from django.db.models import F
+from django.db.models import OuterRef
+from django.db.models import Q
+from django.db.models import Subquery
+from django.db.models.functions import Coalesce
+
+from project.models import Project
+from project.models import ProjectUserMembership
+
+
+def update_member_counts(changes):
+    """
+    Apply changes to the member counts, with one UPDATE per distinct set of per project changes,
+    so the many projects changed alike by a bulk operation are updated together.
+
+    Args:
+        changes (dict): Change in count, keyed by (project id, membership status).
+    """
+    deltas_by_project = collections.defaultdict(dict)
+    for (project_id, status), delta in changes.items():
+        if delta:
+            field = ProjectUserMembership.MEMBER_COUNT_FIELDS[status]
+            deltas_by_project[project_id][field] = delta
+    projects_by_deltas = collections.defaultdict(list)
+    for project_id, deltas in deltas_by_project.items():
+        projects_by_deltas[tuple(sorted(deltas.items()))].append(project_id)
+    for deltas, project_ids in projects_by_deltas.items():
+        Project.objects.filter(pk__in=project_ids).update(**{field: F(field) + delta for field, delta in deltas})
+
+
+# Fields a membership is counted by, as they may be given in update_fields.
+COUNTED_FIELDS = {'project', 'project_id', 'status'}
+
+
+def stored_counted_as(membership):
+    """
+    Return the (project id, status) a membership is counted as, read from its row, or None if it
+    has no row. The row is locked until the end of the transaction, so concurrent changes to the
+    membership are counted one after the other.
+    """
+    if membership.pk is None:
+        return None
+    return ProjectUserMembership.objects.select_for_update().filter(pk=membership.pk).values_list(
+        'project_id',
+        'status',
+    ).first()
+
+
+def _counted_as(membership):
+    """
+    Return the (project id, status) the membership is counted as, or None if it is not known.
+    """
+    if hasattr(membership, '_stored_counted_as'):
+        return membership._stored_counted_as
+    if membership.has_saved_value('project_id') and membership.has_saved_value('status'):
+        return (membership.get_saved_value('project_id'), membership.get_saved_value('status'))
+    return None
+
+
+def membership_counted(membership, created):
+    """
+    Update the member counts after a membership has been saved.
+    """
+    previous = None if created else _counted_as(membership)
+    current = (membership.project_id, membership.status)
+    if previous is None and not created:
+        # The membership was not loaded from the database, so its previous state is unknown.
+        recount_member_counts(Project.objects.filter(pk=membership.project_id))
+    elif previous != current:
+        changes = collections.Counter({current: 1})
+        if previous is not None:
+            changes[previous] -= 1
+        update_member_counts(changes)
+
+
+def membership_uncounted(membership):
+    """
+    Update the member counts after a membership has been deleted.
+    """
+    if hasattr(membership, '_stored_counted_as'):
+        counted_as = membership._stored_counted_as
+        if counted_as is None:
+            # The row had already been deleted, and uncounted, by a concurrent delete.
+            return
+    else:
+        # Deleted by a QuerySet or a cascade, which loaded the membership just before.
+        counted_as = _counted_as(membership) or (membership.project_id, membership.status)
+    update_member_counts({counted_as: -1})
+
+
+def _member_count(status):
+    return Coalesce(
+        Subquery(
+            ProjectUserMembership.objects.filter(
+                project=OuterRef('pk'),
+                status=status,
+            ).order_by().values('project').annotate(count=Count('pk')).values('count')),
+        0,
+    )
+
+
+def recount_member_counts(projects=None):
+    """
+    Recompute the member counts of projects from their memberships, returning the number of
+    projects whose counts were wrong.
+
+    Only the projects with a wrong count are updated, each count being computed by a correlated
+    subquery, so the recount runs as a single UPDATE however many projects there are.
+
+    Args:
+        projects (QuerySet): Projects to recount, defaults to every project.
+    """
+    projects = Project.objects.all() if projects is None else projects
+    stale = Q()
+    counts = {}
+    for status, field in ProjectUserMembership.MEMBER_COUNT_FIELDS.items():
+        counts[field] = _member_count(status)
+        stale |= ~Q(**{field: counts[field]})
+    return projects.filter(stale).update(**counts)
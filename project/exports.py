@@ -0,0 +1,206 @@
+"""
+Streaming CSV and XLSX exports of projects, memberships and system allocations.
+
+Rows are read with values_list().iterator(), which uses a server-side cursor on PostgreSQL, and
+written to the response as they are read, so an export holds a single chunk of rows in memory
+however large the table. XLSX workbooks are built with openpyxl's write-only mode, which spools
+rows to a temporary file rather than holding them in memory.
+"""
+import collections
+import csv
+import datetime
+import tempfile
+
+from django.core.exceptions import FieldDoesNotExist
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from project.models import Project
+from project.models import ProjectSystemAllocation
+from project.models import ProjectUserMembership
+
+CSV = 'csv'
+XLSX = 'xlsx'
+FORMATS = {
+    CSV: 'text/csv',
+    XLSX: 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# Rows fetched from the database per round trip.
+CHUNK_SIZE = 2000
+# Bytes read per chunk when streaming a saved XLSX workbook.
+FILE_CHUNK_SIZE = 64 * 1024
+# Leading characters that make spreadsheets read a cell as a formula.
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+Column = collections.namedtuple('Column', ['header', 'lookup'])
+
+
+class Export(object):
+    """
+    The columns that can be exported from a model, keyed by name.
+    """
+
+    def __init__(self, model, columns):
+        """
+        Args:
+            model (Model): Model exported.
+            columns (list): (name, Column) pairs, in their default order.
+        """
+        self.model = model
+        self.columns = collections.OrderedDict(columns)
+
+    def select(self, names=None):
+        """
+        Return the named columns, or every column if names is empty, raising ValueError for an
+        unknown name.
+
+        Args:
+            names (list): Column names.
+        """
+        if not names:
+            return list(self.columns)
+        unknown = [name for name in names if name not in self.columns]
+        if unknown:
+            raise ValueError('Unknown columns: ' + ', '.join(unknown))
+        return list(names)
+
+    def _converter(self, lookup):
+        """
+        Return a function converting values of the lookup for display, or None.
+        """
+        model = self.model
+        field = None
+        for name in lookup.split('__'):
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                return None
+            model = field.related_model
+        if field is not None and field.choices:
+            labels = dict(field.flatchoices)
+            return lambda value: labels.get(value, value)
+        return None
+
+    def rows(self, queryset, names=None):
+        """
+        Yield the header row, then the values of the named columns for each row of queryset.
+
+        Args:
+            queryset (QuerySet): Rows to export.
+            names (list): Column names, defaults to every column.
+        """
+        columns = [self.columns[name] for name in self.select(names)]
+        yield [column.header for column in columns]
+        converters = [self._converter(column.lookup) for column in columns]
+        values = queryset.order_by('pk').values_list(*[column.lookup for column in columns])
+        for row in values.iterator(chunk_size=CHUNK_SIZE):
+            yield [_cell(convert(value) if convert else value) for convert, value in zip(converters, row)]
+
+
+def _cell(value):
+    if isinstance(value, datetime.datetime) and timezone.is_aware(value):
+        # Spreadsheets have no time zones, so datetimes are exported in local time.
+        return timezone.make_naive(value)
+    if value is None:
+        return ''
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        # Text entered by users is never evaluated as a formula when the export is opened.
+        return "'" + value
+    return value
+
+
+PROJECTS = Export(Project, [
+    ('code', Column('Code', 'code')),
+    ('title', Column('Title', 'title')),
+    ('legacy_hpcw_id', Column('Legacy HPC Wales ID', 'legacy_hpcw_id')),
+    ('legacy_arcca_id', Column('Legacy ARCCA ID', 'legacy_arcca_id')),
+    ('institution', Column('Institution', 'institution__name')),
+    ('institution_reference', Column('Institution reference', 'institution_reference')),
+    ('department', Column('Department', 'department')),
+    ('pi', Column('Principal Investigator', 'pi')),
+    ('tech_lead', Column('Technical Lead', 'tech_lead__email')),
+    ('category', Column('Category', 'category__name')),
+    ('funding_source', Column('Funding source', 'funding_source__name')),
+    ('start_date', Column('Start date', 'start_date')),
+    ('end_date', Column('End date', 'end_date')),
+    ('status', Column('Status', 'status')),
+    ('allocation_cputime', Column('CPU time allocation in hours', 'allocation_cputime')),
+    ('allocation_memory', Column('RAM allocation in GB', 'allocation_memory')),
+    ('allocation_storage_home', Column('Home storage in GB', 'allocation_storage_home')),
+    ('allocation_storage_scartch', Column('Scratch storage in GB', 'allocation_storage_scartch')),
+    ('authorised_member_count', Column('Authorised members', 'authorised_member_count')),
+    ('created_time', Column('Created', 'created_time')),
+])
+
+MEMBERSHIPS = Export(ProjectUserMembership, [
+    ('project_code', Column('Project code', 'project__code')),
+    ('project_title', Column('Project title', 'project__title')),
+    ('user', Column('User', 'user__email')),
+    ('status', Column('Status', 'status')),
+    ('date_joined', Column('Date joined', 'date_joined')),
+    ('date_left', Column('Date left', 'date_left')),
+    ('created_time', Column('Created', 'created_time')),
+    ('modified_time', Column('Modified', 'modified_time')),
+])
+
+ALLOCATIONS = Export(ProjectSystemAllocation, [
+    ('project_code', Column('Project code', 'project__code')),
+    ('project_title', Column('Project title', 'project__title')),
+    ('system', Column('System', 'system__name')),
+    ('date_allocated', Column('Date allocated', 'date_allocated')),
+    ('date_unallocated', Column('Date unallocated', 'date_unallocated')),
+])
+
+
+class _Echo(object):
+    """
+    File-like object returning what is written to it, for csv.writer.
+    """
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_xlsx(rows):
+    """
+    Write rows to an XLSX workbook in a temporary file, then yield the file in chunks.
+    """
+    import openpyxl
+
+    workbook = openpyxl.Workbook(write_only=True)
+    worksheet = workbook.create_sheet()
+    for row in rows:
+        worksheet.append(row)
+    with tempfile.TemporaryFile() as workbook_file:
+        workbook.save(workbook_file)
+        workbook_file.seek(0)
+        for chunk in iter(lambda: workbook_file.read(FILE_CHUNK_SIZE), b''):
+            yield chunk
+
+
+def export_response(export, queryset, export_format, names=None, filename=None):
+    """
+    Return a StreamingHttpResponse exporting queryset.
+
+    Args:
+        export (Export): Columns of the model exported.
+        queryset (QuerySet): Rows to export.
+        export_format (str): CSV or XLSX.
+        names (list): Column names, defaults to every column.
+        filename (str): Download file name, without the extension.
+    """
+    if export_format not in FORMATS:
+        raise ValueError('Unknown export format: ' + str(export_format))
+    rows = export.rows(queryset, export.select(names))
+    content = stream_csv(rows) if export_format == CSV else stream_xlsx(rows)
+    response = StreamingHttpResponse(content, content_type=FORMATS[export_format])
+    filename = '.'.join([filename or export.model._meta.model_name, export_format])
+    response['Content-Disposition'] = 'attachment; filename="{}"'.format(filename)
+    return response
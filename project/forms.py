@@ -12,11 +12,12 @@ class ProjectAdminForm(forms.ModelForm):
 
     def clean_code(self):
         """
-        Ensure the project code is unique.
+        Ensure the project code is unique. A blank code is allocated on approval, see
+        project.codes.
         """
         current_code = self.instance.code
         updated_code = self.cleaned_data['code']
-        if current_code != updated_code:
+        if updated_code and current_code != updated_code:
             if Project.objects.filter(code=updated_code).exists():
                 raise forms.ValidationError('Project code must be unique.')
         return updated_code
@@ -67,3 +68,72 @@ class ProjectUserMembershipCreationForm(forms.Form):
         except Project.DoesNotExist:
             raise forms.ValidationError("Invalid Project Code.")
         return project_code
+
+
+class ProjectUserMembershipBulkUpdateForm(forms.Form):
+    """
+    Set the status of many project user memberships at once.
+
+    Only membership requests made to the user's own approved projects can be selected, so the
+    ownership of the whole batch is checked by a single query.
+    """
+    MAX_MEMBERSHIPS = 500
+
+    memberships = forms.ModelMultipleChoiceField(queryset=ProjectUserMembership.objects.none())
+    status = forms.TypedChoiceField(
+        choices=[
+            (ProjectUserMembership.AUTHORISED, 'Authorise'),
+            (ProjectUserMembership.DECLINED, 'Decline'),
+            (ProjectUserMembership.REVOKED, 'Revoke'),
+            (ProjectUserMembership.SUSPENDED, 'Suspend'),
+        ],
+        coerce=int,
+    )
+
+    def __init__(self, user, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['memberships'].queryset = ProjectUserMembership.objects.filter(
+            project__tech_lead=user,
+            project__status=Project.APPROVED,
+        ).exclude(user=user)
+
+    def clean_memberships(self):
+        memberships = self.cleaned_data['memberships']
+        if len(memberships) > self.MAX_MEMBERSHIPS:
+            raise forms.ValidationError(
+                'At most {} memberships can be updated at once.'.format(self.MAX_MEMBERSHIPS))
+        return memberships
+
+    def clean(self):
+        cleaned_data = super().clean()
+        memberships = cleaned_data.get('memberships')
+        status = cleaned_data.get('status')
+        if memberships is None or status is None:
+            return cleaned_data
+        invalid = [
+            str(pk) for pk, current in memberships.values_list('pk', 'status')
+            if current != status and status not in ProjectUserMembership.STATUS_TRANSITIONS[current]
+        ]
+        if invalid:
+            self.add_error(
+                'memberships',
+                'The status of memberships {} can not be changed to {}.'.format(
+                    ', '.join(sorted(invalid, key=int)),
+                    dict(ProjectUserMembership.STATUS_CHOICES)[status],
+                ),
+            )
+        return cleaned_data
+
+    def save(self):
+        """
+        Set the status of the selected memberships, returning the number updated.
+
+        Memberships whose status has changed since the form was cleaned, to one the new status
+        can not be reached from, are left unchanged.
+        """
+        status = self.cleaned_data['status']
+        allowed = [
+            current for current, statuses in ProjectUserMembership.STATUS_TRANSITIONS.items()
+            if status in statuses
+        ]
+        return self.cleaned_data['memberships'].filter(status__in=allowed).set_status(status)
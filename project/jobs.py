@@ -0,0 +1,21 @@
+from django_rq import job
+
+from project import lifecycle
+
+
+@job('default')
+def sweep_lifecycle(full=False, batch_size=500, close_inactive_accounts=False):
+    """
+    Close the projects, and revoke the memberships, whose dates passed since the last sweep.
+    """
+    result = lifecycle.run(
+        full=full,
+        batch_size=batch_size,
+        close_inactive_accounts=close_inactive_accounts,
+    )
+    return {
+        'swept_date': result.swept_date.isoformat(),
+        'projects_closed': result.projects_closed,
+        'memberships_revoked': result.memberships_revoked,
+        'accounts_closed': result.accounts_closed,
+    }
@@ -0,0 +1,404 @@
+"""
+Bulk import of legacy HPC Wales and ARCCA projects.
+
+Rows are streamed from a CSV or XLSX file and upserted in batches, keyed by legacy_hpcw_id, or
+legacy_arcca_id when a row has no HPC Wales id. Institutions, funding sources, categories and
+users are resolved through maps built once per import, and each batch is written with a fixed
+number of queries, so the per row model signals are bypassed. Their effects are applied in bulk
+instead: approved projects are allocated codes and have their technical leads authorised, see
+project.approval, and the member counts are kept exact.
+"""
+import collections
+import contextlib
+import csv
+import datetime
+import itertools
+import os
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Case
+from django.db.models import F
+from django.db.models import Q
+from django.db.models import Value
+from django.db.models import When
+from django.utils import timezone
+
+from institution.models import Institution
+from project import codes
+from project.approval import projects_approved
+from project.counters import update_member_counts
+from project.models import Project
+from project.models import ProjectCategory
+from project.models import ProjectFundingSource
+from project.models import ProjectUserMembership
+from users.models import CustomUser
+
+# Project fields read from the column of the same name.
+PROJECT_FIELDS = (
+    'legacy_hpcw_id',
+    'legacy_arcca_id',
+    'code',
+    'title',
+    'description',
+    'institution_reference',
+    'department',
+    'pi',
+    'start_date',
+    'end_date',
+    'economic_user',
+    'requirements_software',
+    'requirements_gateways',
+    'requirements_training',
+    'requirements_onboarding',
+    'allocation_rse',
+    'allocation_cputime',
+    'allocation_memory',
+    'allocation_storage_home',
+    'allocation_storage_scartch',
+    'status',
+    'notes',
+)
+
+# Project fields written when an existing project is updated. The code is only written when
+# the row has one.
+UPDATE_FIELDS = tuple(field for field in PROJECT_FIELDS if field != 'code') + (
+    'institution_id',
+    'tech_lead_id',
+    'category_id',
+    'funding_source_id',
+)
+
+# Separator of the email addresses in the 'members' column.
+MEMBER_SEPARATOR = ';'
+
+ImportResult = collections.namedtuple('ImportResult', ['rows', 'created', 'updated', 'memberships', 'errors'])
+
+
+class RowError(Exception):
+    pass
+
+
+def read_rows(path):
+    """
+    Return an iterator lazily yielding each row of a CSV or XLSX file as a dict keyed by the
+    header row.
+
+    XLSX files are opened in openpyxl's read-only mode, so neither format is loaded into memory.
+
+    Args:
+        path (str): Path to a .csv or .xlsx file.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return _read_csv(path)
+    elif extension == '.xlsx':
+        return _read_xlsx(path)
+    raise ValueError('Unsupported file type: ' + path)
+
+
+def _read_csv(path):
+    # utf-8-sig also reads the byte order mark spreadsheets write at the start of CSV exports.
+    with open(path, newline='', encoding='utf-8-sig') as csvfile:
+        yield from csv.DictReader(csvfile)
+
+
+def _read_xlsx(path):
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = (tuple(cell.value for cell in row) for row in workbook.active.rows)
+        header = next(rows, None)
+        if header is None:
+            return
+        header = [_text(name) for name in header]
+        for values in rows:
+            if any(value is not None for value in values):
+                yield dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+class References(object):
+    """
+    In-memory maps of the rows referenced by legacy projects, keyed case insensitively.
+    """
+
+    def __init__(self):
+        self.institutions = {}
+        for pk, name, base_domain in Institution.objects.values_list('pk', 'name', 'base_domain'):
+            self.institutions[name.lower()] = pk
+            if base_domain:
+                self.institutions[base_domain.lower()] = pk
+        self.funding_sources = {
+            name.lower(): pk for pk, name in ProjectFundingSource.objects.values_list('pk', 'name')
+        }
+        self.categories = {name.lower(): pk for pk, name in ProjectCategory.objects.values_list('pk', 'name')}
+        self.users = {email.lower(): pk for pk, email in CustomUser.objects.values_list('pk', 'email')}
+
+    @staticmethod
+    def resolve(mapping, value, label):
+        try:
+            return mapping[_text(value).lower()]
+        except KeyError:
+            raise RowError('Unknown {}: {}'.format(label, value))
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        # Spreadsheets store numeric ids as floats.
+        value = int(value)
+    return str(value).strip()
+
+
+STATUSES = {label.lower(): status for status, label in Project.STATUS_CHOICES}
+
+
+def _value(row, name):
+    """
+    Return the cleaned value of a project field, or its default if the row has no value.
+    """
+    field = Project._meta.get_field(name)
+    value = row.get(name)
+    if isinstance(value, datetime.datetime):
+        value = value.date()
+    elif not isinstance(value, (bool, int, datetime.date)):
+        value = _text(value)
+    if value == '':
+        if field.has_default():
+            return field.get_default()
+        if field.blank:
+            return ''
+    if name == 'status' and isinstance(value, str) and value.lower() in STATUSES:
+        value = STATUSES[value.lower()]
+    try:
+        return field.clean(value, None)
+    except ValidationError as e:
+        raise RowError('{}: {}'.format(name, ' '.join(e.messages)))
+
+
+def parse_row(row, references):
+    """
+    Return the project described by a row, and the ids of its members.
+
+    Args:
+        row (dict): Row read by read_rows.
+        references (References): Maps of the rows referenced by legacy projects.
+    """
+    project = Project(**{name: _value(row, name) for name in PROJECT_FIELDS})
+    if not project.legacy_hpcw_id and not project.legacy_arcca_id:
+        raise RowError('A legacy_hpcw_id or legacy_arcca_id is required.')
+    project.institution_id = references.resolve(references.institutions, row.get('institution'), 'institution')
+    project.tech_lead_id = references.resolve(references.users, row.get('tech_lead'), 'technical lead')
+    project.funding_source_id = references.resolve(
+        references.funding_sources,
+        row.get('funding_source'),
+        'funding source',
+    )
+    if _text(row.get('category')):
+        project.category_id = references.resolve(references.categories, row.get('category'), 'category')
+    members = {
+        references.resolve(references.users, email, 'member')
+        for email in _text(row.get('members')).split(MEMBER_SEPARATOR) if email.strip()
+    }
+    return project, members
+
+
+def legacy_key(project):
+    if project.legacy_hpcw_id:
+        return ('hpcw', project.legacy_hpcw_id)
+    return ('arcca', project.legacy_arcca_id)
+
+
+def _existing_projects(keys):
+    """
+    Return the (pk, status, code) of the existing projects with any of the legacy keys, keyed by
+    legacy key.
+    """
+    hpcw_ids = [legacy_id for kind, legacy_id in keys if kind == 'hpcw']
+    arcca_ids = [legacy_id for kind, legacy_id in keys if kind == 'arcca']
+    projects = Project.objects.filter(Q(legacy_hpcw_id__in=hpcw_ids) | Q(legacy_arcca_id__in=arcca_ids))
+    existing = {}
+    for pk, hpcw_id, arcca_id, status, code in projects.values_list(
+            'pk', 'legacy_hpcw_id', 'legacy_arcca_id', 'status', 'code'):
+        for key in [('hpcw', hpcw_id), ('arcca', arcca_id)]:
+            if key in keys:
+                existing[key] = (pk, status, code)
+    return existing
+
+
+def _check_codes(batch, existing):
+    """
+    Drop the rows whose code belongs to another project, or to an earlier row of the batch,
+    returning their errors. Codes of rows in earlier batches belong to their projects by then.
+    """
+    requested = {}
+    errors = {}
+    for key, (project, _, line) in sorted(batch.items(), key=lambda item: item[1][2]):
+        if not project.code:
+            continue
+        if project.code in requested:
+            batch.pop(key)
+            errors[line] = 'Project code already in use: ' + project.code
+        else:
+            requested[project.code] = key
+    if not requested:
+        return errors
+    taken = collections.defaultdict(set)
+    for code, pk in Project.objects.filter(code__in=requested).values_list('code', 'pk'):
+        taken[code].add(pk)
+    for code, key in requested.items():
+        own = existing.get(key, (None, ))[0]
+        if taken[code] - {own}:
+            _, _, line = batch.pop(key)
+            errors[line] = 'Project code already in use: ' + code
+    return errors
+
+
+def _update_case(name, projects):
+    field = Project._meta.get_field(name)
+    return Case(
+        *[When(pk=pk, then=Value(getattr(project, name))) for pk, project in projects],
+        output_field=field.target_field if field.is_relation else field,
+    )
+
+
+def import_batch(batch):
+    """
+    Upsert a batch of parsed rows, returning (created, updated, memberships, errors).
+
+    Args:
+        batch (dict): (project, member ids, line number) keyed by legacy key.
+    """
+    existing = _existing_projects(set(batch))
+    errors = _check_codes(batch, existing)
+    if not batch:
+        return 0, 0, 0, errors
+
+    new = [project for key, (project, _, _) in batch.items() if key not in existing]
+    updated = [(existing[key][0], project) for key, (project, _, _) in batch.items() if key in existing]
+
+    # Imported codes are never allocated again.
+    codes.advance_sequence(project.code for project, _, _ in batch.values() if project.code)
+    # Approved projects without a code are allocated one, in row order, from a single range.
+    uncoded = [
+        project for key, (project, _, _) in batch.items()
+        if project.status == Project.APPROVED and not project.code and not existing.get(key, (None, None, ''))[2]
+    ]
+    for project, code in zip(uncoded, codes.reserve_codes(len(uncoded))):
+        project.code = code
+
+    Project.objects.bulk_create(new)
+
+    if updated:
+        fields = {field: _update_case(field, updated) for field in UPDATE_FIELDS}
+        coded = [(pk, project) for pk, project in updated if project.code]
+        if coded:
+            fields['code'] = Case(
+                *[When(pk=pk, then=Value(project.code)) for pk, project in coded],
+                default=F('code'),
+            )
+        fields['modified_time'] = timezone.now()
+        Project.objects.filter(pk__in=[pk for pk, _ in updated]).update(**fields)
+
+    # bulk_create only sets primary keys on PostgreSQL, so the new projects are looked up.
+    pks = {key: pk for key, (pk, _, _) in _existing_projects(set(batch)).items()}
+
+    approved = [
+        (pks[key], project.tech_lead_id) for key, (project, _, _) in batch.items()
+        if project.status == Project.APPROVED and existing.get(key, (None, None))[1] != Project.APPROVED
+    ]
+    memberships = _import_memberships({pks[key]: members for key, (_, members, _) in batch.items()})
+    projects_approved(approved)
+    return len(new), len(updated), memberships, errors
+
+
+def _import_memberships(members):
+    """
+    Authorise each member of each project, returning the number of memberships created or
+    authorised.
+
+    Args:
+        members (dict): Member ids keyed by project id.
+    """
+    pairs = {(project_id, user_id) for project_id, user_ids in members.items() for user_id in user_ids}
+    if not pairs:
+        return 0
+    memberships = ProjectUserMembership.objects.filter(
+        project_id__in={project_id for project_id, _ in pairs},
+        user_id__in={user_id for _, user_id in pairs},
+    )
+    existing = {}
+    for pk, project_id, user_id in memberships.values_list('pk', 'project_id', 'user_id'):
+        if (project_id, user_id) in pairs:
+            existing[project_id, user_id] = pk
+    authorised = ProjectUserMembership.objects.filter(pk__in=existing.values()).set_status(
+        ProjectUserMembership.AUTHORISED)
+
+    today = datetime.date.today()
+    created = [
+        ProjectUserMembership(
+            project_id=project_id,
+            user_id=user_id,
+            status=ProjectUserMembership.AUTHORISED,
+            date_joined=today,
+        ) for project_id, user_id in sorted(pairs - set(existing))
+    ]
+    # bulk_create skips post_save, so the created memberships are counted here.
+    ProjectUserMembership.objects.bulk_create(created)
+    update_member_counts(collections.Counter((membership.project_id, membership.status) for membership in created))
+    return authorised + len(created)
+
+
+def import_projects(rows, batch_size=500, dry_run=False, progress=None):
+    """
+    Upsert legacy projects and their memberships.
+
+    Each batch is imported in its own transaction. A row that cannot be imported, e.g. because
+    it references an unknown institution, is reported in the result's errors and skipped.
+
+    Args:
+        rows (iterable): Rows as yielded by read_rows.
+        batch_size (int): Number of rows imported per batch.
+        dry_run (bool): Import the rows, then roll every change back.
+        progress (callable): Called with the ImportResult so far after each batch.
+    """
+    references = References()
+    result = ImportResult(rows=0, created=0, updated=0, memberships=0, errors={})
+    rows = enumerate(rows, start=2)
+    with contextlib.ExitStack() as stack:
+        if dry_run:
+            stack.enter_context(transaction.atomic())
+        while True:
+            chunk = list(itertools.islice(rows, batch_size))
+            if not chunk:
+                break
+            batch = collections.OrderedDict()
+            errors = {}
+            for line, row in chunk:
+                try:
+                    project, members = parse_row(row, references)
+                except RowError as e:
+                    errors[line] = str(e)
+                else:
+                    # A project repeated within a batch is imported from its last row.
+                    batch.pop(legacy_key(project), None)
+                    batch[legacy_key(project)] = (project, members, line)
+            with transaction.atomic():
+                created, updated, memberships, batch_errors = import_batch(batch)
+            errors.update(batch_errors)
+            result.errors.update(errors)
+            result = result._replace(
+                rows=result.rows + len(chunk),
+                created=result.created + created,
+                updated=result.updated + updated,
+                memberships=result.memberships + memberships,
+            )
+            if progress is not None:
+                progress(result)
+        if dry_run:
+            transaction.set_rollback(True)
+    return result
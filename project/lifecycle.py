@@ -0,0 +1,264 @@
+"""
+Closing of projects past their end date and revocation of memberships past their leaving date.
+
+Each run only considers the dates that passed since the previous run, recorded on a
+ProjectLifecycleCheckpoint, so it is a range query on the indexed Project.end_date and
+ProjectUserMembership.date_left columns. Expired rows are updated with set-based UPDATEs in
+batches, each in its own transaction, and the notifications and directory changes resulting
+from a batch are queued once its transaction commits. A run that fails partway has then sent
+the side effects of every batch it applied, and the next run picks up the remaining rows.
+
+Accounts are only closed when a run is asked to close them, as a closed profile has to be
+approved again before its user can rejoin a project.
+"""
+import collections
+import datetime
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from notification.jobs import enqueue_notification
+from openldap import jobs as openldap_jobs
+from project.models import Project
+from project.models import ProjectLifecycleCheckpoint
+from project.models import ProjectUserMembership
+from users import snapshot
+from users.models import CustomUser
+from users.models import Profile
+
+logger = logging.getLogger('apps')
+
+CHECKPOINT_NAME = 'default'
+
+# Project statuses closed once the project's end date has passed.
+EXPIRING_PROJECT_STATUSES = (
+    Project.AWAITING_APPROVAL,
+    Project.APPROVED,
+    Project.SUSPENDED,
+)
+
+# Membership statuses revoked once the membership's leaving date, or its project's end date,
+# has passed.
+EXPIRING_MEMBERSHIP_STATUSES = (
+    ProjectUserMembership.AWAITING_AUTHORISATION,
+    ProjectUserMembership.AUTHORISED,
+    ProjectUserMembership.SUSPENDED,
+)
+
+SweepResult = collections.namedtuple('SweepResult', [
+    'swept_date',
+    'projects_closed',
+    'memberships_revoked',
+    'accounts_closed',
+])
+
+
+def expired(queryset, field, since, until):
+    """
+    Filter queryset to the rows whose date field passed on or after since and before until.
+
+    Args:
+        queryset (QuerySet): Rows to filter.
+        field (str): Date field.
+        since (datetime.date): First date, or None for no lower bound.
+        until (datetime.date): Date after the last date.
+    """
+    queryset = queryset.filter(**{field + '__lt': until})
+    if since is not None:
+        queryset = queryset.filter(**{field + '__gte': since})
+    return queryset
+
+
+def _batches(queryset, batch_size):
+    """
+    Yield the primary keys of queryset in batches, until it is empty.
+
+    The caller must update each batch so that it drops out of queryset.
+    """
+    while True:
+        pks = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return
+        yield pks
+
+
+def close_projects(since, until, batch_size, close_inactive_accounts=False):
+    """
+    Close the projects that ended between since and until, revoking their memberships. Returns
+    the number of projects closed, of memberships revoked and of accounts closed.
+    """
+    projects = expired(
+        Project.objects.filter(status__in=EXPIRING_PROJECT_STATUSES),
+        'end_date',
+        since,
+        until,
+    ).order_by('end_date', 'pk')
+    closed = 0
+    revoked = 0
+    accounts_closed = 0
+    for pks in _batches(projects, batch_size):
+        with transaction.atomic():
+            notices = collections.defaultdict(list)
+            for tech_lead_id, title in Project.objects.filter(pk__in=pks).values_list('tech_lead_id', 'title'):
+                notices[tech_lead_id].append('Project "{}" has ended and has been closed.'.format(title))
+            closed += Project.objects.filter(pk__in=pks).set_status(Project.CLOSED)
+            revoked += revoke_memberships(
+                ProjectUserMembership.objects.filter(project_id__in=pks),
+                until,
+                notices,
+            )
+            accounts_closed += queue_side_effects(notices, close_inactive_accounts)
+    return closed, revoked, accounts_closed
+
+
+def revoke_memberships(memberships, until, notices):
+    """
+    Revoke memberships, returning the number revoked.
+
+    Args:
+        memberships (QuerySet): Memberships to revoke.
+        until (datetime.date): Date after the last date of the memberships.
+        notices (dict): Notices to send, keyed by user id.
+    """
+    memberships = memberships.filter(status__in=EXPIRING_MEMBERSHIP_STATUSES)
+    rows = list(memberships.values_list('pk', 'user_id', 'project__title'))
+    for _, user_id, title in rows:
+        notices[user_id].append('Your membership of project "{}" has ended.'.format(title))
+    pks = [pk for pk, _, _ in rows]
+    revoked = ProjectUserMembership.objects.filter(pk__in=pks).set_status(ProjectUserMembership.REVOKED)
+    last_day = until - datetime.timedelta(days=1)
+    ProjectUserMembership.objects.filter(pk__in=pks, date_left__gt=last_day).update(date_left=last_day)
+    return revoked
+
+
+def expire_memberships(since, until, batch_size, close_inactive_accounts=False):
+    """
+    Revoke the memberships whose leaving date passed between since and until. Returns the
+    number of memberships revoked and of accounts closed.
+    """
+    memberships = expired(
+        ProjectUserMembership.objects.filter(status__in=EXPIRING_MEMBERSHIP_STATUSES),
+        'date_left',
+        since,
+        until,
+    ).order_by('date_left', 'pk')
+    revoked = 0
+    accounts_closed = 0
+    for pks in _batches(memberships, batch_size):
+        with transaction.atomic():
+            notices = collections.defaultdict(list)
+            revoked += revoke_memberships(ProjectUserMembership.objects.filter(pk__in=pks), until, notices)
+            accounts_closed += queue_side_effects(notices, close_inactive_accounts)
+    return revoked, accounts_closed
+
+
+def close_accounts(user_ids):
+    """
+    Close the approved accounts of the users left without a project, returning their email
+    addresses.
+
+    Users with an authorised or awaiting membership, or who are the technical lead of a project
+    that is not closed, keep their accounts. Profiles are updated with their modified time, so
+    the directory reconciliation in openldap.sync agrees with the deactivations queued for them.
+    """
+    profiles = Profile.objects.filter(
+        user_id__in=user_ids,
+        user__is_staff=False,
+        account_status=Profile.APPROVED,
+    ).exclude(
+        user__projectusermembership__status__in=[
+            ProjectUserMembership.AUTHORISED,
+            ProjectUserMembership.AWAITING_AUTHORISATION,
+        ],
+    ).exclude(
+        user__project_as_tech_lead__in=Project.objects.exclude(status=Project.CLOSED),
+    )
+    closed = dict(profiles.values_list('user_id', 'user__email'))
+    Profile.objects.filter(user_id__in=closed).update(
+        account_status=Profile.CLOSED,
+        modified_time=timezone.now(),
+    )
+    # QuerySet.update() sends no signals, see users.snapshot.
+    snapshot.invalidate(closed)
+    return list(closed.values())
+
+
+def queue_side_effects(notices, close_inactive_accounts=False):
+    """
+    Apply the side effects of a batch, in its transaction, returning the number of accounts
+    closed.
+
+    If close_inactive_accounts is set, the accounts of the batch's users left without a project,
+    see close_accounts, are closed. Once the transaction commits, each user is sent one
+    notification, and the closed accounts are deactivated in the directory through
+    openldap.jobs.
+
+    Args:
+        notices (dict): Notices to send, keyed by user id.
+        close_inactive_accounts (bool): Close the accounts of users left without a project.
+    """
+    if not notices:
+        return 0
+    accounts_closed = close_accounts(list(notices)) if close_inactive_accounts else []
+    emails = dict(CustomUser.objects.filter(pk__in=notices).values_list('pk', 'email'))
+    messages = [(emails[user_id], '\n'.join(lines)) for user_id, lines in notices.items()]
+
+    def send():
+        for email, message in messages:
+            enqueue_notification(email, 'Project membership update', message)
+        for email in accounts_closed:
+            try:
+                openldap_jobs.enqueue_account_operation(email, openldap_jobs.DELETE)
+            except Exception:
+                # The closed profile is deactivated by the next directory reconciliation.
+                logger.exception('Failed to queue the deactivation of directory account %s.', email)
+
+    transaction.on_commit(send)
+    return len(accounts_closed)
+
+
+def run(full=False, batch_size=500, today=None, close_inactive_accounts=False):
+    """
+    Close the projects, and revoke the memberships, whose dates passed since the last run.
+
+    The side effects of each batch, see queue_side_effects, are queued as it commits. Once every
+    batch has been applied the checkpoint is advanced, so a failed run is picked up again by the
+    next one.
+
+    Args:
+        full (bool): Ignore the checkpoint and consider every date before today.
+        batch_size (int): Number of rows updated per batch.
+        today (datetime.date): Date of the run, defaults to today.
+        close_inactive_accounts (bool): Close the accounts of users left without a project.
+    """
+    until = today or datetime.date.today()
+    checkpoint = None if full else ProjectLifecycleCheckpoint.objects.filter(name=CHECKPOINT_NAME).first()
+    since = checkpoint.swept_date if checkpoint else None
+
+    projects_closed, memberships_revoked, accounts_closed = close_projects(
+        since,
+        until,
+        batch_size,
+        close_inactive_accounts,
+    )
+    revoked, closed = expire_memberships(since, until, batch_size, close_inactive_accounts)
+    memberships_revoked += revoked
+    accounts_closed += closed
+
+    ProjectLifecycleCheckpoint.objects.update_or_create(
+        name=CHECKPOINT_NAME,
+        defaults={'swept_date': until},
+    )
+    logger.info(
+        'Closed %s projects, revoked %s memberships and closed %s accounts.',
+        projects_closed,
+        memberships_revoked,
+        accounts_closed,
+    )
+    return SweepResult(
+        swept_date=until,
+        projects_closed=projects_closed,
+        memberships_revoked=memberships_revoked,
+        accounts_closed=accounts_closed,
+    )
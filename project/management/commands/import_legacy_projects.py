@@ -0,0 +1,59 @@
+import os
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from project import legacy
+
+
+class Command(BaseCommand):
+    help = 'Create or update legacy HPC Wales and ARCCA projects, and their members, from a csv or xlsx file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('filename')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of rows imported per batch.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Import the rows, then roll every change back.',
+        )
+
+    def progress(self, result):
+        self.stdout.write('Processed {} rows: {} created, {} updated, {} memberships, {} errors.'.format(
+            result.rows,
+            result.created,
+            result.updated,
+            result.memberships,
+            len(result.errors),
+        ))
+
+    def handle(self, *args, **options):
+        filename = options['filename']
+        if not os.path.isfile(filename):
+            raise CommandError('Unable to open ' + filename)
+        try:
+            rows = legacy.read_rows(filename)
+        except ValueError as e:
+            raise CommandError(str(e))
+        result = legacy.import_projects(
+            rows,
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+            progress=self.progress,
+        )
+
+        for line, error in sorted(result.errors.items()):
+            self.stdout.write(self.style.ERROR('Row {}: {}'.format(line, error)))
+        self.stdout.write(
+            self.style.SUCCESS('Imported {} projects ({} created, {} updated){}, {} rows failed.'.format(
+                result.created + result.updated,
+                result.created,
+                result.updated,
+                ' (dry run)' if options['dry_run'] else '',
+                len(result.errors),
+            )))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from project.counters import recount_member_counts
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per project membership counts from the project memberships.'
+
+    def handle(self, *args, **options):
+        repaired = recount_member_counts()
+        self.stdout.write(self.style.SUCCESS('Repaired the member counts of {} projects.'.format(repaired)))
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+
+from project import jobs
+from project import lifecycle
+
+
+class Command(BaseCommand):
+    help = 'Close projects past their end date and revoke memberships past their leaving date, run daily.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Ignore the last checkpoint and consider every date before today.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of rows updated per batch.',
+        )
+        parser.add_argument(
+            '--close-accounts',
+            action='store_true',
+            help='Close, and deactivate in the directory, the accounts of users left without a project.',
+        )
+        parser.add_argument(
+            '--enqueue',
+            action='store_true',
+            help='Run the sweep as an RQ job on the default queue.',
+        )
+
+    def handle(self, *args, **options):
+        kwargs = {
+            'full': options['full'],
+            'batch_size': options['batch_size'],
+            'close_inactive_accounts': options['close_accounts'],
+        }
+        if options['enqueue']:
+            job = jobs.sweep_lifecycle.delay(**kwargs)
+            self.stdout.write(self.style.SUCCESS('Enqueued project lifecycle sweep job: ' + job.id))
+            return
+
+        result = lifecycle.run(**kwargs)
+        self.stdout.write(
+            self.style.SUCCESS('Swept dates before {}: {} projects closed, {} memberships revoked, {} accounts closed.'.format(
+                result.swept_date,
+                result.projects_closed,
+                result.memberships_revoked,
+                result.accounts_closed,
+            )))
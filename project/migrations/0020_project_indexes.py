@@ -0,0 +1,26 @@
+# Generated by Django 2.0.2 on 2026-10-18 17:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0019_auto_20180516_1034'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['tech_lead', 'status'], name='project_tech_lead_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projectusermembership',
+            index=models.Index(fields=['project', 'status'], name='membership_project_status_idx'),
+        ),
+        # Codes are only assigned once a project is approved, so blank codes are excluded.
+        migrations.RunSQL(
+            sql=["CREATE UNIQUE INDEX project_code_uniq ON project_project (code) WHERE code <> ''"],
+            reverse_sql=['DROP INDEX project_code_uniq'],
+        ),
+    ]
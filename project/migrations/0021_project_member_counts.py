@@ -0,0 +1,64 @@
+# Generated by Django 2.0.2 on 2026-10-18 17:35
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models import OuterRef
+from django.db.models import Subquery
+from django.db.models.functions import Coalesce
+
+MEMBER_COUNT_FIELDS = {
+    1: 'awaiting_member_count',
+    2: 'authorised_member_count',
+    3: 'declined_member_count',
+    4: 'revoked_member_count',
+    5: 'suspended_member_count',
+}
+
+
+def count_members(apps, schema_editor):
+    Project = apps.get_model('project', 'Project')
+    ProjectUserMembership = apps.get_model('project', 'ProjectUserMembership')
+    counts = {}
+    for status, field in MEMBER_COUNT_FIELDS.items():
+        members = ProjectUserMembership.objects.filter(
+            project=OuterRef('pk'),
+            status=status,
+        ).order_by().values('project').annotate(count=Count('pk')).values('count')
+        counts[field] = Coalesce(Subquery(members), 0)
+    Project.objects.update(**counts)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0020_project_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='authorised_member_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='awaiting_member_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='declined_member_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='revoked_member_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='suspended_member_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_members, migrations.RunPython.noop),
+    ]
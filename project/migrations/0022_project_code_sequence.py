@@ -0,0 +1,45 @@
+# Generated by Django 2.0.2 on 2026-10-18 17:41
+
+from django.db import migrations, models
+
+
+def start_code_sequence(apps, schema_editor):
+    """
+    Start the project code sequence after the highest existing code with its prefix.
+    """
+    Project = apps.get_model('project', 'Project')
+    ProjectCodeSequence = apps.get_model('project', 'ProjectCodeSequence')
+    # The default PROJECT_CODE_PREFIX, as a literal so the migration does not depend on settings.
+    # The sequence of any other prefix starts at 1 when first used, see project.codes.
+    prefix = 'scw'
+    numbers = [
+        int(code[len(prefix):]) for code in Project.objects.filter(code__startswith=prefix).values_list('code', flat=True)
+        if code[len(prefix):].isdigit()
+    ]
+    ProjectCodeSequence.objects.create(prefix=prefix, next_value=max(numbers, default=0) + 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0021_project_member_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectCodeSequence',
+            fields=[
+                ('prefix', models.CharField(max_length=10, primary_key=True, serialize=False)),
+                ('next_value', models.PositiveIntegerField(default=1)),
+            ],
+            options={
+                'verbose_name_plural': 'Project Code Sequences',
+            },
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='code',
+            field=models.CharField(blank=True, help_text='Allocated when the project is approved, if left blank.', max_length=20, verbose_name='Project code assigned by SCW'),
+        ),
+        migrations.RunPython(start_code_sequence, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.0.2 on 2026-10-18 17:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0022_project_code_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectLifecycleCheckpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True)),
+                ('swept_date', models.DateField(help_text='Dates before this date have been acted on')),
+                ('created_time', models.DateTimeField(auto_now_add=True)),
+                ('modified_time', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['end_date'], name='project_end_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projectusermembership',
+            index=models.Index(fields=['date_left'], name='membership_date_left_idx'),
+        ),
+    ]
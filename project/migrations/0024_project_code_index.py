@@ -0,0 +1,24 @@
+# Generated by Django 2.0.2 on 2026-10-18 19:05
+
+import cogs3.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0023_project_lifecycle'),
+    ]
+
+    operations = [
+        # The index created with RunSQL in 0020 is not part of the migration state, so sqlite
+        # drops it whenever it rebuilds the table, e.g. in 0021. It is recreated from the state.
+        migrations.RunSQL(
+            sql=['DROP INDEX IF EXISTS project_code_uniq'],
+            reverse_sql=["CREATE UNIQUE INDEX project_code_uniq ON project_project (code) WHERE code <> ''"],
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=cogs3.indexes.PartialUniqueIndex(condition="code <> ''", fields=['code'], name='project_code_uniq'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 2.0.2 on 2026-10-18 19:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0024_project_code_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['created_time', 'id'], name='project_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projectusermembership',
+            index=models.Index(fields=['created_time', 'id'], name='membership_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projectusermembership',
+            index=models.Index(fields=['modified_time', 'id'], name='membership_modified_id_idx'),
+        ),
+    ]
@@ -1,7 +1,13 @@
+import collections
 import datetime
 
 from django.conf import settings
 from django.db import models
+from django.db import transaction
+from django.utils import timezone
+
+from cogs3.indexes import PartialUniqueIndex
+from cogs3.models import FieldTrackerMixin
 
 from institution.models import Institution
 from system.models import System
@@ -41,7 +47,48 @@ class ProjectFundingSource(models.Model):
         ordering = ('name', )
 
 
-class Project(models.Model):
+class ProjectQuerySet(models.QuerySet):
+
+    def set_status(self, status):
+        """
+        Set the status of every project in the queryset, allocating codes and running the
+        approval side effects in bulk for the projects moving into Project.APPROVED. Returns the
+        number of projects updated.
+
+        Args:
+            status (int): New Project status.
+        """
+        from project.approval import projects_approved
+        from project.codes import reserve_codes
+
+        with transaction.atomic():
+            projects = self.exclude(status=status).select_for_update(of=('self', ))
+            tech_leads = {}
+            uncoded = []
+            for pk, tech_lead_id, code in projects.values_list('pk', 'tech_lead_id', 'code'):
+                tech_leads[pk] = tech_lead_id
+                if not code:
+                    uncoded.append(pk)
+            fields = {
+                'status': status,
+                'modified_time': timezone.now(),
+            }
+            if status == Project.APPROVED and uncoded:
+                # Allocate codes to the projects without one, from a single reserved range.
+                fields['code'] = models.Case(
+                    *[
+                        models.When(pk=pk, then=models.Value(code))
+                        for pk, code in zip(uncoded, reserve_codes(len(uncoded)))
+                    ],
+                    default=models.F('code'),
+                )
+            Project.objects.filter(pk__in=tech_leads).update(**fields)
+            if status == Project.APPROVED:
+                projects_approved(tech_leads.items())
+        return len(tech_leads)
+
+
+class Project(FieldTrackerMixin, models.Model):
     title = models.CharField(
         max_length=256,
         verbose_name='Project Title',
@@ -64,7 +111,9 @@ class Project(models.Model):
     )
     code = models.CharField(
         max_length=20,
+        blank=True,
         verbose_name='Project code assigned by SCW',
+        help_text='Allocated when the project is approved, if left blank.',
     )
     institution = models.ForeignKey(
         Institution,
@@ -152,9 +201,60 @@ class Project(models.Model):
         help_text='The reason will be emailed to the project\'s technical lead upon project status update.',
     )
     notes = models.TextField(max_length=512, blank=True, help_text='Internal project notes')
+    # Number of memberships in each status, maintained by project.counters.
+    awaiting_member_count = models.PositiveIntegerField(default=0, editable=False)
+    authorised_member_count = models.PositiveIntegerField(default=0, editable=False)
+    declined_member_count = models.PositiveIntegerField(default=0, editable=False)
+    revoked_member_count = models.PositiveIntegerField(default=0, editable=False)
+    suspended_member_count = models.PositiveIntegerField(default=0, editable=False)
     created_time = models.DateTimeField(auto_now_add=True)
     modified_time = models.DateTimeField(auto_now=True)
 
+    objects = ProjectQuerySet.as_manager()
+
+    # Status transitions trigger side effects, see project.signals, and codes entered by hand
+    # advance the code sequence, see project.codes.
+    tracked_fields = ('status', 'code')
+
+    def save(self, *args, **kwargs):
+        allocate_code = self.status == Project.APPROVED and not self.code
+        update_fields = kwargs.get('update_fields')
+        # Codes entered by hand are never allocated again.
+        advance_codes = bool(self.code) and self.has_changed('code') and \
+            (update_fields is None or 'code' in update_fields)
+        full_update = not self._state.adding and not kwargs.get('force_insert')
+        reload_counts = full_update and update_fields is None
+        if not (allocate_code or advance_codes or reload_counts):
+            super().save(*args, **kwargs)
+            return
+        try:
+            with transaction.atomic():
+                if allocate_code:
+                    # Approved projects are allocated the next code, in the same UPDATE as the
+                    # approval. The reservation is rolled back with a failed save.
+                    from project.codes import reserve_codes
+
+                    self.code = reserve_codes(1)[0]
+                    if update_fields is not None:
+                        kwargs['update_fields'] = set(update_fields) | {'code'}
+                if advance_codes:
+                    from project.codes import advance_sequence
+
+                    advance_sequence([self.code])
+                if reload_counts:
+                    # The member counts are maintained by project.counters with their own
+                    # UPDATEs. Reload them with the row locked, so the save writes back the
+                    # current counts.
+                    member_count_fields = list(ProjectUserMembership.MEMBER_COUNT_FIELDS.values())
+                    counts = Project.objects.select_for_update().filter(pk=self.pk).values(*member_count_fields).first()
+                    for field, count in (counts or {}).items():
+                        setattr(self, field, count)
+                super().save(*args, **kwargs)
+        except Exception:
+            if allocate_code:
+                self.code = ''
+            raise
+
     def awaiting_approval(self):
         return True if self.status == Project.AWAITING_APPROVAL else False
 
@@ -167,6 +267,48 @@ class Project(models.Model):
 
     class Meta:
         verbose_name_plural = 'Projects'
+        indexes = [
+            models.Index(fields=['tech_lead', 'status'], name='project_tech_lead_status_idx'),
+            models.Index(fields=['end_date'], name='project_end_date_idx'),
+            # Keyset pagination order, see project.pagination.
+            models.Index(fields=['created_time', 'id'], name='project_created_id_idx'),
+            # Codes are only assigned once a project is approved, so blank codes are excluded.
+            PartialUniqueIndex(fields=['code'], name='project_code_uniq', condition="code <> ''"),
+        ]
+
+
+class ProjectCodeSequence(models.Model):
+    """
+    Next number to allocate in each project code prefix, see project.codes.
+    """
+    prefix = models.CharField(
+        max_length=10,
+        primary_key=True,
+    )
+    next_value = models.PositiveIntegerField(default=1)
+
+    def __str__(self):
+        return '{prefix} from {next_value}'.format(prefix=self.prefix, next_value=self.next_value)
+
+    class Meta:
+        verbose_name_plural = 'Project Code Sequences'
+
+
+class ProjectLifecycleCheckpoint(models.Model):
+    """
+    The date up to which project end dates and membership leaving dates have been acted on,
+    see project.lifecycle.
+    """
+    name = models.CharField(
+        max_length=64,
+        unique=True,
+    )
+    swept_date = models.DateField(help_text='Dates before this date have been acted on')
+    created_time = models.DateTimeField(auto_now_add=True)
+    modified_time = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
 
 
 class ProjectSystemAllocation(models.Model):
@@ -196,7 +338,35 @@ class ProjectSystemAllocation(models.Model):
         verbose_name_plural = 'Project System Allocations'
 
 
-class ProjectUserMembershipManager(models.Manager):
+class ProjectUserMembershipQuerySet(models.QuerySet):
+
+    def set_status(self, status):
+        """
+        Set the status of every membership in the queryset, keeping the project member counts
+        exact. Returns the number of memberships updated.
+
+        Args:
+            status (int): New ProjectUserMembership status.
+        """
+        from project.counters import update_member_counts
+
+        with transaction.atomic():
+            memberships = self.exclude(status=status).select_for_update(of=('self', ))
+            pks = []
+            changes = collections.Counter()
+            for pk, project_id, previous in memberships.values_list('pk', 'project_id', 'status'):
+                pks.append(pk)
+                changes[project_id, previous] -= 1
+                changes[project_id, status] += 1
+            ProjectUserMembership.objects.filter(pk__in=pks).update(
+                status=status,
+                modified_time=timezone.now(),
+            )
+            update_member_counts(changes)
+        return len(pks)
+
+
+class ProjectUserMembershipManager(models.Manager.from_queryset(ProjectUserMembershipQuerySet)):
 
     def awaiting_authorisation(self, user):
         projects = Project.objects.filter(tech_lead=user)
@@ -207,7 +377,7 @@ class ProjectUserMembershipManager(models.Manager):
         return project_user_memberships
 
 
-class ProjectUserMembership(models.Model):
+class ProjectUserMembership(FieldTrackerMixin, models.Model):
     project = models.ForeignKey(
         Project,
         on_delete=models.CASCADE,
@@ -228,6 +398,22 @@ class ProjectUserMembership(models.Model):
         (REVOKED, 'Revoked'),
         (SUSPENDED, 'Suspended'),
     )
+    # Project field counting the memberships in each status.
+    MEMBER_COUNT_FIELDS = {
+        AWAITING_AUTHORISATION: 'awaiting_member_count',
+        AUTHORISED: 'authorised_member_count',
+        DECLINED: 'declined_member_count',
+        REVOKED: 'revoked_member_count',
+        SUSPENDED: 'suspended_member_count',
+    }
+    # Statuses a membership can be moved to from each status by its project's technical lead.
+    STATUS_TRANSITIONS = {
+        AWAITING_AUTHORISATION: (AUTHORISED, DECLINED),
+        AUTHORISED: (REVOKED, SUSPENDED),
+        DECLINED: (AUTHORISED, ),
+        REVOKED: (),
+        SUSPENDED: (AUTHORISED, REVOKED),
+    }
     status = models.PositiveSmallIntegerField(
         choices=STATUS_CHOICES,
         default=AWAITING_AUTHORISATION,
@@ -239,6 +425,32 @@ class ProjectUserMembership(models.Model):
 
     objects = ProjectUserMembershipManager()
 
+    # Fields the project member counts depend on, see project.counters.
+    tracked_fields = ('project_id', 'status')
+
+    def save(self, *args, **kwargs):
+        from project import counters
+
+        # Save the membership and update the project member counts together.
+        update_fields = kwargs.get('update_fields')
+        with transaction.atomic():
+            if update_fields is None or counters.COUNTED_FIELDS & set(update_fields):
+                self._stored_counted_as = counters.stored_counted_as(self)
+            try:
+                super().save(*args, **kwargs)
+            finally:
+                self.__dict__.pop('_stored_counted_as', None)
+
+    def delete(self, *args, **kwargs):
+        from project import counters
+
+        with transaction.atomic():
+            self._stored_counted_as = counters.stored_counted_as(self)
+            try:
+                return super().delete(*args, **kwargs)
+            finally:
+                del self._stored_counted_as
+
     def awaiting_authorisation(self):
         return True if self.status == ProjectUserMembership.AWAITING_AUTHORISATION else False
 
@@ -265,3 +477,10 @@ class ProjectUserMembership(models.Model):
     class Meta:
         verbose_name_plural = 'Project User Memberships'
         unique_together = ('project', 'user')
+        indexes = [
+            models.Index(fields=['project', 'status'], name='membership_project_status_idx'),
+            models.Index(fields=['date_left'], name='membership_date_left_idx'),
+            # Keyset pagination orders, see project.pagination.
+            models.Index(fields=['created_time', 'id'], name='membership_created_id_idx'),
+            models.Index(fields=['modified_time', 'id'], name='membership_modified_id_idx'),
+        ]
@@ -0,0 +1,138 @@
+import base64
+import binascii
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import Http404
+from django.utils.dateparse import parse_datetime
+
+
+class CursorPage(object):
+    """
+    A page of results, with the cursors of the pages either side of it.
+    """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class CursorPaginator(object):
+    """
+    Page through a queryset by the position of each row in a (datetime field, id) ordering.
+
+    Each page is fetched with a filter on the last row of the page before it, rather than an
+    OFFSET, so the cost of a page does not grow with its depth, and no COUNT(*) is run.
+    """
+    cursor_paginated = True
+
+    def __init__(self, queryset, per_page, ordering):
+        """
+        Args:
+            queryset (QuerySet): Rows to page through.
+            per_page (int): Rows per page.
+            ordering (str): Datetime field to order by, prefixed with '-' for descending order.
+        """
+        self.descending = ordering.startswith('-')
+        self.field = ordering.lstrip('-')
+        self.per_page = per_page
+        self.queryset = queryset.order_by(ordering, ''.join(['-' if self.descending else '', 'id']))
+
+    def encode_cursor(self, obj):
+        value = '|'.join([getattr(obj, self.field).isoformat(), str(obj.pk)])
+        return base64.urlsafe_b64encode(value.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            value, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+            value = parse_datetime(value)
+            pk = int(pk)
+        except (binascii.Error, UnicodeError, ValueError):
+            value = None
+        if value is None:
+            raise Http404('Invalid cursor.')
+        return value, pk
+
+    def _after(self, cursor, forwards):
+        """
+        Filter for the rows after a cursor, in the paginator's ordering if forwards is True and
+        in the reverse ordering otherwise.
+        """
+        value, pk = self.decode_cursor(cursor)
+        lookup = 'lt' if self.descending == forwards else 'gt'
+        return Q(**{'__'.join([self.field, lookup]): value}) | \
+            Q(**{self.field: value, '__'.join(['id', lookup]): pk})
+
+    def page(self, after=None, before=None):
+        """
+        Return the page following the cursor after, or preceding the cursor before, or the
+        first page.
+
+        Args:
+            after (str): Cursor of the last row of the previous page.
+            before (str): Cursor of the first row of the next page.
+        """
+        if before:
+            queryset = self.queryset.reverse().filter(self._after(before, forwards=False))
+            rows = list(queryset[:self.per_page + 1])
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            has_next = True
+        else:
+            queryset = self.queryset
+            if after:
+                queryset = queryset.filter(self._after(after, forwards=True))
+            rows = list(queryset[:self.per_page + 1])
+            has_next = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_previous = bool(after)
+        if not rows:
+            return CursorPage([])
+        return CursorPage(
+            rows,
+            next_cursor=self.encode_cursor(rows[-1]) if has_next else None,
+            previous_cursor=self.encode_cursor(rows[0]) if has_previous else None,
+        )
+
+
+class CursorPaginationMixin(object):
+    """
+    ListView mixin adding CursorPaginator as an alternative to page number pagination.
+
+    Pages are numbered, with the 'page' query parameter, unless the request has an 'after' or
+    'before' query parameter, or PROJECT_CURSOR_PAGINATION is set and the request has no 'page'
+    query parameter. includes/pagination.html renders the links of either kind of page.
+    """
+    cursor_ordering = '-created_time'
+
+    def is_cursor_paginated(self):
+        params = self.request.GET
+        if 'after' in params or 'before' in params:
+            return True
+        return settings.PROJECT_CURSOR_PAGINATION and 'page' not in params
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.is_cursor_paginated():
+            return super().paginate_queryset(queryset, page_size)
+        paginator = CursorPaginator(queryset, page_size, self.cursor_ordering)
+        page = paginator.page(
+            after=self.request.GET.get('after'),
+            before=self.request.GET.get('before'),
+        )
+        return (paginator, page, page.object_list, page.has_other_pages())
@@ -1,10 +1,12 @@
-import datetime
 import logging
 
-from django.contrib.auth.models import Group
+from django.db import transaction
+from django.db.models.signals import post_delete
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
+from project import counters
+from project.approval import projects_approved
 from project.models import Project
 from project.models import ProjectUserMembership
 
@@ -12,24 +14,30 @@ logger = logging.getLogger('apps')
 
 
 @receiver(post_save, sender=Project)
-def update_project(sender, instance, created, **kwargs):
-    if not created:
-        try:
-            project = instance
-            if (project.status == Project.APPROVED):
-                # Update or create a ProjectUserMembership instance for the project's technical lead.
-                ProjectUserMembership.objects.update_or_create(
-                    project=project,
-                    user=project.tech_lead,
-                    defaults={
-                        'date_joined': datetime.date.today(),
-                        'status': ProjectUserMembership.AUTHORISED,
-                    },
-                )
-
-                # Assign the 'project_owner' group to the project's technical lead.
-                group = Group.objects.get(name='project_owner')
-                project.tech_lead.groups.add(group)
-        except Exception:
-            logger.exception(
-                'Failed to update or create a ProjectUserMembership instance for the project\'s technical lead.')
+def update_project(sender, instance, created, update_fields=None, **kwargs):
+    project = instance
+    # Only a save moving the project into APPROVED has side effects.
+    if created or project.status != Project.APPROVED or not project.has_changed('status'):
+        return
+    if update_fields is not None and 'status' not in update_fields:
+        return
+    try:
+        with transaction.atomic():
+            # Authorise the project's technical lead as a member and assign them the
+            # 'project_owner' group.
+            projects_approved([(project.pk, project.tech_lead_id)])
+    except Exception:
+        logger.exception(
+            'Failed to update or create a ProjectUserMembership instance for the project\'s technical lead.')
+
+
+@receiver(post_save, sender=ProjectUserMembership)
+def count_project_user_membership(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and not counters.COUNTED_FIELDS & set(update_fields):
+        return
+    counters.membership_counted(instance, created)
+
+
+@receiver(post_delete, sender=ProjectUserMembership)
+def uncount_project_user_membership(sender, instance, **kwargs):
+    counters.membership_uncounted(instance)
@@ -0,0 +1,117 @@
+import datetime
+import uuid
+
+from django.contrib.auth.models import Group
+from django.test import TestCase
+
+from project.models import Project
+from project.models import ProjectUserMembership
+from project.tests.test_models import ProjectModelTests
+from project.tests.test_models import ProjectTests
+from users import groups
+from users.tests.test_models import CustomUserTests
+
+
+class ProjectApprovalTests(ProjectModelTests, TestCase):
+
+    def setUp(self):
+        super(ProjectApprovalTests, self).setUp()
+        groups.clear_group_ids()
+        self.project = self.create_project(self.project_applicant)
+
+    def create_project(self, tech_lead):
+        return ProjectTests.create_project(
+            title='Project title',
+            code=uuid.uuid4().hex,
+            institution=self.institution,
+            tech_lead=tech_lead,
+            category=self.category,
+            funding_source=self.funding_source,
+        )
+
+    def assertApproved(self, project):
+        membership = ProjectUserMembership.objects.get(project=project, user=project.tech_lead)
+        self.assertTrue(membership.authorised())
+        self.assertEqual(membership.date_joined, datetime.date.today())
+        self.assertTrue(project.tech_lead.groups.filter(name='project_owner').exists())
+        project = Project.objects.get(pk=project.pk)
+        self.assertEqual(project.authorised_member_count, 1)
+        self.assertEqual(project.awaiting_member_count, 0)
+
+    def test_approval(self):
+        """
+        Ensure moving a project into APPROVED authorises its technical lead.
+        """
+        self.project.status = Project.APPROVED
+        self.project.save()
+        self.assertApproved(self.project)
+
+    def test_approval_of_a_loaded_project(self):
+        project = Project.objects.get(pk=self.project.pk)
+        project.status = Project.APPROVED
+        project.save()
+        self.assertApproved(project)
+
+    def test_approval_authorises_an_existing_membership(self):
+        ProjectUserMembership.objects.create(
+            project=self.project,
+            user=self.project_applicant,
+            date_joined=datetime.date.today() - datetime.timedelta(days=7),
+        )
+        self.project.status = Project.APPROVED
+        self.project.save()
+        self.assertApproved(self.project)
+
+    def test_saves_without_a_transition_have_no_side_effects(self):
+        """
+        Ensure saving an approved project, without changing its status, only saves the project.
+        """
+        self.project.status = Project.APPROVED
+        self.project.save()
+        project = Project.objects.get(pk=self.project.pk)
+        project.notes = 'Updated notes'
+        # The member counts are reloaded with the row locked, in a savepoint.
+        with self.assertNumQueries(4):
+            project.save()
+        with self.assertNumQueries(1):
+            project.save(update_fields=['notes'])
+
+    def test_set_status(self):
+        """
+        Ensure approving projects in bulk takes a fixed number of queries, whatever the number of
+        projects approved.
+        """
+        projects = [self.create_project(self.project_applicant) for _ in range(2)]
+        groups.get_group_id('project_owner')
+        with self.assertNumQueries(11):
+            count = Project.objects.filter(pk__in=[p.pk for p in projects]).set_status(Project.APPROVED)
+        self.assertEqual(count, 2)
+
+        for i in range(10):
+            user = CustomUserTests.create_custom_user(email='lead.{}@{}'.format(i, self.institution.base_domain))
+            projects.append(self.create_project(user))
+        ProjectUserMembership.objects.create(
+            project=projects[-1],
+            user=projects[-1].tech_lead,
+            date_joined=datetime.date.today(),
+        )
+        with self.assertNumQueries(17):
+            count = Project.objects.filter(pk__in=[p.pk for p in projects]).set_status(Project.APPROVED)
+        self.assertEqual(count, 10)
+        for project in projects:
+            self.assertApproved(project)
+
+        # Approved projects are not approved again.
+        self.assertEqual(Project.objects.filter(pk__in=[p.pk for p in projects]).set_status(Project.APPROVED), 0)
+
+    def test_group_id_is_cached(self):
+        group = Group.objects.get(name='project_owner')
+        self.assertEqual(groups.get_group_id('project_owner'), group.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(groups.get_group_id('project_owner'), group.pk)
+
+        # Renaming a group clears the cache.
+        group.name = 'owner'
+        group.save()
+        with self.assertRaises(Group.DoesNotExist):
+            groups.get_group_id('project_owner')
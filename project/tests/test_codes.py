@@ -0,0 +1,100 @@
+import uuid
+
+import mock
+
+from django.db import IntegrityError
+from django.test import TestCase
+
+from project import codes
+from project.models import Project
+from project.models import ProjectCodeSequence
+from project.tests.test_models import ProjectModelTests
+from project.tests.test_models import ProjectTests
+
+
+class ProjectCodeTests(ProjectModelTests, TestCase):
+
+    def create_project(self, code=''):
+        return ProjectTests.create_project(
+            title='Project title',
+            code=code,
+            institution=self.institution,
+            tech_lead=self.project_owner,
+            category=self.category,
+            funding_source=self.funding_source,
+        )
+
+    def test_reserve_codes(self):
+        self.assertEqual(codes.reserve_codes(1), ['scw0001'])
+        self.assertEqual(codes.reserve_codes(3), ['scw0002', 'scw0003', 'scw0004'])
+        self.assertEqual(codes.reserve_codes(0), [])
+        self.assertEqual(ProjectCodeSequence.objects.get(prefix='scw').next_value, 5)
+
+    def test_reserve_codes_with_a_new_prefix(self):
+        self.assertEqual(codes.reserve_codes(2, prefix='abc'), ['abc0001', 'abc0002'])
+        self.assertEqual(codes.reserve_codes(1), ['scw0001'])
+
+    def test_reserving_a_range_of_codes(self):
+        """
+        Ensure a range of codes is reserved with as many queries as a single code.
+        """
+        with self.assertNumQueries(4):
+            codes.reserve_codes(1)
+        with self.assertNumQueries(4):
+            reserved = codes.reserve_codes(1000)
+        self.assertEqual(len(set(reserved)), 1000)
+        self.assertEqual(reserved[-1], 'scw1001')
+
+    def test_advance_sequence(self):
+        codes.advance_sequence(['scw0041', 'scw0007', 'scw-00099', 'other0500', ''])
+        self.assertEqual(codes.reserve_codes(1), ['scw0042'])
+        # The sequence never moves backwards.
+        codes.advance_sequence(['scw0010'])
+        self.assertEqual(codes.reserve_codes(1), ['scw0043'])
+
+    def test_code_is_allocated_on_approval(self):
+        project = self.create_project()
+        self.assertEqual(project.code, '')
+        project.status = Project.APPROVED
+        project.save()
+        self.assertEqual(Project.objects.get(pk=project.pk).code, 'scw0001')
+
+        # Projects approved with a code keep it.
+        project = self.create_project(code='SCW-12345')
+        project.status = Project.APPROVED
+        project.save(update_fields=['status'])
+        self.assertEqual(Project.objects.get(pk=project.pk).code, 'SCW-12345')
+
+    def test_failed_approval_releases_its_code(self):
+        """
+        Ensure the code reserved by an approval that fails to save is allocated again.
+        """
+        project = self.create_project()
+        project.status = Project.APPROVED
+        with mock.patch.object(Project, 'save_base', side_effect=IntegrityError):
+            with self.assertRaises(IntegrityError):
+                project.save()
+        self.assertEqual(project.code, '')
+        project.save()
+        self.assertEqual(Project.objects.get(pk=project.pk).code, 'scw0001')
+
+    def test_codes_entered_by_hand_are_not_allocated(self):
+        """
+        Ensure codes entered by hand, in the allocated format, are skipped by later approvals.
+        """
+        self.create_project(code='scw0002')
+        project = self.create_project()
+        project.code = 'scw0003'
+        project.save()
+        approved = self.create_project()
+        approved.status = Project.APPROVED
+        approved.save()
+        self.assertEqual(approved.code, 'scw0004')
+
+    def test_codes_are_allocated_on_bulk_approval(self):
+        projects = [self.create_project() for _ in range(5)]
+        projects.append(self.create_project(code=uuid.uuid4().hex[:20]))
+        Project.objects.filter(pk__in=[p.pk for p in projects]).set_status(Project.APPROVED)
+        allocated = Project.objects.filter(pk__in=[p.pk for p in projects[:5]]).values_list('code', flat=True)
+        self.assertEqual(sorted(allocated), ['scw0001', 'scw0002', 'scw0003', 'scw0004', 'scw0005'])
+        self.assertEqual(Project.objects.get(pk=projects[-1].pk).code, projects[-1].code)
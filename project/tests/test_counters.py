@@ -0,0 +1,166 @@
+import datetime
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils.six import StringIO
+
+from project.counters import recount_member_counts
+from project.models import Project
+from project.models import ProjectUserMembership
+from project.tests.test_models import ProjectModelTests
+from project.tests.test_models import ProjectTests
+from users.tests.test_models import CustomUserTests
+
+
+class ProjectMemberCountTests(ProjectModelTests, TestCase):
+
+    def setUp(self):
+        super(ProjectMemberCountTests, self).setUp()
+        self.project = ProjectTests.create_project(
+            title='Project title',
+            code='SCW-12345',
+            institution=self.institution,
+            tech_lead=self.project_owner,
+            category=self.category,
+            funding_source=self.funding_source,
+        )
+
+    def create_memberships(self, count):
+        memberships = []
+        for i in range(count):
+            user = CustomUserTests.create_custom_user(email='member.{}@{}'.format(i, self.institution.base_domain))
+            memberships.append(
+                ProjectUserMembership.objects.create(
+                    project=self.project,
+                    user=user,
+                    date_joined=datetime.date.today(),
+                ))
+        return memberships
+
+    def assertCounts(self, project=None, **counts):
+        project = Project.objects.get(pk=(project or self.project).pk)
+        for field in ProjectUserMembership.MEMBER_COUNT_FIELDS.values():
+            self.assertEqual(getattr(project, field), counts.get(field, 0), field)
+
+    def test_create_and_delete(self):
+        memberships = self.create_memberships(3)
+        self.assertCounts(awaiting_member_count=3)
+        memberships[0].delete()
+        self.assertCounts(awaiting_member_count=2)
+
+    def test_status_change(self):
+        membership = self.create_memberships(2)[0]
+        membership.status = ProjectUserMembership.AUTHORISED
+        membership.save()
+        self.assertCounts(awaiting_member_count=1, authorised_member_count=1)
+
+        # Saving again without a change is not counted twice.
+        membership.save()
+        membership = ProjectUserMembership.objects.get(pk=membership.pk)
+        membership.status = ProjectUserMembership.REVOKED
+        membership.save()
+        self.assertCounts(awaiting_member_count=1, revoked_member_count=1)
+        membership.delete()
+        self.assertCounts(awaiting_member_count=1)
+
+    def test_stale_instances(self):
+        """
+        Ensure saving or deleting a membership loaded before another save of it changed the
+        membership is counted from the stored membership.
+        """
+        membership = self.create_memberships(1)[0]
+        stale = ProjectUserMembership.objects.get(pk=membership.pk)
+        membership.status = ProjectUserMembership.AUTHORISED
+        membership.save()
+        stale.status = ProjectUserMembership.DECLINED
+        stale.save()
+        self.assertCounts(declined_member_count=1)
+
+        membership.delete()
+        stale.delete()
+        self.assertCounts()
+
+    def test_update_fields(self):
+        """
+        Ensure a membership moved to another project with update_fields is counted.
+        """
+        membership = self.create_memberships(1)[0]
+        other = ProjectTests.create_project(
+            title='Other project title',
+            code='SCW-67890',
+            institution=self.institution,
+            tech_lead=self.project_owner,
+            category=self.category,
+            funding_source=self.funding_source,
+        )
+        membership.project_id = other.pk
+        membership.save(update_fields=['project_id'])
+        self.assertCounts()
+        self.assertCounts(other, awaiting_member_count=1)
+
+    def test_project_save_keeps_counts(self):
+        """
+        Ensure saving a project loaded before its memberships changed keeps the current counts.
+        """
+        project = Project.objects.get(pk=self.project.pk)
+        self.create_memberships(2)
+        project.notes = 'Updated notes'
+        project.save()
+        self.assertCounts(awaiting_member_count=2)
+
+    def test_project_approval(self):
+        """
+        Ensure the technical lead's membership, created on approval, is counted.
+        """
+        self.project.status = Project.APPROVED
+        self.project.save()
+        self.assertCounts(authorised_member_count=1)
+
+    def test_set_status(self):
+        memberships = self.create_memberships(4)
+        memberships[0].status = ProjectUserMembership.AUTHORISED
+        memberships[0].save()
+        with self.assertNumQueries(5):
+            updated = ProjectUserMembership.objects.filter(project=self.project).set_status(
+                ProjectUserMembership.AUTHORISED)
+        self.assertEqual(updated, 3)
+        self.assertCounts(authorised_member_count=4)
+
+    def test_membership_not_loaded_from_database(self):
+        """
+        Ensure memberships saved without having been loaded are recounted.
+        """
+        membership = self.create_memberships(1)[0]
+        ProjectUserMembership(
+            id=membership.id,
+            project=self.project,
+            user=membership.user,
+            status=ProjectUserMembership.SUSPENDED,
+            date_joined=membership.date_joined,
+            created_time=membership.created_time,
+        ).save()
+        self.assertCounts(suspended_member_count=1)
+
+    def test_recount(self):
+        self.create_memberships(3)
+        other_project = ProjectTests.create_project(
+            title='Project title',
+            code='SCW-54321',
+            institution=self.institution,
+            tech_lead=self.project_owner,
+            category=self.category,
+            funding_source=self.funding_source,
+        )
+        Project.objects.update(awaiting_member_count=7, declined_member_count=1)
+        self.assertEqual(recount_member_counts(), 2)
+        self.assertCounts(awaiting_member_count=3)
+        self.assertCounts(project=other_project)
+        self.assertEqual(recount_member_counts(), 0)
+
+    def test_recount_command(self):
+        self.create_memberships(2)
+        Project.objects.update(awaiting_member_count=0)
+        out = StringIO()
+        call_command('recount_project_members', stdout=out)
+        self.assertIn('Repaired the member counts of 1 projects.', out.getvalue())
+        self.assertCounts(awaiting_member_count=2)
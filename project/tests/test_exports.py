@@ -0,0 +1,107 @@
+import csv
+import io
+
+import openpyxl
+
+from django.contrib.admin import helpers
+from django.test import TestCase
+from django.urls import reverse
+
+from project import exports
+from project.models import Project
+from project.models import ProjectUserMembership
+from project.tests.test_views import ProjectViewTests
+
+
+class ExportTests(ProjectViewTests, TestCase):
+
+    def setUp(self):
+        super(ExportTests, self).setUp()
+        self.project_owner.is_staff = True
+        self.project_owner.is_superuser = True
+        self.project_owner.save()
+        self.projects = self.create_projects(3, self.project_owner)
+        self.create_membership_requests(self.projects[0], 2)
+
+    def read_csv(self, response):
+        return list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+    def test_rows(self):
+        rows = list(exports.PROJECTS.rows(Project.objects.all(), ['code', 'status', 'tech_lead']))
+        self.assertEqual(rows[0], ['Code', 'Status', 'Technical Lead'])
+        self.assertEqual(rows[1:], [[project.code, 'Approved', self.project_owner.email] for project in self.projects])
+
+    def test_unknown_columns(self):
+        with self.assertRaises(ValueError):
+            exports.PROJECTS.select(['code', 'password'])
+
+    def test_csv_export_view(self):
+        url = reverse('admin:project_projectusermembership_export')
+        response = self.get_as(url + '?status__exact=1&columns=user,status', self.project_owner_email)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="projectusermembership.csv"')
+        rows = self.read_csv(response)
+        self.assertEqual(rows[0], ['User', 'Status'])
+        self.assertEqual(len(rows), 3)
+        self.assertEqual({row[1] for row in rows[1:]}, {'Awaiting Authorisation'})
+
+    def test_xlsx_export_view(self):
+        url = reverse('admin:project_project_export')
+        response = self.get_as(
+            url + '?format=xlsx&institution__id__exact={}'.format(self.institution.pk),
+            self.project_owner_email,
+        )
+        self.assertEqual(response.status_code, 200)
+        workbook = openpyxl.load_workbook(io.BytesIO(b''.join(response.streaming_content)))
+        rows = list(workbook.active.values)
+        self.assertEqual(rows[0], tuple(column.header for column in exports.PROJECTS.columns.values()))
+        self.assertEqual([row[0] for row in rows[1:]], [project.code for project in self.projects])
+
+    def test_export_view_ignores_changelist_parameters(self):
+        """
+        Ensure exports can be made from a searched, sorted or paginated changelist.
+        """
+        url = reverse('admin:project_project_export')
+        query = '?q=&o=-2.1&p=1&institution__id__exact={}&columns=code'.format(self.institution.pk)
+        response = self.get_as(url + query, self.project_owner_email)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.read_csv(response)), 4)
+
+    def test_formulas_are_escaped(self):
+        """
+        Ensure text that a spreadsheet would evaluate as a formula is exported as text.
+        """
+        Project.objects.filter(pk=self.projects[0].pk).update(title='=HYPERLINK("http://example.com")')
+        Project.objects.filter(pk=self.projects[1].pk).update(title='-2+3')
+        rows = list(exports.PROJECTS.rows(Project.objects.all(), ['title', 'allocation_cputime']))
+        self.assertEqual(rows[1][0], '\'=HYPERLINK("http://example.com")')
+        self.assertEqual(rows[2][0], "'-2+3")
+        self.assertEqual(rows[3][0], self.projects[2].title)
+
+    def test_export_view_rejects_unknown_filters_and_columns(self):
+        url = reverse('admin:project_project_export')
+        for query in ['?tech_lead__password=x', '?columns=password', '?format=pdf']:
+            response = self.get_as(url + query, self.project_owner_email)
+            self.assertEqual(response.status_code, 400)
+
+    def test_export_view_requires_staff(self):
+        response = self.get_as(reverse('admin:project_project_export'), self.project_applicant_email)
+        self.assertEqual(response.status_code, 302)
+
+    def test_export_action(self):
+        headers = {
+            'Shib-Identity-Provider': self.institution.identity_provider,
+            'REMOTE_USER': self.project_owner_email,
+        }
+        memberships = ProjectUserMembership.objects.filter(status=ProjectUserMembership.AUTHORISED)
+        response = self.client.post(
+            reverse('admin:project_projectusermembership_changelist'),
+            {
+                'action': 'export_csv',
+                helpers.ACTION_CHECKBOX_NAME: [membership.pk for membership in memberships],
+            },
+            **headers,
+        )
+        self.assertEqual(response.status_code, 200)
+        rows = self.read_csv(response)
+        self.assertEqual(len(rows), 1 + memberships.count())
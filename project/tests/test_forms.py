@@ -55,7 +55,7 @@ class ProjectFormTests(TestCase):
 
         # Create a project.
         self.title = 'Project title'
-        self.code = 'scw-00001',
+        self.code = 'scw-00001'
         self.project = ProjectTests.create_project(
             title=self.title,
             code=self.code,
@@ -0,0 +1,190 @@
+import csv
+import os
+import shutil
+import tempfile
+
+import openpyxl
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils.six import StringIO
+
+from project import legacy
+from project.counters import recount_member_counts
+from project.models import Project
+from project.models import ProjectUserMembership
+from project.tests.test_models import ProjectModelTests
+from users import groups
+from users.tests.test_models import CustomUserTests
+
+
+class LegacyProjectImportTests(ProjectModelTests, TestCase):
+
+    def setUp(self):
+        super(LegacyProjectImportTests, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.member = CustomUserTests.create_custom_user(email='member@' + self.institution.base_domain)
+
+    def row(self, i, **values):
+        row = {
+            'legacy_hpcw_id': 'HPCW-{}'.format(i),
+            'legacy_arcca_id': '',
+            'code': '',
+            'title': 'Legacy project {}'.format(i),
+            'description': 'Legacy project description',
+            'institution': self.institution.base_domain,
+            'institution_reference': 'BW-12345',
+            'department': 'School of Chemistry',
+            'pi': 'Project Principal Investigator',
+            'tech_lead': self.project_owner.email,
+            'category': self.category.name,
+            'funding_source': self.funding_source.name,
+            'start_date': '2015-01-01',
+            'end_date': '2019-01-01',
+            'economic_user': 'False',
+            'requirements_software': 'None',
+            'requirements_gateways': 'None',
+            'requirements_training': 'None',
+            'requirements_onboarding': 'None',
+            'allocation_rse': 'True',
+            'allocation_cputime': '1000000',
+            'allocation_memory': '100',
+            'allocation_storage_home': '5000',
+            'allocation_storage_scartch': '1000',
+            'status': 'Approved',
+            'members': self.member.email,
+        }
+        row.update(values)
+        return row
+
+    def write_csv(self, rows):
+        path = os.path.join(self.directory, 'projects.csv')
+        with open(path, 'w', newline='') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        return path
+
+    def assertMemberCountsExact(self):
+        self.assertEqual(recount_member_counts(), 0)
+
+    def test_import(self):
+        rows = [self.row(i) for i in range(3)]
+        rows.append(self.row(3, legacy_hpcw_id='', legacy_arcca_id='ARCCA-3', code='scw0100', status='Awaiting Approval'))
+        result = legacy.import_projects(legacy.read_rows(self.write_csv(rows)))
+        self.assertEqual(result.errors, {})
+        self.assertEqual((result.rows, result.created, result.updated, result.memberships), (4, 4, 0, 4))
+
+        projects = Project.objects.filter(status=Project.APPROVED).order_by('legacy_hpcw_id')
+        self.assertEqual([p.code for p in projects], ['scw0101', 'scw0102', 'scw0103'])
+        project = projects[0]
+        self.assertEqual(project.title, 'Legacy project 0')
+        self.assertEqual(project.category, self.category)
+        self.assertTrue(project.allocation_rse)
+        self.assertEqual(project.allocation_cputime, 1000000)
+        # The technical leads of approved projects are authorised, as on approval.
+        self.assertEqual(
+            set(project.projectusermembership_set.values_list('user', 'status')),
+            {(self.project_owner.pk, ProjectUserMembership.AUTHORISED), (self.member.pk, ProjectUserMembership.AUTHORISED)},
+        )
+        self.assertEqual(Project.objects.get(legacy_arcca_id='ARCCA-3').code, 'scw0100')
+        self.assertMemberCountsExact()
+
+    def test_reimport_updates_projects(self):
+        path = self.write_csv([self.row(0, status='Awaiting Approval', members='')])
+        legacy.import_projects(legacy.read_rows(path))
+        project = Project.objects.get()
+        self.assertEqual(project.code, '')
+
+        path = self.write_csv([self.row(0, title='Renamed'), self.row(1)])
+        result = legacy.import_projects(legacy.read_rows(path))
+        self.assertEqual((result.created, result.updated), (1, 1))
+        project = Project.objects.get(pk=project.pk)
+        self.assertEqual(project.title, 'Renamed')
+        self.assertEqual(project.status, Project.APPROVED)
+        self.assertEqual(project.code, 'scw0001')
+        self.assertEqual(project.authorised_member_count, 2)
+        self.assertEqual(Project.objects.count(), 2)
+        self.assertMemberCountsExact()
+
+    def test_invalid_rows_are_skipped(self):
+        rows = [
+            self.row(0, institution='Unknown University'),
+            self.row(1, legacy_hpcw_id=''),
+            self.row(2, allocation_memory='lots'),
+            self.row(3, members='nobody@example.com'),
+            self.row(4),
+        ]
+        result = legacy.import_projects(legacy.read_rows(self.write_csv(rows)))
+        self.assertEqual(sorted(result.errors), [2, 3, 4, 5])
+        self.assertEqual(result.errors[2], 'Unknown institution: Unknown University')
+        self.assertEqual(Project.objects.get().legacy_hpcw_id, 'HPCW-4')
+
+    def test_duplicate_codes_are_skipped(self):
+        rows = [self.row(0, code='scw0001'), self.row(1, code='scw0001')]
+        legacy.import_projects(legacy.read_rows(self.write_csv(rows[:1])))
+        result = legacy.import_projects(legacy.read_rows(self.write_csv(rows)))
+        self.assertEqual(result.errors, {3: 'Project code already in use: scw0001'})
+
+    def test_duplicate_codes_within_a_file_are_skipped(self):
+        """
+        Ensure rows repeating the code of an earlier row are reported, whether the earlier row is
+        in the same batch or not.
+        """
+        rows = [self.row(0, code='scw0001'), self.row(1, code='scw0001'), self.row(2, code='scw0001')]
+        for batch_size in [500, 1]:
+            Project.objects.all().delete()
+            result = legacy.import_projects(legacy.read_rows(self.write_csv(rows)), batch_size=batch_size)
+            self.assertEqual(result.errors, {
+                3: 'Project code already in use: scw0001',
+                4: 'Project code already in use: scw0001',
+            })
+            self.assertEqual(Project.objects.get().legacy_hpcw_id, 'HPCW-0')
+
+    def test_dry_run(self):
+        result = legacy.import_projects(legacy.read_rows(self.write_csv([self.row(0)])), dry_run=True)
+        self.assertEqual(result.created, 1)
+        self.assertFalse(Project.objects.exists())
+        self.assertFalse(ProjectUserMembership.objects.exists())
+
+    def test_batches_take_a_fixed_number_of_queries(self):
+        """
+        Ensure the number of queries per batch does not grow with the batch size.
+        """
+
+        def count_queries(rows):
+            with CaptureQueriesContext(connection) as queries:
+                legacy.import_projects(legacy.read_rows(self.write_csv(rows)))
+            return len(queries)
+
+        # Warm the group id cache, see users.groups.
+        groups.get_group_id('project_owner')
+        users = [
+            CustomUserTests.create_custom_user(email='lead.{}@{}'.format(i, self.institution.base_domain))
+            for i in range(25)
+        ]
+        few = count_queries([self.row(i, tech_lead=users[i].email) for i in range(2)])
+        many = count_queries([self.row(i, tech_lead=users[i].email) for i in range(2, 25)])
+        self.assertEqual(few, many)
+
+    def test_read_xlsx(self):
+        path = os.path.join(self.directory, 'projects.xlsx')
+        workbook = openpyxl.Workbook()
+        row = self.row(0, legacy_arcca_id='ARCCA-0', code='scw0001', allocation_cputime=1000000)
+        workbook.active.append(list(row))
+        workbook.active.append(list(row.values()))
+        workbook.save(path)
+        self.assertEqual(list(legacy.read_rows(path)), [row])
+
+    def test_command(self):
+        out = StringIO()
+        call_command('import_legacy_projects', self.write_csv([self.row(0), self.row(1)]), batch_size=1, stdout=out)
+        output = out.getvalue()
+        self.assertIn('Processed 1 rows: 1 created, 0 updated, 1 memberships, 0 errors.', output)
+        self.assertIn('Imported 2 projects (2 created, 0 updated), 0 rows failed.', output)
+        with self.assertRaises(CommandError):
+            call_command('import_legacy_projects', os.path.join(self.directory, 'projects.txt'), stdout=out)
@@ -0,0 +1,200 @@
+import datetime
+import uuid
+
+import mock
+
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils.six import StringIO
+
+from project import lifecycle
+from project.counters import recount_member_counts
+from project.models import Project
+from project.models import ProjectLifecycleCheckpoint
+from project.models import ProjectUserMembership
+from project.tests.test_models import ProjectModelTests
+from project.tests.test_models import ProjectTests
+from users.models import Profile
+from users.tests.test_models import CustomUserTests
+
+TODAY = datetime.date(2018, 6, 1)
+
+
+@mock.patch('project.lifecycle.openldap_jobs.enqueue_account_operation')
+class ProjectLifecycleTests(ProjectModelTests, TestCase):
+
+    def setUp(self):
+        super(ProjectLifecycleTests, self).setUp()
+        # TestCase transactions are never committed.
+        patcher = mock.patch('django.db.transaction.on_commit', side_effect=lambda func: func())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_project(self, end_date, status=Project.APPROVED):
+        project = ProjectTests.create_project(
+            title='Project ' + end_date.isoformat(),
+            code=uuid.uuid4().hex[:20],
+            institution=self.institution,
+            tech_lead=self.project_owner,
+            category=self.category,
+            funding_source=self.funding_source,
+        )
+        project.end_date = end_date
+        project.status = status
+        project.save()
+        return project
+
+    def create_member(self, project, date_left=datetime.date.max, account_status=Profile.APPROVED):
+        user = CustomUserTests.create_custom_user(email='{}@{}'.format(uuid.uuid4().hex, self.institution.base_domain))
+        user.profile.account_status = account_status
+        user.profile.save()
+        membership = ProjectUserMembership.objects.create(
+            project=project,
+            user=user,
+            date_joined=datetime.date(2018, 1, 1),
+            date_left=date_left,
+        )
+        membership.status = ProjectUserMembership.AUTHORISED
+        membership.save()
+        return membership
+
+    def refresh(self, instance):
+        return type(instance).objects.get(pk=instance.pk)
+
+    def test_expired_projects_are_closed(self, enqueue_account_operation):
+        ended = self.create_project(TODAY - datetime.timedelta(days=1))
+        ending = self.create_project(TODAY)
+        declined = self.create_project(TODAY - datetime.timedelta(days=1), status=Project.DECLINED)
+        member = self.create_member(ended)
+        active_member = self.create_member(ended)
+        # A member of a project that has not ended.
+        ProjectUserMembership.objects.create(
+            project=ending,
+            user=active_member.user,
+            date_joined=TODAY,
+            status=ProjectUserMembership.AUTHORISED,
+        )
+
+        result = lifecycle.run(today=TODAY, batch_size=1, close_inactive_accounts=True)
+        self.assertEqual((result.projects_closed, result.memberships_revoked), (1, 3))
+        self.assertEqual(self.refresh(ended).status, Project.CLOSED)
+        self.assertEqual(self.refresh(ending).status, Project.APPROVED)
+        self.assertEqual(self.refresh(declined).status, Project.DECLINED)
+        member = self.refresh(member)
+        self.assertEqual(member.status, ProjectUserMembership.REVOKED)
+        self.assertEqual(member.date_left, TODAY - datetime.timedelta(days=1))
+        self.assertEqual(recount_member_counts(), 0)
+
+        # The member left without a project has their account closed, the member of another
+        # project keeps theirs.
+        self.assertEqual(member.user.profile.account_status, Profile.CLOSED)
+        self.assertEqual(self.refresh(active_member.user.profile).account_status, Profile.APPROVED)
+        enqueue_account_operation.assert_called_once_with(member.user.email, 'delete')
+
+        recipients = sorted(message.to[0] for message in mail.outbox)
+        self.assertEqual(recipients, sorted([self.project_owner.email, member.user.email, active_member.user.email]))
+
+    def test_expired_memberships_are_revoked(self, enqueue_account_operation):
+        project = self.create_project(datetime.date.max)
+        left = self.create_member(project, date_left=TODAY - datetime.timedelta(days=3))
+        leaving = self.create_member(project, date_left=TODAY)
+        result = lifecycle.run(today=TODAY, close_inactive_accounts=True)
+        self.assertEqual((result.projects_closed, result.memberships_revoked), (0, 1))
+        self.assertEqual(self.refresh(left).status, ProjectUserMembership.REVOKED)
+        self.assertEqual(self.refresh(leaving).status, ProjectUserMembership.AUTHORISED)
+        self.assertEqual(self.refresh(left.user.profile).account_status, Profile.CLOSED)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(recount_member_counts(), 0)
+
+    def test_accounts_are_only_closed_on_request(self, enqueue_account_operation):
+        project = self.create_project(datetime.date.max)
+        left = self.create_member(project, date_left=TODAY - datetime.timedelta(days=3))
+        result = lifecycle.run(today=TODAY)
+        self.assertEqual((result.memberships_revoked, result.accounts_closed), (1, 0))
+        self.assertEqual(self.refresh(left.user.profile).account_status, Profile.APPROVED)
+        enqueue_account_operation.assert_not_called()
+
+    def test_accounts_still_in_use_are_not_closed(self, enqueue_account_operation):
+        """
+        Ensure users awaiting a membership, or leading a project that is not closed, keep their
+        accounts.
+        """
+        project = self.create_project(datetime.date.max)
+        awaiting = self.create_member(project, date_left=TODAY - datetime.timedelta(days=3))
+        ProjectUserMembership.objects.create(
+            project=self.create_project(datetime.date.max),
+            user=awaiting.user,
+            date_joined=TODAY,
+        )
+        tech_lead = self.create_member(project, date_left=TODAY - datetime.timedelta(days=3))
+        led = self.create_project(datetime.date.max, status=Project.AWAITING_APPROVAL)
+        Project.objects.filter(pk=led.pk).update(tech_lead=tech_lead.user)
+
+        result = lifecycle.run(today=TODAY, close_inactive_accounts=True)
+        self.assertEqual((result.memberships_revoked, result.accounts_closed), (2, 0))
+        self.assertEqual(self.refresh(awaiting.user.profile).account_status, Profile.APPROVED)
+        self.assertEqual(self.refresh(tech_lead.user.profile).account_status, Profile.APPROVED)
+        enqueue_account_operation.assert_not_called()
+
+        # Once the project they lead is closed, the technical lead's account is closed too.
+        Project.objects.filter(pk=led.pk).update(status=Project.CLOSED)
+        self.assertEqual(lifecycle.close_accounts([tech_lead.user.pk]), [tech_lead.user.email])
+
+    def test_runs_are_incremental(self, enqueue_account_operation):
+        lifecycle.run(today=TODAY)
+        self.assertEqual(ProjectLifecycleCheckpoint.objects.get().swept_date, TODAY)
+
+        # Dates before the last run are not considered again, unless the run is full.
+        before = self.create_project(TODAY - datetime.timedelta(days=1))
+        since = self.create_project(TODAY + datetime.timedelta(days=1))
+        result = lifecycle.run(today=TODAY + datetime.timedelta(days=7))
+        self.assertEqual(result.projects_closed, 1)
+        self.assertEqual(self.refresh(since).status, Project.CLOSED)
+        self.assertEqual(self.refresh(before).status, Project.APPROVED)
+
+        result = lifecycle.run(full=True, today=TODAY + datetime.timedelta(days=7))
+        self.assertEqual(result.projects_closed, 1)
+        self.assertEqual(self.refresh(before).status, Project.CLOSED)
+
+    def test_failed_run_keeps_the_side_effects_of_applied_batches(self, enqueue_account_operation):
+        """
+        Ensure the members of batches applied before a run failed are notified, and the
+        remaining batches are applied by the next run.
+        """
+        project = self.create_project(datetime.date.max)
+        first = self.create_member(project, date_left=TODAY - datetime.timedelta(days=2))
+        second = self.create_member(project, date_left=TODAY - datetime.timedelta(days=1))
+        revoke_memberships = lifecycle.revoke_memberships
+
+        def fail_second_batch(*args):
+            if fail_second_batch.calls:
+                raise RuntimeError('Failed')
+            fail_second_batch.calls += 1
+            return revoke_memberships(*args)
+
+        fail_second_batch.calls = 0
+        with mock.patch('project.lifecycle.revoke_memberships', side_effect=fail_second_batch):
+            with self.assertRaises(RuntimeError):
+                lifecycle.run(today=TODAY, batch_size=1, close_inactive_accounts=True)
+        self.assertFalse(ProjectLifecycleCheckpoint.objects.exists())
+        self.assertEqual([message.to[0] for message in mail.outbox], [first.user.email])
+        enqueue_account_operation.assert_called_once_with(first.user.email, 'delete')
+
+        result = lifecycle.run(today=TODAY, batch_size=1, close_inactive_accounts=True)
+        self.assertEqual((result.memberships_revoked, result.accounts_closed), (1, 1))
+        self.assertEqual([message.to[0] for message in mail.outbox], [first.user.email, second.user.email])
+        enqueue_account_operation.assert_called_with(second.user.email, 'delete')
+
+    def test_command(self, enqueue_account_operation):
+        self.create_project(datetime.date.today() - datetime.timedelta(days=1))
+        out = StringIO()
+        call_command('sweep_project_lifecycle', stdout=out)
+        self.assertIn('1 projects closed, 1 memberships revoked, 0 accounts closed', out.getvalue())
+
+        self.create_member(
+            self.create_project(datetime.date.max),
+            date_left=datetime.date.today() - datetime.timedelta(days=1),
+        )
+        call_command('sweep_project_lifecycle', full=True, close_accounts=True, stdout=out)
+        self.assertIn('0 projects closed, 1 memberships revoked, 1 accounts closed', out.getvalue())
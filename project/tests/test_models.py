@@ -1,6 +1,8 @@
 import datetime
 
 from django.contrib.auth.models import Group
+from django.db import IntegrityError
+from django.db import transaction
 from django.test import TestCase
 
 from institution.tests.test_models import InstitutionTests
@@ -182,6 +184,30 @@ class ProjectTests(ProjectModelTests, TestCase):
         self.assertEqual(project.code, code)
         self.assertTrue(project.awaiting_approval())
 
+    def test_project_code_is_unique(self):
+        """
+        Ensure assigned project codes are unique, while any number of projects await a code.
+        """
+        for code in ['', '', 'SCW-12345']:
+            self.create_project(
+                title='Project title',
+                code=code,
+                institution=self.institution,
+                tech_lead=self.project_owner,
+                category=self.category,
+                funding_source=self.funding_source,
+            )
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                self.create_project(
+                    title='Project title',
+                    code='SCW-12345',
+                    institution=self.institution,
+                    tech_lead=self.project_owner,
+                    category=self.category,
+                    funding_source=self.funding_source,
+                )
+
 
 class ProjectSystemAllocationTests(ProjectModelTests, TestCase):
 
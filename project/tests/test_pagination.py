@@ -0,0 +1,109 @@
+import datetime
+
+from django.http import Http404
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from project.models import Project
+from project.pagination import CursorPaginator
+from project.tests.test_views import ProjectViewTests
+
+
+class CursorPaginatorTests(ProjectViewTests, TestCase):
+
+    def setUp(self):
+        super(CursorPaginatorTests, self).setUp()
+        self.projects = self.create_projects(7, self.project_owner)
+        # Share timestamps between projects, so pages split rows with equal sort keys.
+        now = timezone.now()
+        for i, project in enumerate(self.projects):
+            Project.objects.filter(id=project.id).update(created_time=now - datetime.timedelta(days=i // 2))
+        self.paginator = CursorPaginator(Project.objects.all(), 3, '-created_time')
+        self.expected = list(Project.objects.order_by('-created_time', '-id'))
+
+    def test_forwards(self):
+        """
+        Ensure following next cursors visits every row once, in order.
+        """
+        rows = []
+        page = self.paginator.page()
+        self.assertFalse(page.has_previous())
+        while True:
+            rows.extend(page)
+            if not page.has_next():
+                break
+            page = self.paginator.page(after=page.next_cursor)
+            self.assertTrue(page.has_previous())
+        self.assertEqual(rows, self.expected)
+
+    def test_backwards(self):
+        """
+        Ensure following previous cursors from the last page returns to the first page.
+        """
+        page = self.paginator.page()
+        pages = [list(page)]
+        while page.has_next():
+            page = self.paginator.page(after=page.next_cursor)
+            pages.append(list(page))
+        while page.has_previous():
+            page = self.paginator.page(before=page.previous_cursor)
+            self.assertTrue(page.has_next())
+            self.assertEqual(list(page), pages[-2])
+            pages.pop()
+        self.assertEqual(len(pages), 1)
+
+    def test_ascending(self):
+        paginator = CursorPaginator(Project.objects.all(), 4, 'created_time')
+        first = paginator.page()
+        second = paginator.page(after=first.next_cursor)
+        self.assertEqual(list(first) + list(second), self.expected[::-1])
+
+    def test_invalid_cursor(self):
+        for cursor in ['invalid', 'aW52YWxpZA==', 'MjAxOC0wMS0wMXx4']:
+            with self.assertRaises(Http404):
+                self.paginator.page(after=cursor)
+
+    def test_view(self):
+        """
+        Ensure the project list view is cursor paginated when a cursor is given.
+        """
+        path = reverse('project-application-list')
+        response = self.get_as(path + '?after=', self.project_owner_email)
+        page = response.context_data['page_obj']
+        self.assertEqual(list(response.context_data['projects']), self.expected)
+        self.assertFalse(page.has_next())
+
+        older = [project.id for project in self.create_projects(5, self.project_owner)]
+        Project.objects.filter(id__in=older).update(created_time=timezone.now() - datetime.timedelta(days=30))
+        response = self.get_as(path + '?after=', self.project_owner_email)
+        page = response.context_data['page_obj']
+        self.assertEqual(len(page), 10)
+        self.assertContains(response, '?after=' + page.next_cursor)
+        response = self.get_as(path + '?after=' + page.next_cursor, self.project_owner_email)
+        self.assertEqual(len(response.context_data['page_obj']), 2)
+        self.assertContains(response, '?before=')
+
+    def test_view_page_numbers(self):
+        """
+        Ensure the project list view is paginated by page number by default.
+        """
+        self.create_projects(5, self.project_owner)
+        path = reverse('project-application-list')
+        response = self.get_as(path, self.project_owner_email)
+        self.assertEqual(response.context_data['page_obj'].number, 1)
+        self.assertContains(response, '?page=2')
+        response = self.get_as(path + '?page=2', self.project_owner_email)
+        self.assertEqual(len(response.context_data['page_obj']), 2)
+
+    def test_view_cursor_pagination_setting(self):
+        """
+        Ensure PROJECT_CURSOR_PAGINATION makes cursor pagination the default, without removing
+        page numbers.
+        """
+        path = reverse('project-application-list')
+        with self.settings(PROJECT_CURSOR_PAGINATION=True):
+            response = self.get_as(path, self.project_owner_email)
+            self.assertIsInstance(response.context_data['paginator'], CursorPaginator)
+            response = self.get_as(path + '?page=1', self.project_owner_email)
+            self.assertEqual(response.context_data['page_obj'].number, 1)
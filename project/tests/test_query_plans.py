@@ -0,0 +1,110 @@
+import datetime
+import unittest
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from project.forms import ProjectAdminForm
+from project.forms import ProjectUserMembershipCreationForm
+from project.models import Project
+from project.models import ProjectUserMembership
+from project.tests.test_models import ProjectTests
+from project.tests.test_views import ProjectViewTests
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Query plans are only checked on PostgreSQL.')
+class ProjectQueryPlanTests(ProjectViewTests, TestCase):
+    """
+    Ensure the project and membership lookups made by each view are served by an index.
+
+    Sequential scans are disabled for the test transaction, so the planner only falls back to
+    one when no index can serve the query.
+    """
+    tables = (
+        'project_project',
+        'project_projectusermembership',
+    )
+
+    def setUp(self):
+        super(ProjectQueryPlanTests, self).setUp()
+        self.project = ProjectTests.create_project(
+            title='Project title',
+            code='SCW-12345',
+            institution=self.institution,
+            tech_lead=self.project_owner,
+            category=self.category,
+            funding_source=self.funding_source,
+        )
+        self.project.status = Project.APPROVED
+        self.project.save()
+        ProjectUserMembership.objects.create(
+            project=self.project,
+            user=self.project_applicant,
+            date_joined=datetime.date.today(),
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def sequential_scans(self, sql):
+        """
+        Return the tables sequentially scanned by a query.
+
+        Args:
+            sql (str): Query to explain.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql)
+            plan = cursor.fetchone()[0][0]['Plan']
+        scans = []
+        nodes = [plan]
+        while nodes:
+            node = nodes.pop()
+            if node['Node Type'] == 'Seq Scan' and node['Relation Name'] in self.tables:
+                scans.append(node['Relation Name'])
+            nodes.extend(node.get('Plans', []))
+        return scans
+
+    def assertIndexed(self, func):
+        """
+        Ensure no project or membership query made by func sequentially scans its table.
+        """
+        with CaptureQueriesContext(connection) as context:
+            func()
+        for query in context.captured_queries:
+            sql = query['sql']
+            if sql.startswith('SELECT') and any(table in sql for table in self.tables):
+                self.assertEqual(self.sequential_scans(sql), [], sql)
+
+    def get(self, path, email):
+        headers = {
+            'Shib-Identity-Provider': self.institution.identity_provider,
+            'REMOTE_USER': email,
+        }
+        return self.client.get(path, **headers)
+
+    def test_project_list_view(self):
+        self.assertIndexed(lambda: self.get(reverse('project-application-list'), self.project_owner_email))
+
+    def test_project_user_request_membership_list_view(self):
+        self.assertIndexed(
+            lambda: self.get(reverse('project-user-membership-request-list'), self.project_owner_email))
+
+    def test_project_user_membership_list_view(self):
+        self.assertIndexed(lambda: self.get(reverse('project-membership-list'), self.project_applicant_email))
+
+    def test_project_user_membership_creation_form(self):
+        form = ProjectUserMembershipCreationForm(
+            initial={'user': self.project_owner},
+            data={'project_code': 'SCW-12345'},
+        )
+        self.assertIndexed(form.is_valid)
+
+    def test_project_admin_form_code(self):
+        form = ProjectAdminForm(instance=self.project)
+        form.cleaned_data = {'code': 'SCW-54321'}
+        self.assertIndexed(form.clean_code)
+
+    def test_awaiting_authorisation(self):
+        self.assertIndexed(lambda: list(ProjectUserMembership.objects.awaiting_authorisation(self.project_owner)))
@@ -1,3 +1,4 @@
+import datetime
 import random
 import string
 import uuid
@@ -6,9 +7,13 @@ from django.contrib.auth.models import Group
 from django.test import TestCase
 from django.urls import reverse
 
+from cogs3.testing import QueryBudgetMixin
+from cogs3.testing import SnapshotCacheMixin
 from institution.tests.test_models import InstitutionTests
 from project.forms import ProjectCreationForm
 from project.forms import ProjectUserMembershipCreationForm
+from project.models import Project
+from project.models import ProjectUserMembership
 from project.tests.test_models import ProjectCategoryTests
 from project.tests.test_models import ProjectFundingSourceTests
 from project.tests.test_models import ProjectTests
@@ -74,8 +79,55 @@ class ProjectViewTests(TestCase):
         self.assertEqual(response.status_code, 302)
         self.assertEqual(response.url, reverse('register'))
 
+    def get_as(self, path, email):
+        headers = {
+            'Shib-Identity-Provider': self.institution.identity_provider,
+            'REMOTE_USER': email,
+        }
+        return self.client.get(path, **headers)
 
-class ProjectCreateViewTests(ProjectViewTests, TestCase):
+    def create_projects(self, count, tech_lead):
+        """
+        Create approved projects.
+
+        Args:
+            count (int): Number of projects.
+            tech_lead (settings.AUTH_USER_MODEL): Project technical lead user.
+        """
+        projects = []
+        for _ in range(count):
+            project = ProjectTests.create_project(
+                title='Project Title',
+                code='scw-' + uuid.uuid4().hex[:16],
+                institution=self.institution,
+                tech_lead=tech_lead,
+                category=self.category,
+                funding_source=self.funding_source,
+            )
+            project.status = Project.APPROVED
+            project.save()
+            projects.append(project)
+        return projects
+
+    def create_membership_requests(self, project, count):
+        """
+        Create membership requests from new users.
+
+        Args:
+            project (Project): Project the users request to join.
+            count (int): Number of requests.
+        """
+        for _ in range(count):
+            user = CustomUserTests.create_custom_user(
+                email='@'.join([uuid.uuid4().hex, self.institution.base_domain]))
+            ProjectUserMembership.objects.create(
+                project=project,
+                user=user,
+                date_joined=datetime.date.today(),
+            )
+
+
+class ProjectCreateViewTests(QueryBudgetMixin, ProjectViewTests, TestCase):
 
     def test_view_as_an_authorised_user(self):
         """
@@ -110,8 +162,14 @@ class ProjectCreateViewTests(ProjectViewTests, TestCase):
         """
         self.access_view_as_unauthorisied_user(reverse('create-project'))
 
+    def test_view_query_budget(self):
+        """
+        Ensure the project create view runs a fixed number of queries.
+        """
+        self.assertQueryBudget(3, lambda: self.get_as(reverse('create-project'), self.project_owner_email))
 
-class ProjectListViewTests(ProjectViewTests, TestCase):
+
+class ProjectListViewTests(QueryBudgetMixin, ProjectViewTests, TestCase):
 
     def test_view_as_an_authorised_user(self):
         """
@@ -145,8 +203,29 @@ class ProjectListViewTests(ProjectViewTests, TestCase):
         """
         self.access_view_as_unauthorisied_user(reverse('project-application-list'))
 
+    def test_view_query_budget(self):
+        """
+        Ensure the project list view runs a fixed number of queries, however many projects are
+        listed.
+        """
+        self.assertQueryBudget(
+            3,
+            lambda: self.get_as(reverse('project-application-list'), self.project_owner_email),
+            lambda count: self.create_projects(count, self.project_owner),
+        )
+
+    def test_view_query_budget_with_cursor(self):
+        """
+        Ensure a cursor paginated project list runs no count query.
+        """
+        self.assertQueryBudget(
+            2,
+            lambda: self.get_as(reverse('project-application-list') + '?after=', self.project_owner_email),
+            lambda count: self.create_projects(count, self.project_owner),
+        )
+
 
-class ProjectDetailViewTests(ProjectViewTests, TestCase):
+class ProjectDetailViewTests(QueryBudgetMixin, ProjectViewTests, TestCase):
 
     def test_view_as_an_authorised_user(self):
         """
@@ -190,6 +269,16 @@ class ProjectDetailViewTests(ProjectViewTests, TestCase):
         """
         self.access_view_as_unauthorisied_user(reverse('project-application-detail', args=[1]))
 
+    def test_view_query_budget(self):
+        """
+        Ensure the project detail view runs a fixed number of queries.
+        """
+        project = self.create_projects(1, self.project_owner)[0]
+        self.assertQueryBudget(
+            3,
+            lambda: self.get_as(reverse('project-application-detail', args=[project.id]), self.project_owner_email),
+        )
+
     def test_view_as_unauthorised_project_member(self):
         """
         Ensure only the project's technical lead user can view the details of the project.
@@ -217,7 +306,7 @@ class ProjectDetailViewTests(ProjectViewTests, TestCase):
         self.assertEqual(response.url, reverse('project-application-list'))
 
 
-class ProjectUserMembershipFormViewTests(ProjectViewTests, TestCase):
+class ProjectUserMembershipFormViewTests(QueryBudgetMixin, ProjectViewTests, TestCase):
 
     def test_view_as_an_authorised_user(self):
         """
@@ -252,8 +341,17 @@ class ProjectUserMembershipFormViewTests(ProjectViewTests, TestCase):
         """
         self.access_view_as_unauthorisied_user(reverse('project-membership-create'))
 
+    def test_view_query_budget(self):
+        """
+        Ensure the project user membership form runs a fixed number of queries.
+        """
+        self.assertQueryBudget(
+            1,
+            lambda: self.get_as(reverse('project-membership-create'), self.project_applicant_email),
+        )
+
 
-class ProjectUserRequestMembershipListViewTests(ProjectViewTests, TestCase):
+class ProjectUserRequestMembershipListViewTests(QueryBudgetMixin, ProjectViewTests, TestCase):
 
     def test_view_as_an_authorised_user(self):
         """
@@ -288,8 +386,31 @@ class ProjectUserRequestMembershipListViewTests(ProjectViewTests, TestCase):
         """
         self.access_view_as_unauthorisied_user(reverse('project-user-membership-request-list'))
 
+    def test_view_query_budget(self):
+        """
+        Ensure the project user request membership list view runs a fixed number of queries,
+        however many requests are listed.
+        """
+        project = self.create_projects(1, self.project_owner)[0]
+        self.assertQueryBudget(
+            3,
+            lambda: self.get_as(reverse('project-user-membership-request-list'), self.project_owner_email),
+            lambda count: self.create_membership_requests(project, count),
+        )
+
+    def test_view_query_budget_with_cursor(self):
+        """
+        Ensure a cursor paginated membership request list runs no count query.
+        """
+        project = self.create_projects(1, self.project_owner)[0]
+        self.assertQueryBudget(
+            2,
+            lambda: self.get_as(reverse('project-user-membership-request-list') + '?after=', self.project_owner_email),
+            lambda count: self.create_membership_requests(project, count),
+        )
+
 
-class ProjectUserMembershipListViewTests(ProjectViewTests, TestCase):
+class ProjectUserMembershipListViewTests(QueryBudgetMixin, ProjectViewTests, TestCase):
 
     def test_view_as_an_authorised_user(self):
         """
@@ -322,3 +443,230 @@ class ProjectUserMembershipListViewTests(ProjectViewTests, TestCase):
         Ensure unauthorised users can not access the project user membership list view.
         """
         self.access_view_as_unauthorisied_user(reverse('project-membership-list'))
+
+    def test_view_query_budget(self):
+        """
+        Ensure the project user membership list view runs a fixed number of queries, however many
+        memberships are listed.
+        """
+
+        def create_memberships(count):
+            for project in self.create_projects(count, self.project_owner):
+                ProjectUserMembership.objects.create(
+                    project=project,
+                    user=self.project_applicant,
+                    date_joined=datetime.date.today(),
+                )
+
+        self.assertQueryBudget(
+            3,
+            lambda: self.get_as(reverse('project-membership-list'), self.project_applicant_email),
+            create_memberships,
+        )
+        self.assertQueryBudget(
+            2,
+            lambda: self.get_as(reverse('project-membership-list') + '?after=', self.project_applicant_email),
+        )
+
+
+class ProjectUserRequestMembershipUpdateViewTests(QueryBudgetMixin, ProjectViewTests, TestCase):
+
+    def setUp(self):
+        super(ProjectUserRequestMembershipUpdateViewTests, self).setUp()
+        self.project = self.create_projects(1, self.project_owner)[0]
+        self.create_membership_requests(self.project, 1)
+        self.membership = ProjectUserMembership.objects.get(
+            project=self.project,
+            status=ProjectUserMembership.AWAITING_AUTHORISATION,
+        )
+
+    def post_as(self, email, status):
+        headers = {
+            'Shib-Identity-Provider': self.institution.identity_provider,
+            'REMOTE_USER': email,
+            'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest',
+        }
+        return self.client.post(
+            reverse('project-user-membership-request-update', args=[self.membership.pk]),
+            {
+                'project_id': self.project.pk,
+                'request_id': self.membership.pk,
+                'status': status,
+            },
+            **headers,
+        )
+
+    def test_view_as_an_authorised_user(self):
+        """
+        Ensure a technical lead can update the status of a membership request.
+        """
+        response = self.post_as(self.project_owner_email, ProjectUserMembership.AUTHORISED)
+        self.assertEqual(response.status_code, 200)
+        self.membership.refresh_from_db()
+        self.assertEqual(self.membership.status, ProjectUserMembership.AUTHORISED)
+
+    def test_view_with_another_users_project(self):
+        """
+        Ensure a membership request can only be updated by its project's technical lead.
+        """
+        other_tech_lead = CustomUserTests.create_custom_user(
+            email='@'.join(['other_project_owner', self.institution.base_domain]),
+            group=Group.objects.get(name='project_owner'),
+        )
+        response = self.post_as(other_tech_lead.email, ProjectUserMembership.AUTHORISED)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.url, reverse('project-user-membership-request-list'))
+        self.membership.refresh_from_db()
+        self.assertEqual(self.membership.status, ProjectUserMembership.AWAITING_AUTHORISATION)
+
+    def test_view_query_budget(self):
+        """
+        Ensure the project user request membership update view runs a fixed number of queries,
+        however many requests the project has.
+        """
+        self.assertQueryBudget(
+            7,
+            lambda: self.post_as(self.project_owner_email, ProjectUserMembership.AUTHORISED),
+            lambda count: self.create_membership_requests(self.project, count),
+        )
+
+
+class ProjectUserRequestMembershipBulkUpdateViewTests(SnapshotCacheMixin, ProjectViewTests, TestCase):
+
+    def setUp(self):
+        super(ProjectUserRequestMembershipBulkUpdateViewTests, self).setUp()
+        self.project = self.create_projects(1, self.project_owner)[0]
+
+    def post_as(self, email, data):
+        headers = {
+            'Shib-Identity-Provider': self.institution.identity_provider,
+            'REMOTE_USER': email,
+            'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest',
+        }
+        return self.client.post(reverse('project-user-membership-request-bulk-update'), data, **headers)
+
+    def requests(self):
+        return ProjectUserMembership.objects.filter(project=self.project).exclude(user=self.project_owner)
+
+    def test_view_as_an_authorised_user(self):
+        """
+        Ensure a technical lead can authorise many membership requests at once.
+        """
+        self.create_membership_requests(self.project, 20)
+        response = self.post_as(
+            self.project_owner_email,
+            {
+                'memberships': list(self.requests().values_list('id', flat=True)),
+                'status': ProjectUserMembership.AUTHORISED,
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['updated'], 20)
+        self.assertEqual(self.requests().filter(status=ProjectUserMembership.AUTHORISED).count(), 20)
+
+    def test_view_query_count_is_independent_of_batch_size(self):
+        """
+        Ensure a batch is checked and updated in a fixed number of queries.
+        """
+        self.create_membership_requests(self.project, 20)
+        ids = list(self.requests().values_list('id', flat=True))
+        self.post_as(self.project_owner_email, {'memberships': ids[:1], 'status': ProjectUserMembership.DECLINED})
+        for batch in [ids[1:2], ids[2:]]:
+            with self.assertNumQueries(8):
+                response = self.post_as(
+                    self.project_owner_email,
+                    {
+                        'memberships': batch,
+                        'status': ProjectUserMembership.AUTHORISED,
+                    },
+                )
+            self.assertEqual(response.json()['updated'], len(batch))
+
+    def test_view_with_a_disallowed_transition(self):
+        """
+        Ensure no membership is updated if the new status can not be reached from the status of
+        any membership in the batch.
+        """
+        self.create_membership_requests(self.project, 3)
+        ids = sorted(self.requests().values_list('id', flat=True))
+        ProjectUserMembership.objects.filter(pk=ids[0]).set_status(ProjectUserMembership.REVOKED)
+        response = self.post_as(
+            self.project_owner_email,
+            {
+                'memberships': ids,
+                'status': ProjectUserMembership.SUSPENDED,
+            },
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json()['memberships'],
+            ['The status of memberships {} can not be changed to Suspended.'.format(', '.join(map(str, ids)))],
+        )
+        response = self.post_as(
+            self.project_owner_email,
+            {
+                'memberships': ids,
+                'status': ProjectUserMembership.AUTHORISED,
+            },
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.requests().filter(status=ProjectUserMembership.AUTHORISED).count(), 0)
+
+        response = self.post_as(
+            self.project_owner_email,
+            {
+                'memberships': ids[1:],
+                'status': ProjectUserMembership.AUTHORISED,
+            },
+        )
+        self.assertEqual(response.json()['updated'], 2)
+
+    def test_view_with_another_users_membership_request(self):
+        """
+        Ensure no membership is updated if the batch includes a request to another user's project.
+        """
+        self.create_membership_requests(self.project, 2)
+        other_project = self.create_projects(1, self.project_applicant)[0]
+        self.create_membership_requests(other_project, 1)
+        ids = list(ProjectUserMembership.objects.exclude(user__in=[self.project_owner, self.project_applicant])
+                   .values_list('id', flat=True))
+        response = self.post_as(
+            self.project_owner_email,
+            {
+                'memberships': ids,
+                'status': ProjectUserMembership.AUTHORISED,
+            },
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('memberships', response.json())
+        self.assertFalse(ProjectUserMembership.objects.filter(id__in=ids, status=ProjectUserMembership.AUTHORISED))
+
+    def test_view_with_an_invalid_status(self):
+        """
+        Ensure memberships can not be returned to awaiting authorisation.
+        """
+        self.create_membership_requests(self.project, 1)
+        response = self.post_as(
+            self.project_owner_email,
+            {
+                'memberships': list(self.requests().values_list('id', flat=True)),
+                'status': ProjectUserMembership.AWAITING_AUTHORISATION,
+            },
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('status', response.json())
+
+    def test_view_without_permission(self):
+        """
+        Ensure users without permission to change memberships are redirected.
+        """
+        self.create_membership_requests(self.project, 1)
+        response = self.post_as(
+            self.project_applicant_email,
+            {
+                'memberships': list(self.requests().values_list('id', flat=True)),
+                'status': ProjectUserMembership.AUTHORISED,
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(self.requests().filter(status=ProjectUserMembership.AUTHORISED).exists())
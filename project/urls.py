@@ -33,6 +33,11 @@ urlpatterns = [
         views.ProjectUserRequestMembershipListView.as_view(),
         name='project-user-membership-request-list',
     ),
+    path(
+        'memberships/user-requests/update/',
+        views.ProjectUserRequestMembershipBulkUpdateView.as_view(),
+        name='project-user-membership-request-bulk-update',
+    ),
     path(
         'memberships/user-requests/update/<int:pk>/',
         views.ProjectUserRequestMembershipUpdateView.as_view(),
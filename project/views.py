@@ -3,6 +3,7 @@ import datetime
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.mixins import PermissionRequiredMixin
 from django.contrib.messages.views import SuccessMessageMixin
+from django.contrib import messages
 from django.db.models import Q
 from django.http import HttpResponseRedirect
 from django.http import JsonResponse
@@ -12,9 +13,11 @@ from django.views import generic
 from django.views.generic.edit import FormView
 
 from .forms import ProjectCreationForm
+from .forms import ProjectUserMembershipBulkUpdateForm
 from .forms import ProjectUserMembershipCreationForm
 from .models import Project
 from .models import ProjectUserMembership
+from .pagination import CursorPaginationMixin
 
 
 class ProjectCreateView(SuccessMessageMixin, LoginRequiredMixin, generic.CreateView):
@@ -28,7 +31,7 @@ class ProjectCreateView(SuccessMessageMixin, LoginRequiredMixin, generic.CreateV
         return super().form_valid(form)
 
 
-class ProjectListView(LoginRequiredMixin, generic.ListView):
+class ProjectListView(CursorPaginationMixin, LoginRequiredMixin, generic.ListView):
     context_object_name = 'projects'
     template_name = 'project/applications.html'
     model = Project
@@ -38,6 +41,7 @@ class ProjectListView(LoginRequiredMixin, generic.ListView):
         user = self.request.user
         queryset = super().get_queryset()
         queryset = queryset.filter(Q(tech_lead=user))
+        queryset = queryset.select_related('institution')
         return queryset.order_by('-created_time')
 
 
@@ -46,6 +50,9 @@ class ProjectDetailView(LoginRequiredMixin, generic.DetailView):
     template_name = 'project/application_detail.html'
     model = Project
 
+    def get_queryset(self):
+        return super().get_queryset().select_related('institution', 'funding_source')
+
     def user_passes_test(self, request):
         if Project.objects.filter(id=self.kwargs['pk'], tech_lead=self.request.user).exists():
             return True
@@ -83,7 +90,8 @@ class ProjectUserMembershipFormView(SuccessMessageMixin, LoginRequiredMixin, For
         return super().form_valid(form)
 
 
-class ProjectUserRequestMembershipListView(PermissionRequiredMixin, LoginRequiredMixin, generic.ListView):
+class ProjectUserRequestMembershipListView(CursorPaginationMixin, PermissionRequiredMixin, LoginRequiredMixin,
+                                           generic.ListView):
     permission_required = 'project.change_projectusermembership'
     context_object_name = 'project_user_membership_requests'
     template_name = 'project/membership/requests.html'
@@ -99,8 +107,14 @@ class ProjectUserRequestMembershipListView(PermissionRequiredMixin, LoginRequire
         queryset = queryset.filter(project__in=projects)
         # Omit the user's membership request
         queryset = queryset.exclude(user=self.request.user)
+        queryset = queryset.select_related('project', 'user')
         return queryset.order_by('-created_time')
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['bulk_update_form'] = ProjectUserMembershipBulkUpdateForm(user=self.request.user)
+        return context
+
 
 class ProjectUserRequestMembershipUpdateView(PermissionRequiredMixin, LoginRequiredMixin, generic.UpdateView):
     permission_required = 'project.change_projectusermembership'
@@ -115,9 +129,11 @@ class ProjectUserRequestMembershipUpdateView(PermissionRequiredMixin, LoginRequi
             project_id = request.POST.get('project_id')
             request_id = request.POST.get('request_id')
             user = self.request.user
-            project = Project.objects.get(id=project_id, tech_lead=user)
-            ProjectUserMembership.objects.get(id=request_id, project=project)
-            return True
+            return ProjectUserMembership.objects.filter(
+                id=request_id,
+                project_id=project_id,
+                project__tech_lead=user,
+            ).exists()
         except Exception:
             return False
 
@@ -142,14 +158,45 @@ class ProjectUserRequestMembershipUpdateView(PermissionRequiredMixin, LoginRequi
             return response
 
 
-class ProjectUserMembershipListView(LoginRequiredMixin, generic.ListView):
+class ProjectUserRequestMembershipBulkUpdateView(PermissionRequiredMixin, LoginRequiredMixin, FormView):
+    """
+    Update the status of many project user membership requests in one transaction.
+    """
+    permission_required = 'project.change_projectusermembership'
+    success_url = reverse_lazy('project-user-membership-request-list')
+    form_class = ProjectUserMembershipBulkUpdateForm
+    http_method_names = ['post']
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['user'] = self.request.user
+        return kwargs
+
+    def form_valid(self, form):
+        updated = form.save()
+        message = 'Successfully updated {} membership requests.'.format(updated)
+        if self.request.is_ajax():
+            return JsonResponse({'message': message, 'updated': updated})
+        messages.success(self.request, message)
+        return super().form_valid(form)
+
+    def form_invalid(self, form):
+        if self.request.is_ajax():
+            return JsonResponse(form.errors, status=400)
+        messages.error(self.request, 'Failed to update the selected membership requests.')
+        return HttpResponseRedirect(self.get_success_url())
+
+
+class ProjectUserMembershipListView(CursorPaginationMixin, LoginRequiredMixin, generic.ListView):
     context_object_name = 'project_memberships'
     template_name = 'project/memberships.html'
     model = ProjectUserMembership
     paginate_by = 10
+    cursor_ordering = '-modified_time'
 
     def get_queryset(self):
         queryset = super().get_queryset()
         queryset = queryset.filter(user=self.request.user)
         queryset = queryset.filter(project__status=Project.APPROVED)
+        queryset = queryset.select_related('project__institution', 'project__tech_lead')
         return queryset.order_by('-modified_time')
@@ -29,4 +29,43 @@ $(document).ready(function() {
 			}
 		});
 	});
+
+	// Handle bulk user membership request updates
+	function updateBulkMembershipButton() {
+		var selected = $(".select-membership:checked").length;
+		var status = $("#bulk-membership-status").val();
+		$("#bulk-membership-update").prop("disabled", !(selected && status));
+	}
+
+	$("#select-all-memberships").change(function() {
+		$(".select-membership").prop("checked", $(this).prop("checked"));
+		updateBulkMembershipButton();
+	});
+
+	$(".select-membership, #bulk-membership-status").change(updateBulkMembershipButton);
+
+	$("#bulk-membership-update").click(function() {
+		var memberships = $(".select-membership:checked").map(function() {
+			return $(this).val();
+		}).get();
+		var data = {
+			"memberships": memberships,
+			"status": $("#bulk-membership-status").val(),
+			"csrfmiddlewaretoken": $("#csrf_token").val()
+		};
+		$(this).prop("disabled", true);
+		$.ajax({
+			type: "POST",
+			url: $(this).data("url"),
+			data: data,
+			traditional: true,
+			dataType: "json",
+			success: function() {
+				location.reload();
+			},
+			error: function(a) {
+				location.reload();
+			}
+		});
+	});
 });
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 
+from openldap import jobs
 from users.forms import CustomUserChangeForm
 from users.forms import CustomUserCreationForm
 from users.models import CustomUser
@@ -115,6 +116,32 @@ class CustomUserAdmin(UserAdmin):
         'groups',
     )
 
+    actions = [
+        'enable_directory_accounts',
+        'reset_directory_passwords',
+        'deactivate_directory_accounts',
+    ]
+
+    def _enqueue_account_operations(self, request, queryset, operation):
+        for email in queryset.values_list('email', flat=True):
+            jobs.enqueue_account_operation(email, operation)
+        self.message_user(request, 'Queued directory updates for {} users.'.format(len(queryset)))
+
+    def enable_directory_accounts(self, request, queryset):
+        self._enqueue_account_operations(request, queryset, jobs.ENABLE)
+
+    enable_directory_accounts.short_description = 'Enable directory accounts'
+
+    def reset_directory_passwords(self, request, queryset):
+        self._enqueue_account_operations(request, queryset, jobs.RESET_PASSWORD)
+
+    reset_directory_passwords.short_description = 'Reset directory passwords'
+
+    def deactivate_directory_accounts(self, request, queryset):
+        self._enqueue_account_operations(request, queryset, jobs.DELETE)
+
+    deactivate_directory_accounts.short_description = 'Deactivate directory accounts'
+
     @classmethod
     def get_account_status(cls, instance):
         return instance.profile.get_account_status_display()
@@ -0,0 +1,23 @@
+from django.contrib.auth.backends import ModelBackend
+from shibboleth.backends import ShibbolethRemoteUserBackend
+
+from users import snapshot
+
+
+class SnapshotBackendMixin(object):
+    """
+    Authentication backend mixin loading the user of each request from their cached snapshot,
+    see users.snapshot.
+    """
+
+    def get_user(self, user_id):
+        user = snapshot.get_user(user_id, super().get_user)
+        return user if user is not None and self.user_can_authenticate(user) else None
+
+
+class SnapshotModelBackend(SnapshotBackendMixin, ModelBackend):
+    pass
+
+
+class SnapshotShibbolethRemoteUserBackend(SnapshotBackendMixin, ShibbolethRemoteUserBackend):
+    pass
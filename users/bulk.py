@@ -0,0 +1,232 @@
+"""
+Bulk creation of user accounts, e.g. for a university cohort, from the rows of a CSV file.
+
+Rows are upserted in batches keyed by institutional address, the user's email address, as the
+add_users command does row by row. Existing users are loaded once per batch, new users and their
+profiles are written with bulk inserts, and group memberships are attached with a single insert,
+so each batch takes a fixed number of queries. Bulk inserts skip the profile signal in
+users.signals, so the profiles it would create are written here instead.
+
+Every new account is given a random password, and hashing them is by far the most expensive
+part of an import, so the hashes are computed in a pool of processes.
+"""
+import collections
+import concurrent.futures
+import contextlib
+import itertools
+
+from django.contrib.auth.hashers import make_password
+from django.db import connections
+from django.db import router
+from django.db import transaction
+from django.db.models import Case
+from django.db.models import Value
+from django.db.models import When
+from django.utils import timezone
+
+from institution.registry import get_registry
+from users import snapshot
+from users.groups import add_to_group
+from users.models import CustomUser
+from users.models import Profile
+from users.models import ShibbolethProfile
+
+# Profile fields keyed by the column they are read from.
+PROFILE_COLUMNS = collections.OrderedDict([
+    ('new_scw_username', 'scw_username'),
+    ('hpcw_username', 'hpcw_username'),
+    ('hpcw_email', 'hpcw_email'),
+    ('raven_username', 'raven_username'),
+    ('raven_email', 'raven_email'),
+    ('description', 'description'),
+    ('phone', 'phone'),
+])
+
+# Passwords hashed per task sent to a worker process.
+HASH_CHUNK_SIZE = 16
+
+ImportResult = collections.namedtuple('ImportResult', ['rows', 'created', 'updated', 'errors'])
+
+
+class RowError(Exception):
+    pass
+
+
+def parse_row(row):
+    """
+    Return (user, profile fields) for a CSV row, raising RowError if it cannot be imported.
+
+    The user is unsaved and has no password.
+
+    Args:
+        row (dict): Row as read by csv.DictReader.
+    """
+    email = (row.get('institutional_address') or '').strip()
+    if not email:
+        raise RowError('No institutional address.')
+    institution = get_registry().get_by_email_address(email)
+    if institution is None:
+        raise RowError('Email address domain is not supported: ' + email)
+    user = CustomUser(
+        username=email,
+        email=email,
+        first_name=row.get('firstname') or '',
+        last_name=row.get('surname') or '',
+    )
+    user.institution = institution
+    profile = {field: row.get(column) or '' for column, field in PROFILE_COLUMNS.items()}
+    return user, profile
+
+
+def _random_password_hash(_):
+    return make_password(CustomUser.objects.make_random_password())
+
+
+def hash_passwords(count, executor=None):
+    """
+    Return count hashes of random passwords.
+
+    Args:
+        count (int): Number of hashes.
+        executor (concurrent.futures.Executor): Pool the hashes are computed in, defaults to the
+            current process.
+    """
+    if executor is None:
+        return [_random_password_hash(i) for i in range(count)]
+    return list(executor.map(_random_password_hash, range(count), chunksize=HASH_CHUNK_SIZE))
+
+
+def insert_child_rows(model, objs):
+    """
+    Insert the rows of a multi-table inherited model's own table, whose parent rows exist.
+
+    bulk_create refuses multi-table inherited models, so the rows are inserted as Model.save()
+    would insert them once the parent rows are saved, in as few statements as the database's
+    parameter limit allows.
+
+    Args:
+        model (Model): Child model.
+        objs (list): Instances, with their parent link set.
+    """
+    connection = connections[router.db_for_write(model)]
+    fields = model._meta.local_concrete_fields
+    batch_size = max(connection.ops.bulk_batch_size(fields, objs), 1)
+    sql = 'INSERT INTO {table} ({columns}) '.format(
+        table=connection.ops.quote_name(model._meta.db_table),
+        columns=', '.join(connection.ops.quote_name(field.column) for field in fields),
+    )
+    with connection.cursor() as cursor:
+        for i in range(0, len(objs), batch_size):
+            batch = objs[i:i + batch_size]
+            params = [
+                field.get_db_prep_save(getattr(obj, field.attname), connection=connection)
+                for obj in batch for field in fields
+            ]
+            placeholders = [['%s'] * len(fields)] * len(batch)
+            cursor.execute(sql + connection.ops.bulk_insert_sql(fields, placeholders), params)
+
+
+def _update_case(field, profiles):
+    return Case(
+        *[When(user_id=user_id, then=Value(values[field])) for user_id, values in profiles],
+        output_field=Profile._meta.get_field(field),
+    )
+
+
+def import_batch(batch, group_id, executor=None):
+    """
+    Upsert a batch of parsed rows, returning (created, updated).
+
+    Args:
+        batch (dict): (user, profile fields) keyed by email address.
+        group_id (int): Group every user is added to.
+        executor (concurrent.futures.Executor): Pool passwords are hashed in.
+    """
+    existing = dict(CustomUser.objects.filter(email__in=batch).values_list('email', 'pk'))
+    new = [user for email, (user, _) in batch.items() if email not in existing]
+    for user, password in zip(new, hash_passwords(len(new), executor)):
+        user.password = password
+    CustomUser.objects.bulk_create(new)
+
+    # bulk_create only sets primary keys on PostgreSQL, so the new users are looked up.
+    pks = dict(CustomUser.objects.filter(email__in=[user.email for user in new]).values_list('email', 'pk'))
+    profiles = [
+        Profile(user_id=pks[user.email], account_status=Profile.APPROVED, **batch[user.email][1])
+        for user in new
+    ]
+    Profile.objects.bulk_create(profiles)
+    profile_ids = dict(Profile.objects.filter(user_id__in=pks.values()).values_list('user_id', 'pk'))
+    shibboleth_profiles = [
+        ShibbolethProfile(
+            profile_ptr_id=profile_ids[pks[user.email]],
+            user_id=pks[user.email],
+            shibboleth_id=user.email,
+            institution=user.institution,
+        ) for user in new
+    ]
+    insert_child_rows(ShibbolethProfile, shibboleth_profiles)
+
+    updated = [(pk, batch[email][1]) for email, pk in existing.items()]
+    if updated:
+        fields = {field: _update_case(field, updated) for field in PROFILE_COLUMNS.values()}
+        Profile.objects.filter(user_id__in=existing.values()).update(
+            account_status=Profile.APPROVED,
+            modified_time=timezone.now(),
+            **fields
+        )
+        # QuerySet.update() sends no signals, see users.snapshot.
+        snapshot.invalidate(existing.values())
+
+    add_to_group(set(existing.values()) | set(pks.values()), group_id)
+    return len(new), len(updated)
+
+
+def import_users(rows, group_id, batch_size=500, processes=None, dry_run=False, progress=None):
+    """
+    Create or update the users, and their approved profiles, of the rows of a CSV file.
+
+    Each batch is imported in its own transaction. A row that cannot be imported, e.g. because
+    its domain belongs to no institution, is reported in the result's errors and skipped.
+
+    Args:
+        rows (iterable): Rows as read by csv.DictReader.
+        group_id (int): Group every user is added to.
+        batch_size (int): Number of rows imported per batch.
+        processes (int): Number of processes passwords are hashed in, defaults to the number of
+            CPUs. With 1 passwords are hashed in the current process.
+        dry_run (bool): Import the rows, then roll every change back.
+        progress (callable): Called with the ImportResult so far after each batch.
+    """
+    result = ImportResult(rows=0, created=0, updated=0, errors={})
+    rows = enumerate(rows, start=2)
+    if processes == 1:
+        pool = contextlib.suppress()
+    else:
+        pool = concurrent.futures.ProcessPoolExecutor(max_workers=processes)
+    with pool as executor, transaction.atomic() if dry_run else contextlib.suppress():
+        while True:
+            chunk = list(itertools.islice(rows, batch_size))
+            if not chunk:
+                break
+            batch = collections.OrderedDict()
+            for line, row in chunk:
+                try:
+                    user, profile = parse_row(row)
+                except RowError as e:
+                    result.errors[line] = str(e)
+                else:
+                    # A user repeated within a batch is imported from their last row.
+                    batch.pop(user.email, None)
+                    batch[user.email] = (user, profile)
+            with transaction.atomic():
+                created, updated = import_batch(batch, group_id, executor)
+            result = result._replace(
+                rows=result.rows + len(chunk),
+                created=result.created + created,
+                updated=result.updated + updated,
+            )
+            if progress is not None:
+                progress(result)
+        if dry_run:
+            transaction.set_rollback(True)
+    return result
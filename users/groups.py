@@ -0,0 +1,51 @@
+"""
+Process wide cache of group ids by name.
+
+Groups are created by migrations and rarely change, so each id is looked up once per process
+rather than once per use. users.signals clears the cache whenever a group is saved or deleted.
+"""
+from django.contrib.auth.models import Group
+
+from users import snapshot
+from users.models import CustomUser
+
+_group_ids = {}
+
+
+def get_group_id(name):
+    """
+    Return the id of the group called name, raising Group.DoesNotExist if there is none.
+
+    Args:
+        name (str): Group name.
+    """
+    try:
+        return _group_ids[name]
+    except KeyError:
+        group_id = Group.objects.values_list('pk', flat=True).get(name=name)
+        _group_ids[name] = group_id
+        return group_id
+
+
+def clear_group_ids():
+    _group_ids.clear()
+
+
+def add_to_group(user_ids, group_id):
+    """
+    Add users to a group, skipping those already in it.
+
+    Args:
+        user_ids (set): User ids.
+        group_id (int): Group id.
+    """
+    through = CustomUser.groups.through
+    members = set(
+        through.objects.filter(
+            group_id=group_id,
+            customuser_id__in=user_ids,
+        ).values_list('customuser_id', flat=True))
+    added = sorted(set(user_ids) - members)
+    through.objects.bulk_create([through(customuser_id=user_id, group_id=group_id) for user_id in added])
+    # bulk_create sends no m2m_changed signal.
+    snapshot.invalidate(added)
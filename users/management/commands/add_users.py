@@ -2,7 +2,9 @@ import csv
 
 from django.contrib.auth.models import Group
 from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
 
+from users import bulk
 from users.models import CustomUser
 from users.models import Profile
 
@@ -12,22 +14,83 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('csv_filename')
+        parser.add_argument(
+            '--bulk',
+            action='store_true',
+            help='Import the rows in batches, see users.bulk.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of rows imported per batch, with --bulk.',
+        )
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=None,
+            help='Number of processes passwords are hashed in, with --bulk. Defaults to the number of CPUs.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Import the rows, then roll every change back, with --bulk.',
+        )
+
+    def progress(self, result):
+        self.stdout.write('Processed {} rows: {} created, {} updated, {} errors.'.format(
+            result.rows,
+            result.created,
+            result.updated,
+            len(result.errors),
+        ))
+
+    def handle_bulk(self, group, filename, options):
+        try:
+            with open(filename, newline='') as csvfile:
+                result = bulk.import_users(
+                    csv.DictReader(csvfile),
+                    group.pk,
+                    batch_size=options['batch_size'],
+                    processes=options['processes'],
+                    dry_run=options['dry_run'],
+                    progress=self.progress,
+                )
+        except FileNotFoundError:
+            raise CommandError('Unable to open ' + filename)
+
+        for line, error in sorted(result.errors.items()):
+            self.stdout.write(self.style.ERROR('Row {}: {}'.format(line, error)))
+        self.stdout.write(
+            self.style.SUCCESS('Imported {} users ({} created, {} updated){}, {} rows failed.'.format(
+                result.created + result.updated,
+                result.created,
+                result.updated,
+                ' (dry run)' if options['dry_run'] else '',
+                len(result.errors),
+            )))
 
     def handle(self, *args, **options):
         # Users will be added to the student user group by default.
         group = Group.objects.get(name='student')
         filename = options['csv_filename']
+        if options['bulk']:
+            return self.handle_bulk(group, filename, options)
+        if options['dry_run']:
+            raise CommandError('--dry-run requires --bulk.')
         try:
             # Open input csv file.
             with open(filename, newline='') as csvfile:
                 reader = csv.DictReader(csvfile)
                 for row in reader:
-                    # Get or create a user.
+                    # Get or create a user, by their institutional address as users.bulk does.
                     user, created = CustomUser.objects.get_or_create(
-                        username=row['institutional_address'],
                         email=row['institutional_address'],
-                        first_name=row['firstname'],
-                        last_name=row['surname'],
+                        defaults={
+                            'username': row['institutional_address'],
+                            'first_name': row['firstname'],
+                            'last_name': row['surname'],
+                        },
                     )
                     if created:
                         user.set_password(CustomUser.objects.make_random_password())
@@ -4,23 +4,36 @@ from django.conf import settings
 from django.contrib import auth
 from django.contrib.auth import load_backend
 from django.contrib.auth.backends import RemoteUserBackend
+from django.core.exceptions import ImproperlyConfigured
 from django.http import HttpResponseRedirect
 from django.urls import resolve
 from django.urls import reverse
 
-from institution.exceptions import InvalidIndentityProvider
-from institution.models import Institution
+from institution.registry import get_registry
 from shibboleth.middleware import ShibbolethRemoteUserMiddleware
 from shibboleth.middleware import ShibbolethValidationError
 
 
+# The REMOTE USER header may return the authenticated user's email address or username.
+EMAIL_REGEX = re.compile(r'(^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$)')
+
+
 class SCWRemoteUserMiddleware(ShibbolethRemoteUserMiddleware):
 
+    _external_login_path = None
+
+    @property
+    def external_login_path(self):
+        # Reversed once, on first use, rather than on every request.
+        if self._external_login_path is None:
+            self._external_login_path = reverse('external-login')
+        return self._external_login_path
+
     def process_request(self, request):
         # The identity of external collaborators is managed within the django application.
         # Therefore, exclude the external collaborator login form from the SCW Remote User
         # Middleware.
-        if request.path.startswith(reverse('external-login')):
+        if request.path.startswith(self.external_login_path):
             return
 
         # AuthenticationMiddleware is required so that request.user exists.
@@ -52,17 +65,20 @@ class SCWRemoteUserMiddleware(ShibbolethRemoteUserMiddleware):
                 self._remove_invalid_user(request)
             return
 
+        # The session remembers the headers its user was authenticated with, so a request from
+        # an already authenticated user needs no database queries.
+        remote_user = [identity_provider, username]
+        session = request.session
+        if auth.SESSION_KEY in session and session.get(settings.SHIBBOLETH_REMOTE_USER_SESSION_KEY) == remote_user:
+            return
+
         # Ensure the Shib-Identity-Provider is supported / valid.
-        try:
-            Institution.is_valid_identity_provider(identity_provider)
-        except InvalidIndentityProvider:
+        institution = get_registry().get_by_identity_provider(identity_provider)
+        if institution is None:
             return
 
-        # The REMOTE USER header may return the authenticated user's email address or username.
-        email_regex = r'(^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$)'
-        if not re.match(email_regex, username):
+        if not EMAIL_REGEX.match(username):
             # Must append the institutions base domain to the username.
-            institution = Institution.objects.get(identity_provider=identity_provider)
             username = '@'.join([username, institution.base_domain])
 
         # If the user is already authenticated and that user is the user we are getting passed in
@@ -70,6 +86,7 @@ class SCWRemoteUserMiddleware(ShibbolethRemoteUserMiddleware):
         # to continue.
         if request.user.is_authenticated:
             if request.user.username == self.clean_username(username, request):
+                request.session[settings.SHIBBOLETH_REMOTE_USER_SESSION_KEY] = remote_user
                 return
             else:
                 self._remove_invalid_user(request)
@@ -91,6 +108,7 @@ class SCWRemoteUserMiddleware(ShibbolethRemoteUserMiddleware):
             # Set request.user and persist user in the session by logging the user in.
             request.user = user
             auth.login(request, user)
+            request.session[settings.SHIBBOLETH_REMOTE_USER_SESSION_KEY] = remote_user
         else:
             # Redirect the user to apply for an account.
             url_name = resolve(request.path_info).url_name
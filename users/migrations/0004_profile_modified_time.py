@@ -0,0 +1,18 @@
+# Generated by Django 2.0.2 on 2026-10-18 17:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_auto_20180514_1306'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='modified_time',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
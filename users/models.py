@@ -5,6 +5,7 @@ from django.contrib.auth.models import PermissionsMixin
 from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.db import models
 
+from cogs3.models import FieldTrackerMixin
 from institution.models import Institution
 
 
@@ -64,6 +65,10 @@ class Profile(models.Model):
         choices=STATUS_CHOICES,
         default=AWAITING_APPROVAL,
     )
+    modified_time = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+    )
 
     class Meta:
         verbose_name = 'profile'
@@ -137,7 +142,7 @@ class CustomUserManager(BaseUserManager):
         return self._create_user(email, password, **extra_fields)
 
 
-class CustomUser(AbstractBaseUser, PermissionsMixin):
+class CustomUser(FieldTrackerMixin, AbstractBaseUser, PermissionsMixin):
     username_validator = UnicodeUsernameValidator()
     username = models.CharField(
         'username',
@@ -187,6 +192,9 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
 
+    # The fields a user's profile is derived from.
+    tracked_fields = ('email', 'is_shibboleth_login_required')
+
     objects = CustomUserManager()
 
     def __str__(self):
@@ -198,5 +206,12 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     def get_short_name(self):
         return self.email
 
+    def get_session_auth_hash(self):
+        # Users restored from a snapshot carry the hash in place of their password, see
+        # users.snapshot, until a new password is set.
+        if hasattr(self, '_session_auth_hash') and 'password' in self.get_deferred_fields():
+            return self._session_auth_hash
+        return super().get_session_auth_hash()
+
     class Meta:
         verbose_name_plural = 'Users'
@@ -1,9 +1,18 @@
 from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import Group
+from django.contrib.auth.models import Permission
 from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import m2m_changed
+from django.db.models.signals import post_delete
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
 from institution.models import Institution
+from institution.registry import get_registry
+from users import groups
+from users import snapshot
+from users.models import CustomUser
 from users.models import Profile
 from users.models import ShibbolethProfile
 
@@ -12,6 +21,9 @@ def login_user(sender, user, request, **kwargs):
     if user.is_shibboleth_login_required:
         # Reauthentication via shibboleth is not required until a user logs out.
         request.session[settings.SHIBBOLETH_FORCE_REAUTH_SESSION_KEY] = False
+    # The user's next request is served from their snapshot, see users.snapshot. The user is
+    # reloaded so the snapshot only holds rows read after its version.
+    snapshot.get_user(user.pk, ModelBackend().get_user)
 
 
 user_logged_in.connect(login_user)
@@ -20,9 +32,17 @@ user_logged_in.connect(login_user)
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def create_or_update_user_profile(sender, instance, created, **kwargs):
     user = instance
+    # Most saves, such as the last_login update on every login, leave the fields the profile is
+    # derived from unchanged, so there is nothing to write.
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and not set(update_fields) & set(user.tracked_fields):
+        return
+    if not created and not any(user.has_changed(field) for field in user.tracked_fields):
+        return
     if user.is_shibboleth_login_required:
-        _, domain = user.email.split('@')
-        institution = Institution.objects.get(base_domain=domain)
+        institution = get_registry().get_by_email_address(user.email)
+        if institution is None:
+            raise Institution.DoesNotExist('Email address domain is not supported.')
         ShibbolethProfile.objects.update_or_create(
             user=user,
             defaults={
@@ -33,3 +53,45 @@ def create_or_update_user_profile(sender, instance, created, **kwargs):
     else:
         Profile.objects.update_or_create(user=user)
     user.profile.save()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def clear_group_ids(sender, **kwargs):
+    groups.clear_group_ids()
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_snapshot(sender, instance, **kwargs):
+    snapshot.invalidate([instance.pk])
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_save, sender=ShibbolethProfile)
+@receiver(post_delete, sender=Profile)
+@receiver(post_delete, sender=ShibbolethProfile)
+def invalidate_profile_snapshot(sender, instance, **kwargs):
+    snapshot.invalidate([instance.user_id])
+
+
+@receiver(m2m_changed, sender=CustomUser.groups.through)
+@receiver(m2m_changed, sender=CustomUser.user_permissions.through)
+def invalidate_member_snapshots(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        snapshot.invalidate([instance.pk])
+    elif pk_set is None:
+        # Every user was removed from the group or permission.
+        snapshot.invalidate_all()
+    else:
+        snapshot.invalidate(pk_set)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+def invalidate_snapshots(sender, **kwargs):
+    if kwargs.get('action', 'post_').startswith('post_'):
+        snapshot.invalidate_all()
@@ -0,0 +1,193 @@
+"""
+Cached snapshots of what each request needs to know about its user: the user row, their user
+and group permissions, and their profile.
+
+AuthenticationMiddleware reloads the user on every request, and views then load permissions for
+has_perm and the profile for its account status. A snapshot holds all of them, so an
+authenticated page view needs no authentication queries. Snapshots are stored in the Redis
+instance configured for RQ, so they are shared by, and invalidated for, every gunicorn and RQ
+worker process. Without Redis every request loads its user from the database.
+
+Each user has a version counter in Redis, and a snapshot records the versions read before its
+user was loaded from the database. Invalidating a user increments their counter, and
+invalidating every user increments a shared generation counter, so a snapshot built from rows
+read before an invalidation is never served after it, even if it is written after it.
+
+Users are invalidated by users.signals when the user, their profile, their groups or their
+permissions change, and every user is invalidated when the permissions of a group change. Code
+updating these with QuerySet.update() or bulk_create(), which send no signals, must call
+invalidate() itself.
+
+Snapshots do not hold the user's password hash, only their session authentication hash, which
+is all AuthenticationMiddleware needs. The password of a restored user is a deferred field,
+loaded from the database if it is read.
+"""
+import logging
+import pickle
+
+import redis
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.db import router
+from django.db import transaction
+
+from cogs3.cache import get_redis_connection
+from users.models import CustomUser
+from users.models import Profile
+
+logger = logging.getLogger('apps')
+
+# Format of the cached snapshots, a snapshot of any other format is ignored.
+SNAPSHOT_FORMAT = 2
+
+GENERATION_KEY = 'auth:generation'
+
+# User fields left out of snapshots, see restore.
+EXCLUDED_USER_FIELDS = ('password', )
+
+
+def get_connection():
+    """
+    Return the Redis connection snapshots are stored in, or None if snapshots are disabled or
+    Redis has not been configured for RQ.
+    """
+    if settings.AUTH_SNAPSHOT_TIMEOUT <= 0:
+        return None
+    return get_redis_connection()
+
+
+def _key(user_id):
+    return ''.join(['auth:user:', str(user_id)])
+
+
+def _version_key(user_id):
+    # Version counters have no time to live, so they outlive every snapshot built before them.
+    return ''.join(['auth:version:', str(user_id)])
+
+
+def _row(instance, exclude=()):
+    return {
+        field.attname: getattr(instance, field.attname)
+        for field in instance._meta.concrete_fields if field.attname not in exclude
+    }
+
+
+def _from_row(model, row):
+    return model.from_db(router.db_for_read(model), list(row), list(row.values()))
+
+
+def build(user, version):
+    """
+    Return the snapshot of a user, loading their permissions and profile.
+
+    Args:
+        user (CustomUser): User, as loaded from the database.
+        version (tuple): Generation and user version read before the user was loaded.
+    """
+    backend = ModelBackend()
+    profile = Profile.objects.filter(user_id=user.pk).first()
+    return {
+        'format': SNAPSHOT_FORMAT,
+        'version': version,
+        'user': _row(user, exclude=EXCLUDED_USER_FIELDS),
+        'session_auth_hash': user.get_session_auth_hash(),
+        'user_permissions': backend.get_user_permissions(user),
+        'group_permissions': backend.get_group_permissions(user),
+        'profile': _row(profile) if profile is not None else None,
+    }
+
+
+def restore(snapshot):
+    """
+    Return the user of a snapshot, with their permissions and profile already loaded.
+
+    Args:
+        snapshot (dict): Snapshot, as returned by build.
+    """
+    user = _from_row(CustomUser, snapshot['user'])
+    user._session_auth_hash = snapshot['session_auth_hash']
+    # The caches ModelBackend.get_all_permissions fills on first use.
+    user._user_perm_cache = set(snapshot['user_permissions'])
+    user._group_perm_cache = set(snapshot['group_permissions'])
+    user._perm_cache = user._user_perm_cache | user._group_perm_cache
+    if snapshot['profile'] is not None:
+        profile = _from_row(Profile, snapshot['profile'])
+        CustomUser.profile.related.set_cached_value(user, profile)
+        Profile.user.field.set_cached_value(profile, user)
+    return user
+
+
+def get_user(user_id, load):
+    """
+    Return the user of a user id from their cached snapshot, or load them and cache their
+    snapshot.
+
+    Args:
+        user_id: User id, e.g. as stored in the session.
+        load (callable): Called with the user id to load the user from the database, returning
+            None if there is no such user.
+    """
+    connection = get_connection()
+    if connection is None:
+        return load(user_id)
+    try:
+        cached, generation, user_version = connection.mget(_key(user_id), GENERATION_KEY, _version_key(user_id))
+    except redis.exceptions.ConnectionError:
+        logger.warning('Unable to read the snapshot of user %s.', user_id)
+        return load(user_id)
+    version = (int(generation or 0), int(user_version or 0))
+    if cached is not None:
+        snapshot = pickle.loads(cached)
+        if snapshot.get('format') == SNAPSHOT_FORMAT and snapshot['version'] == version:
+            return restore(snapshot)
+
+    user = load(user_id)
+    if user is None:
+        return None
+    user_snapshot = build(user, version)
+    try:
+        connection.setex(_key(user_id), settings.AUTH_SNAPSHOT_TIMEOUT, pickle.dumps(user_snapshot))
+    except redis.exceptions.ConnectionError:
+        logger.warning('Unable to cache the snapshot of user %s.', user_id)
+    return restore(user_snapshot)
+
+
+def _on_commit(func):
+    # A snapshot built by a concurrent request before the change is committed would otherwise
+    # be served after it, so changes made in a transaction are invalidated again once it commits.
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(func)
+
+
+def _increment(keys):
+    connection = get_connection()
+    if connection is None or not keys:
+        return
+    try:
+        pipeline = connection.pipeline(transaction=False)
+        for key in keys:
+            pipeline.incr(key)
+        pipeline.execute()
+    except redis.exceptions.ConnectionError:
+        logger.exception('Unable to invalidate user snapshots.')
+
+
+def invalidate(user_ids):
+    """
+    Invalidate the cached snapshots of users.
+
+    Args:
+        user_ids (iterable): User ids.
+    """
+    keys = [_version_key(user_id) for user_id in user_ids]
+    _increment(keys)
+    _on_commit(lambda: _increment(keys))
+
+
+def invalidate_all():
+    """
+    Invalidate every cached snapshot.
+    """
+    _increment([GENERATION_KEY])
+    _on_commit(lambda: _increment([GENERATION_KEY]))
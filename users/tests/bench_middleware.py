@@ -0,0 +1,66 @@
+"""
+Benchmark of the per request overhead of users.middleware.SCWRemoteUserMiddleware.
+
+Not collected by the default test run, run with:
+
+    python manage.py test users.tests.bench_middleware
+
+The number of requests timed per case defaults to 2000 and is set with MIDDLEWARE_BENCH_REQUESTS.
+"""
+import os
+import time
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from users.tests.test_middleware import SCWRemoteUserMiddlewareTests
+
+REQUESTS = int(os.environ.get('MIDDLEWARE_BENCH_REQUESTS', 2000))
+
+
+class SCWRemoteUserMiddlewareBenchmark(SCWRemoteUserMiddlewareTests, TestCase):
+
+    def _report(self, name, seconds, queries):
+        print('{:<40} {:>9.1f} us/req {:>6.2f} queries/req'.format(
+            name,
+            seconds / REQUESTS * 1e6,
+            queries / REQUESTS,
+        ))
+
+    def _timed(self, func):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            for _ in range(REQUESTS):
+                func()
+            seconds = time.perf_counter() - start
+        return seconds, len(queries)
+
+    def test_middleware_overhead(self):
+        print('\n{} requests per case'.format(REQUESTS))
+
+        # Only the middleware is timed, on requests whose session has already been loaded.
+        request, _ = self.process(self.email)
+        request, _ = self.process(self.email)
+        seconds, queries = self._timed(lambda: self.middleware.process_request(request))
+        self._report('authenticated session', seconds, queries)
+
+        request, _ = self.process('user')
+        request, _ = self.process('user')
+        seconds, queries = self._timed(lambda: self.middleware.process_request(request))
+        self._report('authenticated session, bare username', seconds, queries)
+
+        # The whole session, authentication and remote user middleware chain.
+        seconds, queries = self._timed(lambda: self.process(self.email))
+        self._report('middleware chain, authenticated', seconds, queries)
+
+        def first_request():
+            self.session = None
+            self.process(self.email)
+
+        seconds, queries = self._timed(first_request)
+        self._report('middleware chain, first request', seconds, queries)
+
+        seconds, queries = self._timed(lambda: self.process('', path=reverse('external-login')))
+        self._report('external login', seconds, queries)
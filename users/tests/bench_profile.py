@@ -0,0 +1,56 @@
+"""
+Benchmark of the writes made by users.signals.create_or_update_user_profile on login.
+
+Not collected by the default test run, run with:
+
+    python manage.py test users.tests.bench_profile
+
+The number of logins timed per case defaults to 1000 and is set with PROFILE_BENCH_LOGINS.
+"""
+import os
+import time
+
+from django.contrib.auth.models import update_last_login
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from users.models import CustomUser
+from users.tests.test_models import CustomUserTests
+
+LOGINS = int(os.environ.get('PROFILE_BENCH_LOGINS', 1000))
+
+
+class ProfileSignalBenchmark(CustomUserTests, TestCase):
+
+    def _report(self, name, seconds, queries):
+        print('{:<40} {:>9.1f} logins/s {:>6.2f} queries/login'.format(
+            name,
+            LOGINS / seconds,
+            queries / LOGINS,
+        ))
+
+    def _timed(self, func):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            for _ in range(LOGINS):
+                func()
+            seconds = time.perf_counter() - start
+        return seconds, len(queries)
+
+    def test_login_throughput(self):
+        print('\n{} logins per case'.format(LOGINS))
+        email = '@'.join(['joe.bloggs', self.institution.base_domain])
+        user = CustomUser.objects.get(pk=self.create_shibboleth_user(email=email).pk)
+
+        seconds, queries = self._timed(lambda: update_last_login(None, user))
+        self._report('login', seconds, queries)
+
+        def untracked_login():
+            # Forgetting the stored values makes every save look like a change, as every save
+            # was treated before the profile fields were tracked.
+            user._saved_values = {}
+            user.save()
+
+        seconds, queries = self._timed(untracked_login)
+        self._report('login, profile rewritten', seconds, queries)
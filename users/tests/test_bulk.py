@@ -0,0 +1,143 @@
+import csv
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils.six import StringIO
+
+from institution import registry
+from users import bulk
+from users.models import CustomUser
+from users.models import Profile
+from users.models import ShibbolethProfile
+from users.tests.test_models import CustomUserTests
+
+
+class BulkUserImportTests(CustomUserTests, TestCase):
+
+    def setUp(self):
+        super(BulkUserImportTests, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.group = Group.objects.create(name='student')
+        # Warm the institution registry, see institution.registry.
+        registry.get_registry()
+
+    def row(self, i, **values):
+        row = {
+            'institutional_address': 'user.{}@{}'.format(i, self.institution.base_domain),
+            'firstname': 'Joe',
+            'surname': 'Bloggs {}'.format(i),
+            'new_scw_username': 'b.user{}'.format(i),
+            'hpcw_username': '',
+            'hpcw_email': '',
+            'raven_username': 'raven{}'.format(i),
+            'raven_email': '',
+            'description': 'Student',
+            'phone': '',
+        }
+        row.update(values)
+        return row
+
+    def write_csv(self, rows):
+        path = os.path.join(self.directory, 'users.csv')
+        with open(path, 'w', newline='') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        return path
+
+    def test_import(self):
+        result = bulk.import_users([self.row(i) for i in range(3)], self.group.pk, processes=1)
+        self.assertEqual(result.errors, {})
+        self.assertEqual((result.rows, result.created, result.updated), (3, 3, 0))
+
+        user = CustomUser.objects.get(email='user.0@' + self.institution.base_domain)
+        self.assertEqual(user.username, user.email)
+        self.assertEqual(user.last_name, 'Bloggs 0')
+        self.assertTrue(user.has_usable_password())
+        self.assertEqual(user.groups.get(), self.group)
+        profile = ShibbolethProfile.objects.get(user=user)
+        self.assertEqual(profile.shibboleth_id, user.email)
+        self.assertEqual(profile.institution, self.institution)
+        self.assertEqual(profile.scw_username, 'b.user0')
+        self.assertEqual(profile.raven_username, 'raven0')
+        self.assertEqual(profile.account_status, Profile.APPROVED)
+
+    def test_import_updates_existing_users(self):
+        user = self.create_shibboleth_user(email='user.0@' + self.institution.base_domain)
+        result = bulk.import_users([self.row(0), self.row(1)], self.group.pk, processes=1)
+        self.assertEqual((result.created, result.updated), (1, 1))
+        profile = Profile.objects.get(user=user)
+        self.assertEqual(profile.scw_username, 'b.user0')
+        self.assertEqual(profile.account_status, Profile.APPROVED)
+        self.assertEqual(set(user.groups.values_list('name', flat=True)), {'project_owner', 'student'})
+        self.assertEqual(CustomUser.objects.count(), 2)
+
+    def test_invalid_rows_are_skipped(self):
+        rows = [
+            self.row(0, institutional_address='user@example.com'),
+            self.row(1, institutional_address=''),
+            self.row(2),
+        ]
+        result = bulk.import_users(rows, self.group.pk, processes=1)
+        self.assertEqual(sorted(result.errors), [2, 3])
+        self.assertEqual(result.errors[2], 'Email address domain is not supported: user@example.com')
+        self.assertEqual(CustomUser.objects.get().email, 'user.2@' + self.institution.base_domain)
+
+    def test_dry_run(self):
+        result = bulk.import_users([self.row(0)], self.group.pk, processes=1, dry_run=True)
+        self.assertEqual(result.created, 1)
+        self.assertFalse(CustomUser.objects.exists())
+        self.assertFalse(Profile.objects.exists())
+
+    def test_passwords_are_hashed_in_a_process_pool(self):
+        result = bulk.import_users([self.row(i) for i in range(3)], self.group.pk, processes=2)
+        self.assertEqual(result.created, 3)
+        passwords = set(CustomUser.objects.values_list('password', flat=True))
+        self.assertEqual(len(passwords), 3)
+
+    def test_batches_take_a_fixed_number_of_queries(self):
+        """
+        Ensure the number of queries per batch does not grow with the batch size.
+        """
+
+        def count_queries(rows):
+            with CaptureQueriesContext(connection) as queries:
+                bulk.import_users(rows, self.group.pk, processes=1)
+            return len(queries)
+
+        few = count_queries([self.row(i) for i in range(2)])
+        many = count_queries([self.row(i) for i in range(2, 27)])
+        self.assertEqual(few, many)
+
+    def test_command(self):
+        out = StringIO()
+        path = self.write_csv([self.row(0), self.row(1)])
+        call_command('add_users', path, bulk=True, batch_size=1, processes=1, stdout=out)
+        output = out.getvalue()
+        self.assertIn('Processed 1 rows: 1 created, 0 updated, 0 errors.', output)
+        self.assertIn('Imported 2 users (2 created, 0 updated), 0 rows failed.', output)
+        with self.assertRaises(CommandError):
+            call_command('add_users', os.path.join(self.directory, 'missing.csv'), bulk=True, stdout=out)
+        with self.assertRaises(CommandError):
+            call_command('add_users', path, dry_run=True, stdout=out)
+
+    def test_command_matches_users_by_email_address(self):
+        """
+        Ensure rows for existing users update them, rather than failing on the unique email
+        address, whether or not the rows are imported in bulk.
+        """
+        user = self.create_shibboleth_user(email='user.0@' + self.institution.base_domain)
+        path = self.write_csv([self.row(0, firstname='Joseph')])
+        for options in [{}, {'bulk': True, 'processes': 1}]:
+            out = StringIO()
+            call_command('add_users', path, stdout=out, **options)
+            self.assertEqual(CustomUser.objects.get(), user)
+            self.assertEqual(Profile.objects.get(user=user).scw_username, 'b.user0')
@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.test import RequestFactory
+from django.test import TestCase
+from django.urls import reverse
+
+from institution.tests.test_models import InstitutionTests
+from users.middleware import SCWRemoteUserMiddleware
+from users.tests.test_models import CustomUserTests
+
+
+class SCWRemoteUserMiddlewareTests(TestCase):
+
+    def setUp(self):
+        self.institution = InstitutionTests.create_institution(
+            name='Bangor University',
+            base_domain='bangor.ac.uk',
+            identity_provider='https://idp.bangor.ac.uk/shibboleth',
+        )
+        self.email = '@'.join(['user', self.institution.base_domain])
+        self.user = CustomUserTests.create_shibboleth_user(email=self.email)
+        self.middleware = SCWRemoteUserMiddleware()
+        self.session = None
+
+    def process(self, remote_user, path=None):
+        """
+        Process a request carrying the shibboleth headers through the session, authentication
+        and remote user middleware, keeping the session between requests.
+        """
+        request = RequestFactory().get(
+            path or reverse('home'),
+            REMOTE_USER=remote_user,
+            **{'Shib-Identity-Provider': self.institution.identity_provider}
+        )
+        if self.session is not None:
+            request.COOKIES[settings.SESSION_COOKIE_NAME] = self.session.session_key
+        SessionMiddleware().process_request(request)
+        AuthenticationMiddleware().process_request(request)
+        response = self.middleware.process_request(request)
+        request.session.save()
+        self.session = request.session
+        return request, response
+
+    def test_first_request_logs_the_user_in(self):
+        request, response = self.process(self.email)
+        self.assertIsNone(response)
+        self.assertEqual(request.user, self.user)
+        self.assertEqual(
+            request.session[settings.SHIBBOLETH_REMOTE_USER_SESSION_KEY],
+            [self.institution.identity_provider, self.email],
+        )
+
+    def test_authenticated_requests_run_no_queries(self):
+        self.process(self.email)
+        request, _ = self.process(self.email)
+        # Loading the session is the only query, the middleware neither loads the user nor
+        # validates the identity provider again.
+        with self.assertNumQueries(0):
+            self.assertIsNone(self.middleware.process_request(request))
+
+    def test_username_is_qualified_with_the_institution_domain(self):
+        request, _ = self.process('user')
+        self.assertEqual(request.user, self.user)
+
+    def test_a_different_user_replaces_the_session_user(self):
+        self.process(self.email)
+        other_email = '@'.join(['other', self.institution.base_domain])
+        other = CustomUserTests.create_shibboleth_user(email=other_email)
+        request, _ = self.process(other_email)
+        self.assertEqual(request.user, other)
+        self.assertEqual(int(request.session[SESSION_KEY]), other.pk)
+
+    def test_unknown_identity_providers_are_ignored(self):
+        request = RequestFactory().get(reverse('home'), REMOTE_USER=self.email, **{'Shib-Identity-Provider': 'https://idp.example.com/shibboleth'})
+        SessionMiddleware().process_request(request)
+        AuthenticationMiddleware().process_request(request)
+        self.assertIsNone(self.middleware.process_request(request))
+        self.assertFalse(request.user.is_authenticated)
+
+    def test_unknown_users_are_redirected_to_register(self):
+        _, response = self.process('@'.join(['unknown', self.institution.base_domain]))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.url, reverse('register'))
@@ -1,4 +1,5 @@
 from django.contrib.auth.models import Group
+from django.contrib.auth.models import update_last_login
 from django.test import TestCase
 
 from institution.tests.test_models import InstitutionTests
@@ -125,3 +126,41 @@ class CustomUserTests(TestCase):
         self.assertEqual(profile.description, '')
         self.assertEqual(profile.phone, '')
         self.assertEqual(profile.account_status, Profile.AWAITING_APPROVAL)
+
+    def test_login_does_not_write_profile(self):
+        """
+        Ensure updating a user's last login time is a single query.
+        """
+        email = '@'.join(['joe.bloggs', self.institution.base_domain])
+        user = CustomUser.objects.get(pk=self.create_shibboleth_user(email=email).pk)
+        with self.assertNumQueries(1):
+            update_last_login(None, user)
+
+    def test_unchanged_user_does_not_write_profile(self):
+        """
+        Ensure saving a user without changing the fields its profile is derived from leaves the
+        profile untouched.
+        """
+        email = '@'.join(['joe.bloggs', self.institution.base_domain])
+        user = CustomUser.objects.get(pk=self.create_shibboleth_user(email=email).pk)
+        modified_time = user.profile.modified_time
+        user.first_name = 'Jane'
+        with self.assertNumQueries(1):
+            user.save()
+        self.assertEqual(Profile.objects.get(user=user).modified_time, modified_time)
+
+    def test_changed_email_updates_profile(self):
+        """
+        Ensure changing a user's email address updates their profile.
+        """
+        email = '@'.join(['joe.bloggs', self.institution.base_domain])
+        user = CustomUser.objects.get(pk=self.create_shibboleth_user(email=email).pk)
+        user.email = '@'.join(['jane.bloggs', 'cs', self.institution.base_domain])
+        user.save()
+        profile = ShibbolethProfile.objects.get(user=user)
+        self.assertEqual(profile.shibboleth_id, user.email)
+        self.assertEqual(profile.institution, self.institution)
+
+        # A second save has nothing left to write.
+        with self.assertNumQueries(1):
+            user.save()
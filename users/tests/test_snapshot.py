@@ -0,0 +1,124 @@
+import mock
+
+from django.contrib.auth.models import Group
+from django.contrib.auth.models import Permission
+from django.test import TestCase
+
+from cogs3.testing import SnapshotCacheMixin
+from project.lifecycle import close_accounts
+from users import groups
+from users import snapshot
+from users.backends import SnapshotModelBackend
+from users.models import CustomUser
+from users.models import Profile
+from users.tests.test_models import CustomUserTests
+
+
+class UserSnapshotTests(SnapshotCacheMixin, CustomUserTests, TestCase):
+
+    def setUp(self):
+        super(UserSnapshotTests, self).setUp()
+        self.backend = SnapshotModelBackend()
+        self.user = self.create_shibboleth_user(email='@'.join(['snapshot.user', self.institution.base_domain]))
+        self.group = Group.objects.create(name='student')
+        self.permission = Permission.objects.get(codename='change_profile')
+
+    def get_user(self):
+        return self.backend.get_user(str(self.user.pk))
+
+    def test_cached_user_needs_no_queries(self):
+        """
+        Ensure a cached user's permissions and profile are read without querying the database.
+        """
+        self.get_user()
+        with self.assertNumQueries(0):
+            user = self.get_user()
+            self.assertEqual(user, self.user)
+            self.assertTrue(user.has_perm('project.add_project'))
+            self.assertFalse(user.has_perm('users.change_profile'))
+            self.assertEqual(user.profile.account_status, Profile.AWAITING_APPROVAL)
+            self.assertEqual(user.profile.user, user)
+
+    def test_inactive_user_is_not_returned(self):
+        self.get_user()
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(self.get_user())
+
+    def test_profile_change_invalidates_snapshot(self):
+        self.get_user()
+        profile = self.user.profile
+        profile.account_status = Profile.APPROVED
+        profile.save()
+        self.assertEqual(self.get_user().profile.account_status, Profile.APPROVED)
+
+    def test_group_membership_change_invalidates_snapshot(self):
+        self.group.permissions.add(self.permission)
+        self.get_user()
+        self.user.groups.add(self.group)
+        self.assertTrue(self.get_user().has_perm('users.change_profile'))
+
+        self.group.user_set.remove(self.user)
+        self.assertFalse(self.get_user().has_perm('users.change_profile'))
+
+        groups.add_to_group({self.user.pk}, self.group.pk)
+        self.assertTrue(self.get_user().has_perm('users.change_profile'))
+
+    def test_permission_change_invalidates_snapshot(self):
+        self.user.groups.add(self.group)
+        self.get_user()
+        self.group.permissions.add(self.permission)
+        self.assertTrue(self.get_user().has_perm('users.change_profile'))
+
+        self.get_user()
+        self.user.user_permissions.add(Permission.objects.get(codename='delete_project'))
+        self.assertTrue(self.get_user().has_perm('project.delete_project'))
+
+    def test_bulk_profile_update_invalidates_snapshot(self):
+        Profile.objects.filter(user=self.user).update(account_status=Profile.APPROVED)
+        self.get_user()
+        close_accounts([self.user.pk])
+        self.assertEqual(self.get_user().profile.account_status, Profile.CLOSED)
+
+    def test_snapshots_require_redis(self):
+        """
+        Ensure users are loaded from the database when Redis has not been configured, as other
+        processes could not invalidate snapshots cached in this one.
+        """
+        with mock.patch('users.snapshot.get_redis_connection', return_value=None):
+            self.get_user()
+            with self.assertNumQueries(1):
+                self.assertEqual(self.get_user(), self.user)
+        self.assertEqual(self.snapshot_connection.keys('auth:user:*'), [])
+
+    def test_snapshot_built_before_invalidation_is_not_served(self):
+        """
+        Ensure a snapshot of rows read before the user was invalidated is ignored, even when it
+        is written after the invalidation.
+        """
+        stale_user = CustomUser.objects.get(pk=self.user.pk)
+
+        def load(user_id):
+            # A concurrent request changes the user once this one has read them.
+            CustomUser.objects.filter(pk=user_id).update(first_name='Joseph')
+            snapshot.invalidate([user_id])
+            return stale_user
+
+        self.assertEqual(snapshot.get_user(self.user.pk, load).first_name, 'Joe')
+        self.assertEqual(self.get_user().first_name, 'Joseph')
+
+    def test_password_hash_is_not_cached(self):
+        """
+        Ensure snapshots hold the session authentication hash, but not the password hash.
+        """
+        self.user.set_password('password')
+        self.user.save()
+        user = self.get_user()
+        cached = self.snapshot_connection.get('auth:user:{}'.format(self.user.pk))
+        self.assertNotIn(self.user.password.encode(), cached)
+        self.assertIn('password', user.get_deferred_fields())
+        with self.assertNumQueries(0):
+            self.assertEqual(user.get_session_auth_hash(), self.user.get_session_auth_hash())
+
+        user.set_password('new password')
+        self.assertNotEqual(user.get_session_auth_hash(), self.user.get_session_auth_hash())
@@ -2,6 +2,7 @@ from django.test import TestCase
 
 from django.urls import reverse
 
+from cogs3.testing import QueryBudgetMixin
 from institution.tests.test_models import InstitutionTests
 from users.tests.test_models import CustomUserTests
 from users.views import RegisterView
@@ -18,7 +19,7 @@ class UserViewTests(TestCase):
         )
 
 
-class RegisterViewTests(UserViewTests, TestCase):
+class RegisterViewTests(QueryBudgetMixin, UserViewTests, TestCase):
 
     def test_register_view_as_an_unauthorised_user(self):
         """
@@ -54,8 +55,18 @@ class RegisterViewTests(UserViewTests, TestCase):
         self.assertEqual(response.status_code, 302)
         self.assertEqual(response.url, reverse('home'))
 
+    def test_register_view_query_budget(self):
+        """
+        Ensure the register view runs a fixed number of queries.
+        """
+        headers = {
+            'Shib-Identity-Provider': self.institution.identity_provider,
+            'REMOTE_USER': '@'.join(['unauthorised-user', self.institution.base_domain]),
+        }
+        self.assertQueryBudget(6, lambda: self.client.get(reverse('register'), **headers))
+
 
-class LogoutViewTests(UserViewTests, TestCase):
+class LogoutViewTests(QueryBudgetMixin, UserViewTests, TestCase):
 
     def test_logout_view_as_an_unauthorised_user(self):
         """
@@ -89,3 +100,15 @@ class LogoutViewTests(UserViewTests, TestCase):
         )
         self.assertEqual(response.status_code, 302)
         self.assertEqual(response.url, reverse('logged_out'))
+
+    def test_logout_view_query_budget(self):
+        """
+        Ensure the logout view runs a fixed number of queries.
+        """
+        email = '@'.join(['user', self.institution.base_domain])
+        CustomUserTests.create_shibboleth_user(email=email)
+        headers = {
+            'Shib-Identity-Provider': self.institution.identity_provider,
+            'REMOTE_USER': email,
+        }
+        self.assertQueryBudget(12, lambda: self.client.get(reverse('logout'), **headers), status_code=302)